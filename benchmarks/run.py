@@ -0,0 +1,173 @@
+"""Run the benchmark suite, store the results as JSON and compare them to a baseline.
+
+For each benchmark and dataset size, the wall time (best and mean of a number of
+repeats), the number of times a HDF5 file was opened, the number of datasets and bytes
+read, the time spent loading each field (as recorded by :func:`pyuff_ustb.profiling`)
+and the peak (Python and NumPy) memory allocated are measured.
+
+Examples:
+    Run the small benchmarks and save the results as the baseline::
+
+        python benchmarks/run.py --sizes small --output baseline.json
+
+    Run them again after a change and compare against the baseline::
+
+        python benchmarks/run.py --sizes small --compare baseline.json
+
+    Exits with a non-zero exit code if any benchmark got slower than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from suite import BENCHMARKS, SIZES, Dataset  # noqa: E402
+
+import pyuff_ustb  # noqa: E402
+
+
+def run_benchmark(name: str, dataset: Dataset, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        f = BENCHMARKS[name](dataset)
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+
+    # Count I/O and memory in a separate run, so that it does not affect the timing
+    f = BENCHMARKS[name](dataset)
+    tracemalloc.start()
+    with pyuff_ustb.profiling() as stats:
+        f()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time_best": min(times),
+        "time_mean": float(np.mean(times)),
+        "repeats": repeats,
+        "file_opens": stats.file_opens,
+        "dataset_reads": stats.dataset_reads,
+        "bytes_read": stats.bytes_read,
+        "peak_memory": peak_memory,
+        "fields": stats.to_dict()["fields"],
+    }
+
+
+def run(
+    sizes: List[str], names: List[str], repeats: int, directory: str
+) -> Dict[str, dict]:
+    results = {}
+    for size in sizes:
+        dataset = Dataset.create(size, directory)
+        for name in names:
+            key = f"{name}[{size}]"
+            results[key] = run_benchmark(name, dataset, repeats)
+            print(_format_result(key, results[key]), flush=True)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float):
+    "Print a comparison against the baseline and return the names of regressions."
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["time_best"], result["time_best"]
+        ratio = after / before if before > 0 else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(key)
+            flag = "  <-- regression"
+        print(f"{key:<45} {before:>9.4f}s {after:>9.4f}s {ratio:>6.2f}x{flag}")
+        for counter in ("file_opens", "dataset_reads", "bytes_read"):
+            if result[counter] > baseline[key][counter]:
+                print(
+                    f"    {counter} increased from {baseline[key][counter]} to "
+                    f"{result[counter]}"
+                )
+    return regressions
+
+
+def _format_result(key: str, result: dict) -> str:
+    return (
+        f"{key:<45} best={result['time_best']:.4f}s "
+        f"mean={result['time_mean']:.4f}s opens={result['file_opens']} "
+        f"reads={result['dataset_reads']} "
+        f"read={result['bytes_read'] / 1e6:.1f}MB "
+        f"peak={result['peak_memory'] / 1e6:.1f}MB"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=["small"], choices=list(SIZES.keys())
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        default=list(BENCHMARKS.keys()),
+        choices=list(BENCHMARKS.keys()),
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--data-dir",
+        help="Where to store the synthetic datasets (re-used between runs). Defaults "
+        "to a temporary directory.",
+    )
+    parser.add_argument("--output", help="Where to save the results as JSON.")
+    parser.add_argument("--compare", help="A JSON file with baseline results.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Report a regression if a benchmark is slower than the baseline by this "
+        "factor.",
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        directory = args.data_dir or tmp_directory
+        os.makedirs(directory, exist_ok=True)
+        results = run(args.sizes, args.benchmarks, args.repeats, directory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "pyuff_ustb": pyuff_ustb.__version__,
+                        "python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "h5py": h5py.__version__,
+                        "machine": platform.machine(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Benchmarks of the read, write, eager loading and geometry code paths.
+
+Every benchmark is a function that takes a :class:`Dataset` (synthetic files generated
+once per size) and returns the callable to measure. Anything done before returning the
+callable (for example creating fresh, not yet loaded objects) is not measured.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+import h5py
+import numpy as np
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+from pyuff_ustb.prefetching import AccessProfile, prefetch
+from pyuff_ustb.readers import H5Reader, read_array
+
+# Parameters of the synthetic datasets for each size
+SIZES = {
+    "small": dict(
+        channel_data=dict(N_samples=512, N_elements=64, N_waves=16, N_frames=2),
+        beamformed_data=dict(N_x=128, N_z=256, N_frames=4),
+    ),
+    "medium": dict(
+        channel_data=dict(N_samples=2048, N_elements=128, N_waves=64, N_frames=2),
+        beamformed_data=dict(N_x=256, N_z=512, N_frames=16),
+    ),
+    "large": dict(
+        channel_data=dict(N_samples=4096, N_elements=128, N_waves=128, N_frames=8),
+        beamformed_data=dict(N_x=512, N_z=1024, N_frames=64),
+    ),
+}
+
+
+@dataclass
+class Dataset:
+    "Synthetic files that the benchmarks read from, and a directory to write to."
+
+    size: str
+    filepath: str
+    output_directory: str
+
+    @classmethod
+    def create(cls, size: str, directory: str) -> "Dataset":
+        filepath = os.path.join(directory, f"{size}.uff")
+        if not os.path.exists(filepath):
+            synthetic.write_channel_data(
+                filepath, "channel_data", **SIZES[size]["channel_data"]
+            )
+            synthetic.write_beamformed_data(
+                filepath, "beamformed_data", **SIZES[size]["beamformed_data"]
+            )
+        output_directory = os.path.join(directory, "output")
+        os.makedirs(output_directory, exist_ok=True)
+        return cls(size, filepath, output_directory)
+
+    def read(self, name: str) -> pyuff.Uff:
+        return pyuff.Uff(self.filepath).read(name)
+
+    def output_filepath(self, name: str) -> str:
+        filepath = os.path.join(self.output_directory, name + ".uff")
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return filepath
+
+
+def bench_h5reader_traversal(dataset: Dataset):
+    "Recursively list all keys and attributes of the file through H5Reader."
+
+    def traverse(reader: H5Reader):
+        reader.attrs
+        for k in reader.keys():
+            traverse(reader[k])
+
+    return lambda: traverse(H5Reader(dataset.filepath))
+
+
+def bench_read_array(dataset: Dataset):
+    "Read the channel data array using read_array."
+    reader = H5Reader(dataset.filepath)["channel_data"]["data"]
+    return lambda: read_array(reader)
+
+
+def bench_read_channel_data(dataset: Dataset):
+    "Read ChannelData.data of a freshly opened file."
+    channel_data = dataset.read("channel_data")
+    return lambda: channel_data.data
+
+
+def bench_read_beamformed_data(dataset: Dataset):
+    "Read BeamformedData.data of a freshly opened file."
+    beamformed_data = dataset.read("beamformed_data")
+    return lambda: beamformed_data.data
+
+
+def bench_eager_load_channel_data(dataset: Dataset):
+    "Eagerly load a freshly opened ChannelData (metadata and data)."
+    channel_data = dataset.read("channel_data")
+    return lambda: pyuff.eager_load(channel_data)
+
+
+def bench_eager_load_metadata(dataset: Dataset):
+    "Eagerly load the metadata (but not the data) of a freshly opened ChannelData."
+    channel_data = dataset.read("channel_data")
+    return lambda: pyuff.eager_load(channel_data, metadata_only=True)
+
+
+def bench_write_channel_data(dataset: Dataset):
+    "Write an (eagerly loaded) ChannelData to a new file."
+    channel_data = pyuff.eager_load(dataset.read("channel_data"))
+    filepath = dataset.output_filepath("write_channel_data")
+
+    def write():
+        with h5py.File(filepath, "w") as hf:
+            pyuff.write_object(hf, channel_data, "channel_data")
+
+    return write
+
+
+def bench_uff_eq(dataset: Dataset):
+    "Compare two freshly opened ChannelData objects using Uff.__eq__."
+    channel_data1 = dataset.read("channel_data")
+    channel_data2 = dataset.read("channel_data")
+    return lambda: channel_data1 == channel_data2
+
+
+def bench_sequence_geometry(dataset: Dataset):
+    "Read the source of every wave in the sequence and compute its coordinates."
+    channel_data = dataset.read("channel_data")
+    sequence = channel_data.sequence
+    return lambda: np.array([wave.source.xyz for wave in sequence])
+
+
+def bench_sequence_geometry_prefetched(dataset: Dataset):
+    """Prefetch the sources of every wave in the sequence in a single pass and compute
+    their coordinates."""
+    channel_data = dataset.read("channel_data")
+    profile = AccessProfile(
+        [
+            ("sequence", "*", "source", name)
+            for name in ("azimuth", "elevation", "distance")
+        ]
+    )
+
+    def run():
+        prefetch(channel_data, profile)
+        return np.array([wave.source.xyz for wave in channel_data.sequence])
+
+    return run
+
+
+def bench_sequence_geometry_point_array(dataset: Dataset):
+    "Read the sources of every wave in bulk as a PointArray and compute their coordinates."
+    channel_data = dataset.read("channel_data")
+    sequence = channel_data.sequence
+    return lambda: pyuff.PointArray.from_sequence(sequence, "source").xyz
+
+
+def bench_probe_geometry(dataset: Dataset):
+    "Read the probe geometry and compute the element coordinates."
+    channel_data = dataset.read("channel_data")
+    return lambda: (channel_data.probe.xyz, channel_data.probe.r)
+
+
+def bench_scan_geometry(dataset: Dataset):
+    "Compute the pixel coordinates of a LinearScan and a SectorScan."
+    params = SIZES[dataset.size]["beamformed_data"]
+    linear_scan = synthetic.make_scan("linear", params["N_x"], params["N_z"])
+    sector_scan = synthetic.make_scan("sector", params["N_x"], params["N_z"])
+    return lambda: (linear_scan.xyz, sector_scan.xyz)
+
+
+BENCHMARKS: Dict[str, Callable[[Dataset], Callable[[], object]]] = {
+    name[len("bench_") :]: f
+    for name, f in globals().items()
+    if name.startswith("bench_")
+}
@@ -1,5 +1,12 @@
 import pyuff_ustb.objects
+from pyuff_ustb.background_writer import BackgroundWriter
+from pyuff_ustb.caching import set_cache_budget
+from pyuff_ustb.instrumentation import profiling
 from pyuff_ustb.objects import *
 
-__all__ = pyuff_ustb.objects.__all__
+__all__ = pyuff_ustb.objects.__all__ + [
+    "BackgroundWriter",
+    "profiling",
+    "set_cache_budget",
+]
 __version__ = "3.0.0"
@@ -0,0 +1,214 @@
+"""Writing UFF objects to files in a background thread.
+
+Writing a large object blocks the calling thread for the whole HDF5 write. A
+:class:`BackgroundWriter` writes objects (or frames of data) from a dedicated thread
+instead, so that processing and writing to disk can overlap:
+
+>> with BackgroundWriter("output.uff") as writer:
+>>     writer.write(pyuff.BeamformedData(scan=scan, data=placeholder), "b_data")
+>>     for i, frame in enumerate(beamform_frames()):
+>>         writer.write_array_slice("b_data/data", (..., i), frame)
+
+The writes are queued in a bounded queue. When the queue is full, queueing another
+write blocks until the oldest write has been done (backpressure), so that at most
+``max_queue_size`` objects or frames are held in memory at a time. With the default
+of 2, one frame can be computed while the previous one is being written (double
+buffering).
+
+Every queued write returns a :class:`~concurrent.futures.Future` that is resolved when
+the write is done, or holds the exception if the write failed. A failed write does not
+stop the following writes.
+
+Objects and arrays are written as they are when their turn comes, so they must not be
+modified until their future is done.
+"""
+
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Sequence, Union
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.objects.uff import Uff, write_array_slice, write_object
+
+# Used to tell the worker thread to stop
+_STOP = object()
+
+
+class _Worker:
+    "A thread that runs queued jobs in order, with a bounded queue."
+
+    def __init__(self, max_queue_size: int, name: str):
+        if max_queue_size < 1:
+            raise ValueError(
+                f"max_queue_size must be at least 1, got {max_queue_size}."
+            )
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], Any]) -> Future:
+        "Queue a job, blocking while the queue is full."
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def join(self):
+        "Wait until all queued jobs are done."
+        self._queue.join()
+
+    def stop(self):
+        "Wait until all queued jobs are done and stop the thread."
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                job, future = item
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(job())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+
+class BackgroundWriter:
+    """Writes UFF objects and slices of arrays to a HDF5 file from a background thread.
+
+    The file is opened (in append mode) by the background thread, and is kept open
+    until the writer is closed. Use the writer as a context manager, or call
+    :meth:`close` when done.
+
+    Args:
+        filepath (str): The file to write to.
+        max_queue_size (int): The maximum number of queued writes. Queueing a write
+            while the queue is full blocks until there is room in the queue.
+    """
+
+    def __init__(self, filepath: str, max_queue_size: int = 2):
+        self.filepath = filepath
+        self._hf: Optional[h5py.File] = None
+        self._worker = _Worker(max_queue_size, name="pyuff_background_writer")
+        self._closed = False
+
+    def write(
+        self,
+        obj: Any,
+        location: Union[str, Sequence[str]],
+        overwrite: bool = False,
+        ignore_missing_compulsory_fields: bool = False,
+        deduplicate: Union[bool, str] = True,
+    ) -> Future:
+        """Queue writing an object to the file. See :meth:`Uff.write` for the
+        arguments.
+
+        Returns:
+            Future: Resolved (with None) when the object has been written.
+        """
+        return self._submit(
+            lambda hf: write_object(
+                hf,
+                obj,
+                location,
+                overwrite,
+                ignore_missing_compulsory_fields,
+                deduplicate,
+            )
+        )
+
+    def write_array_slice(
+        self,
+        location: Union[str, Sequence[str]],
+        key: Any,
+        value: np.ndarray,
+        transpose: bool = False,
+    ) -> Future:
+        """Queue writing ``value`` to a hyperslab of an array in the file, for example
+        a frame of an array written as an :class:`ArrayPlaceholder`. See
+        :func:`write_array_slice` for the arguments.
+
+        Returns:
+            Future: Resolved (with None) when the slice has been written.
+        """
+        return self._submit(
+            lambda hf: write_array_slice(hf, location, key, value, transpose)
+        )
+
+    def flush(self):
+        """Wait until all queued writes are done, and flush the file. Raises the
+        exception if flushing the file fails (failed writes are only reported by their
+        futures)."""
+        self._submit(lambda hf: hf.flush()).result()
+
+    def close(self):
+        """Wait until all queued writes are done, and close the file. Raises the
+        exception if closing the file fails."""
+        if self._closed:
+            return
+        self._closed = True
+        closed = self._worker.submit(self._close_file)
+        self._worker.stop()
+        closed.result()
+
+    def _submit(self, job: Callable[[h5py.File], Any]) -> Future:
+        if self._closed:
+            raise ValueError("The BackgroundWriter is closed.")
+        return self._worker.submit(lambda: job(self._file()))
+
+    def _file(self) -> h5py.File:
+        # Only called from the background thread
+        if self._hf is None:
+            self._hf = h5py.File(self.filepath, "a")
+        return self._hf
+
+    def _close_file(self):
+        if self._hf is not None:
+            self._hf.close()
+            self._hf = None
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Writes objects queued by write_async, opening the file for each write
+_async_worker: Optional[_Worker] = None
+_async_worker_lock = threading.Lock()
+
+
+def write_async(
+    obj: Uff,
+    filepath: str,
+    location: Union[str, Sequence[str]],
+    overwrite: bool = False,
+    ignore_missing_compulsory_fields: bool = False,
+    deduplicate: Union[bool, str] = True,
+) -> Future:
+    """Queue writing an object to a file from a shared background thread, see
+    :meth:`Uff.write_async`."""
+    global _async_worker
+    with _async_worker_lock:
+        if _async_worker is None:
+            _async_worker = _Worker(max_queue_size=2, name="pyuff_write_async")
+            # Queued writes are done before the interpreter exits
+            atexit.register(_async_worker.join)
+    return _async_worker.submit(
+        lambda: obj.write(
+            filepath,
+            location,
+            overwrite,
+            ignore_missing_compulsory_fields,
+            deduplicate,
+        )
+    )
@@ -0,0 +1,157 @@
+"""Memory-budgeted caching of array fields that are loaded from files.
+
+Fields of UFF objects are cached in the object once they have been read from a file, so
+touching ``channel_data.data`` keeps the data in memory for as long as the object
+lives. Long-running applications that read many files can set a budget for the total
+size of the cached arrays instead:
+
+>> pyuff_ustb.set_cache_budget(2 * 1024**3)  # 2 GiB
+
+When the budget is exceeded, the least recently loaded array fields (of any object) are
+evicted from their objects, exactly like ``del channel_data.data`` does, and are read
+from the file again the next time they are accessed. Fields that are set explicitly
+(for example ``channel_data.data = data``, or when creating an object in memory) are
+never evicted, as they can not be read again.
+
+For the same reason, arrays that are loaded while a budget is set are read-only, as
+changes made to them in place would be lost when they are evicted. To modify such an
+array in place, first make a private copy of it using
+:meth:`~pyuff_ustb.objects.uff.Uff.materialize`, which is then no longer evicted:
+
+>> channel_data.materialize("data")
+>> channel_data.data *= 2
+
+Cache hits do not go through the field descriptors (which keeps them fast), so the
+recency of a field is the last time it was loaded from the file.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+# The CacheManager that tracks the loaded array fields, if a budget is set
+_manager: Optional["CacheManager"] = None
+
+
+class CacheManager:
+    """Tracks the array fields that are loaded from files, and evicts the least
+    recently loaded ones when their total size exceeds ``max_bytes``.
+
+    Attributes:
+        max_bytes (int): The budget for the total size of the tracked arrays [bytes].
+        nbytes (int): The total size of the tracked arrays [bytes].
+        evictions (int): The number of fields that have been evicted.
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes < 0:
+            raise ValueError(f"max_bytes must be non-negative, got {max_bytes}.")
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        # (weakref to the object, field name, nbytes) by (id(obj), field name), in the
+        # order they were loaded
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[weakref.ref, str, int]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def track(self, instance: Any, name: str, value: Any):
+        """Track a field that was just loaded from a file, evicting other fields if the
+        budget is exceeded. The array is made read-only, as changes made to it in place
+        would be lost when it is evicted. Values that are not arrays are not tracked."""
+        if not isinstance(value, np.ndarray):
+            return
+        value.flags.writeable = False
+        key = (id(instance), name)
+        with self._lock:
+            self._remove(key)
+            ref = weakref.ref(instance, lambda _: self.forget_key(key))
+            self._entries[key] = (ref, name, value.nbytes)
+            self.nbytes += value.nbytes
+            self._evict(keep=key)
+
+    def forget(self, instance: Any, name: str):
+        """Stop tracking a field, e.g. because it was set explicitly or deleted. Does
+        nothing if the field is not tracked."""
+        self.forget_key((id(instance), name))
+
+    def forget_key(self, key: Tuple[int, str]):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        "Evict all tracked fields."
+        with self._lock:
+            max_bytes, self.max_bytes = self.max_bytes, 0
+            try:
+                self._evict()
+            finally:
+                self.max_bytes = max_bytes
+
+    def _remove(self, key: Tuple[int, str]) -> Optional[Tuple[weakref.ref, str, int]]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+        return entry
+
+    def _evict(self, keep: Optional[Tuple[int, str]] = None):
+        "Evict the least recently loaded fields until the budget is met."
+        for key in list(self._entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            ref, name, _ = self._remove(key)
+            instance = ref()
+            if instance is not None:
+                instance.__dict__.pop(name, None)
+                self.evictions += 1
+
+
+def set_cache_budget(max_bytes: Optional[int]) -> Optional[CacheManager]:
+    """Set the budget for the total size of the array fields that are cached in UFF
+    objects after being loaded from a file. Fields that are loaded from then on are
+    evicted (least recently loaded first) when the budget is exceeded, and are read-only
+    (use :meth:`~pyuff_ustb.objects.uff.Uff.materialize` to get a writeable copy that
+    is never evicted).
+
+    Args:
+        max_bytes (Optional[int]): The budget [bytes], or None to disable the budget
+            (the default). Disabling the budget does not evict any fields.
+
+    Returns:
+        Optional[CacheManager]: The new cache manager, or None if the budget was
+        disabled.
+    """
+    global _manager
+    _manager = CacheManager(max_bytes) if max_bytes is not None else None
+    return _manager
+
+
+@contextmanager
+def cache_budget(max_bytes: int) -> Iterator[CacheManager]:
+    """Set a budget for the cached array fields while in the context (see
+    :func:`set_cache_budget`), restoring the previous budget afterwards. The fields
+    that are tracked when exiting the context stay cached.
+
+    >> with cache_budget(512 * 1024**2) as cache:
+    >>     for filepath in filepaths:
+    >>         process(pyuff_ustb.Uff(filepath).read("channel_data"))
+    >> print(cache.evictions)
+    """
+    global _manager
+    previous = _manager
+    manager = CacheManager(max_bytes)
+    _manager = manager
+    try:
+        yield manager
+    finally:
+        _manager = previous
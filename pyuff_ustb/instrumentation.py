@@ -0,0 +1,301 @@
+"""Opt-in instrumentation of reading UFF files.
+
+Use :func:`profiling` to count the number of times a file is opened, the number of
+datasets (and bytes) read, and the time spent loading each field of the UFF objects:
+
+>> with pyuff_ustb.profiling() as stats:
+>>     channel_data = pyuff_ustb.Uff("file.uff").read("channel_data")
+>>     channel_data.sequence[0].source.xyz
+>> print(stats.summary())
+
+Pass ``trace=True`` to also record a trace event for every field load, file open and
+dataset read, which can be exported in the Chrome trace format and visualized in
+``chrome://tracing`` or https://ui.perfetto.dev:
+
+>> with pyuff_ustb.profiling(trace=True) as stats:
+>>     ...
+>> stats.to_chrome_trace("trace.json")
+
+When no profiling is active, the instrumented code paths only check whether
+:data:`_active` is None, so the overhead is negligible.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# The ProfilingStats that are currently being recorded to, if any
+_active: Optional["ProfilingStats"] = None
+
+
+@dataclass
+class FieldStats:
+    """Statistics of loading a field of a UFF class. I/O done while loading a field
+    that is not attributed to a nested field is attributed to this field."""
+
+    loads: int = 0
+    time: float = 0.0
+    file_opens: int = 0
+    dataset_reads: int = 0
+    bytes_read: int = 0
+
+
+class _FieldLoad:
+    "A field that is being loaded, on the stack of fields being loaded in a thread."
+
+    __slots__ = ("stats", "bytes_read")
+
+    def __init__(self, stats: FieldStats):
+        self.stats = stats
+        self.bytes_read = 0
+
+
+@dataclass
+class ProfilingStats:
+    """Statistics recorded by :func:`profiling`.
+
+    Attributes:
+        file_opens (int): The number of times a HDF5 file was opened.
+        dataset_reads (int): The number of datasets (or hyperslabs of datasets) read.
+        bytes_read (int): The total number of bytes read from datasets.
+        read_time (float): The total time spent reading datasets [s].
+        fields (Dict[str, FieldStats]): Statistics per field, keyed by
+            ``"ClassName.field_name"``.
+        trace (bool): Whether to record trace events (see :meth:`to_chrome_trace`).
+        trace_events (List[dict]): The recorded trace events in the Chrome trace event
+            format, with timestamps in microseconds since the start of profiling.
+    """
+
+    file_opens: int = 0
+    dataset_reads: int = 0
+    bytes_read: int = 0
+    read_time: float = 0.0
+    fields: Dict[str, FieldStats] = field(default_factory=dict)
+    trace: bool = False
+    trace_events: List[dict] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start_time = time.perf_counter()
+        self._pid = os.getpid()
+        self._thread_names: Dict[int, str] = {}
+
+    @property
+    def _field_stack(self) -> List[_FieldLoad]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def record_file_open(self) -> float:
+        "Record that a file is opened, returning the time it was opened."
+        with self._lock:
+            self.file_opens += 1
+            if self._field_stack:
+                self._field_stack[-1].stats.file_opens += 1
+        return time.perf_counter()
+
+    def record_file_close(self, opened_at: float, filepath: str, path: Sequence[str]):
+        "Record that a file, opened at time ``opened_at``, is closed again."
+        if self.trace:
+            self._add_complete_event(
+                "open",
+                "file",
+                opened_at,
+                time.perf_counter(),
+                {"filepath": filepath, "path": "/".join(path)},
+            )
+
+    def record_dataset_read(self, nbytes: int, seconds: float):
+        with self._lock:
+            self.dataset_reads += 1
+            self.bytes_read += nbytes
+            self.read_time += seconds
+            for field_load in self._field_stack:
+                field_load.bytes_read += nbytes
+            if self._field_stack:
+                self._field_stack[-1].stats.dataset_reads += 1
+                self._field_stack[-1].stats.bytes_read += nbytes
+
+    def timed_read(self, read: Callable[..., Any], *args, **kwargs) -> Any:
+        "Call ``read`` and record it as a dataset read of the returned value."
+        start = time.perf_counter()
+        value = read(*args, **kwargs)
+        end = time.perf_counter()
+        nbytes = np.asarray(value).nbytes
+        self.record_dataset_read(nbytes, end - start)
+        if self.trace:
+            self._add_complete_event("read", "dataset", start, end, {"bytes": nbytes})
+        return value
+
+    @contextmanager
+    def field_load(self, instance: Any, name: str) -> Iterator[FieldStats]:
+        "Record the loading of the field ``name`` of the UFF object ``instance``."
+        key = f"{type(instance).__name__}.{name}"
+        with self._lock:
+            if key not in self.fields:
+                self.fields[key] = FieldStats()
+            field_stats = self.fields[key]
+            field_stats.loads += 1
+        field_load = _FieldLoad(field_stats)
+        self._field_stack.append(field_load)
+        if self.trace:
+            path = _field_path(instance, name)
+            self._add_event({"name": path, "cat": "field", "ph": "B"})
+        start = time.perf_counter()
+        try:
+            yield field_stats
+        finally:
+            elapsed = time.perf_counter() - start
+            self._field_stack.pop()
+            with self._lock:
+                field_stats.time += elapsed
+            if self.trace:
+                self._add_event(
+                    {
+                        "name": path,
+                        "cat": "field",
+                        "ph": "E",
+                        "args": {"field": key, "bytes": field_load.bytes_read},
+                    }
+                )
+
+    def _add_event(self, event: dict, timestamp: Optional[float] = None):
+        "Add a trace event, with a timestamp (perf_counter time), defaulting to now."
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        thread = threading.current_thread()
+        event["ts"] = (timestamp - self._start_time) * 1e6
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        with self._lock:
+            self._thread_names.setdefault(thread.ident, thread.name)
+            self.trace_events.append(event)
+
+    def _add_complete_event(
+        self, name: str, category: str, start: float, end: float, args: dict
+    ):
+        event = {"name": name, "cat": category, "ph": "X", "args": args}
+        event["dur"] = (end - start) * 1e6
+        self._add_event(event, start)
+
+    def to_chrome_trace(self, filepath: Optional[str] = None) -> dict:
+        """Return the recorded trace events in the Chrome trace format, and write them
+        to filepath (as JSON) if given. Requires ``profiling(trace=True)``.
+
+        Field loads are recorded as begin/end events named after their path in the
+        file (for example ``"channel_data/sequence/sequence_0042/source/azimuth"``),
+        file opens and dataset reads are recorded as complete events. The threads are
+        named after the Python threads that did the reading."""
+        if not self.trace:
+            raise ValueError(
+                "No trace events were recorded. Use profiling(trace=True) to record "
+                "trace events."
+            )
+        with self._lock:
+            events = list(self.trace_events)
+            thread_names = dict(self._thread_names)
+        metadata_events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in thread_names.items()
+        ]
+        trace = {"traceEvents": metadata_events + events, "displayTimeUnit": "ms"}
+        if filepath is not None:
+            with open(filepath, "w") as f:
+                json.dump(trace, f)
+        return trace
+
+    def to_dict(self) -> dict:
+        return {
+            "file_opens": self.file_opens,
+            "dataset_reads": self.dataset_reads,
+            "bytes_read": self.bytes_read,
+            "read_time": self.read_time,
+            "fields": {k: asdict(v) for k, v in self.fields.items()},
+        }
+
+    def to_json(self, filepath: Optional[str] = None) -> str:
+        "Return the statistics as a JSON string, and write it to filepath if given."
+        s = json.dumps(self.to_dict(), indent=2)
+        if filepath is not None:
+            with open(filepath, "w") as f:
+                f.write(s)
+        return s
+
+    def summary(self, sort_by: str = "time", limit: Optional[int] = 20) -> str:
+        """Return a table of the fields, sorted by ``sort_by`` (one of the attributes
+        of :class:`FieldStats`) in descending order. At most ``limit`` fields are
+        included in the table."""
+        rows = sorted(
+            self.fields.items(),
+            key=lambda item: getattr(item[1], sort_by),
+            reverse=True,
+        )
+        if limit is not None:
+            rows = rows[:limit]
+        name_width = max([len("field")] + [len(k) for k, _ in rows])
+        lines = [
+            f"{self.file_opens} file opens, {self.dataset_reads} dataset reads, "
+            f"{_format_bytes(self.bytes_read)} read in {self.read_time:.3f} s",
+            f"{'field':<{name_width}} {'loads':>7} {'time [s]':>9} {'opens':>7} "
+            f"{'reads':>7} {'bytes':>10}",
+        ]
+        for k, v in rows:
+            lines.append(
+                f"{k:<{name_width}} {v.loads:>7} {v.time:>9.4f} {v.file_opens:>7} "
+                f"{v.dataset_reads:>7} {_format_bytes(v.bytes_read):>10}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def profiling(trace: bool = False) -> Iterator[ProfilingStats]:
+    """Record I/O statistics and per-field load times while in the context.
+
+    Only fields that are loaded lazily from a file while in the context are recorded
+    (i.e. fields that were already cached are not). Nested ``profiling`` contexts
+    record only to the innermost context.
+
+    Args:
+        trace (bool): Whether to also record a trace event for every field load, file
+            open and dataset read (see :meth:`ProfilingStats.to_chrome_trace`). This
+            uses memory proportional to the number of events.
+
+    Yields:
+        ProfilingStats: The statistics, updated while in the context.
+    """
+    global _active
+    previous = _active
+    stats = ProfilingStats(trace=trace)
+    _active = stats
+    try:
+        yield stats
+    finally:
+        _active = previous
+
+
+def _field_path(instance: Any, name: str) -> str:
+    "The path of a field in the file, or ClassName.name if not read from a file."
+    path = getattr(getattr(instance, "_reader", None), "path", ())
+    if not path:
+        return f"{type(instance).__name__}.{name}"
+    return "/".join(path) + "/" + name
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1000 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1000
@@ -5,6 +5,7 @@ from pyuff_ustb.objects.beamformed_data import BeamformedData
 from pyuff_ustb.objects.channel_data import ChannelData
 from pyuff_ustb.objects.phantom import Phantom
 from pyuff_ustb.objects.point import Point
+from pyuff_ustb.objects.point_array import PointArray
 from pyuff_ustb.objects.probes.curvilinear_array import CurvilinearArray
 from pyuff_ustb.objects.probes.curvilinear_matrix_array import CurvilinearMatrixArray
 from pyuff_ustb.objects.probes.linear_array import LinearArray
@@ -14,7 +15,13 @@ from pyuff_ustb.objects.pulse import Pulse
 from pyuff_ustb.objects.scans.linear_scan import LinearScan
 from pyuff_ustb.objects.scans.scan import Scan
 from pyuff_ustb.objects.scans.sector_scan import SectorScan
-from pyuff_ustb.objects.uff import Uff, eager_load, write_object
+from pyuff_ustb.objects.uff import (
+    ArrayPlaceholder,
+    Uff,
+    eager_load,
+    write_array_slice,
+    write_object,
+)
 from pyuff_ustb.objects.wave import Wave
 from pyuff_ustb.objects.wavefront import Wavefront
 from pyuff_ustb.objects.window import Window
@@ -24,6 +31,8 @@ __all__ = [
     "Uff",
     "eager_load",
     "write_object",
+    "write_array_slice",
+    "ArrayPlaceholder",
     "BeamformedData",
     "ChannelData",
     "CurvilinearArray",
@@ -33,6 +42,7 @@ __all__ = [
     "MatrixArray",
     "Phantom",
     "Point",
+    "PointArray",
     "Probe",
     "Pulse",
     "Scan",
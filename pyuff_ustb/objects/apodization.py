@@ -122,11 +122,11 @@ class Apodization(Uff):
         from pyuff_ustb.objects.point import Point
 
         if "origin" in self._reader:
-            return Point(self._reader["origin"])
+            return util.read_uff(self._reader["origin"], Point)
         elif "origo" in self._reader:
-            return Point(self._reader["origo"])
+            return util.read_uff(self._reader["origo"], Point)
         elif "apex" in self._reader:
-            return Point(self._reader["apex"])
+            return util.read_uff(self._reader["apex"], Point)
         return None
 
     # Dependent properties
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -8,7 +8,14 @@ from pyuff_ustb.objects.uff import (
     dependent_property,
     optional_property,
 )
-from pyuff_ustb.readers import read_array, read_scalar, util
+from pyuff_ustb.readers import (
+    NoneReader,
+    cast_array,
+    read_array,
+    read_scalar,
+    read_shape,
+    util,
+)
 
 if TYPE_CHECKING:
     from pyuff_ustb.objects import Pulse
@@ -16,6 +23,8 @@ if TYPE_CHECKING:
     from pyuff_ustb.objects.probes.probe import Probe
     from pyuff_ustb.objects.scans.scan import Scan
     from pyuff_ustb.objects.wave import Wave
+    from pyuff_ustb.readers.process_pool import ProcessPoolReader
+    from pyuff_ustb.readers.thread_pool import ThreadPoolReader
 
     # Make sure properties are treated as properties when type checking
     compulsory_property = property
@@ -52,7 +61,7 @@ class BeamformedData(Uff):
         "PHANTOM object"
         from pyuff_ustb.objects.phantom import Phantom
 
-        return Phantom(self._reader["phantom"])
+        return util.read_uff(self._reader["phantom"], Phantom)
 
     @optional_property
     def sequence(self) -> Union["Wave", List["Wave"]]:
@@ -64,16 +73,14 @@ class BeamformedData(Uff):
     @optional_property
     def probe(self) -> "Probe":
         "PROBE object"
-        from pyuff_ustb.objects.probes.probe import Probe
-
-        return Probe(self._reader["probe"])
+        return util.read_probe(self._reader["probe"])
 
     @optional_property
     def pulse(self) -> "Pulse":
         "PULSE object"
         from pyuff_ustb.objects import Pulse
 
-        return Pulse(self._reader["pulse"])
+        return util.read_uff(self._reader["pulse"], Pulse)
 
     @optional_property
     def sampling_frequency(self) -> float:
@@ -93,25 +100,158 @@ class BeamformedData(Uff):
     @dependent_property
     def N_pixels(self) -> int:
         "Number of pixels"
-        return self.data.shape[0]
+        return self._data_shape()[0]
 
     @dependent_property
     def N_channels(self) -> int:
         "Number of channels"
-        if self.data.ndim < 2:
+        shape = self._data_shape()
+        if len(shape) < 2:
             return 1
-        return self.data.shape[1]
+        return shape[1]
 
     @dependent_property
     def N_waves(self) -> int:
         "Number of waves (transmit events)"
-        if self.data.ndim < 3:
+        shape = self._data_shape()
+        if len(shape) < 3:
             return 1
-        return self.data.shape[2]
+        return shape[2]
 
     @dependent_property
     def N_frames(self) -> int:
         "Number of frames"
-        if self.data.ndim < 4:
+        shape = self._data_shape()
+        if len(shape) < 4:
             return 1
-        return self.data.shape[3]
+        return shape[3]
+
+    def _data_shape(self) -> Tuple[int, ...]:
+        "The shape of :attr:`data`, without reading it from the file if not loaded."
+        if "data" in self.__dict__ or isinstance(self._reader, NoneReader):
+            return np.shape(self.data)
+        return read_shape(self._reader["data"])
+
+    def read_data(
+        self,
+        key: Any = ...,
+        pool: Optional[Union["ProcessPoolReader", "ThreadPoolReader"]] = None,
+        dtype: Any = None,
+    ) -> np.ndarray:
+        """Read a hyperslab of :attr:`data` without loading the whole array.
+
+        If :attr:`data` is already loaded (or the object is not backed by a file) the
+        hyperslab is taken from the array in memory instead.
+
+        Args:
+            key: Index into :attr:`data` (``[pixel x channel x wave x frame]``), for
+                example ``(..., slice(0, 10))`` for the first ten frames.
+            pool (Optional[Union[ProcessPoolReader, ThreadPoolReader]]): If given,
+                the hyperslab is read in parallel by the worker processes of a
+                :class:`ProcessPoolReader`, or its compressed chunks are decompressed
+                in parallel by the threads of a :class:`ThreadPoolReader`.
+            dtype: If given, the values are cast to this dtype while reading (see
+                :func:`~pyuff_ustb.readers.read_array`). Otherwise the hyperslab has the
+                dtype of the stored array, e.g. int16 for raw channel data.
+        """
+        if "data" in self.__dict__ or isinstance(self._reader, NoneReader):
+            data = self.data[key]
+        elif pool is not None:
+            data = pool.read_array(self._reader["data"], key)
+        else:
+            return read_array(self._reader["data"], key, dtype=dtype)
+        return data if dtype is None else cast_array(data, dtype)
+
+    def image_view(self) -> np.ndarray:
+        """Return :attr:`data` reshaped into an image without copying it.
+
+        The pixel dimension is unfolded according to the pixel grid of :attr:`scan`,
+        so that the returned array has the dimensions
+        ``[depth x lateral x channel x wave x frame]`` (with an additional elevation
+        dimension after lateral for volumetric scans). The returned array is a view of
+        :attr:`data`, so writing to it also modifies :attr:`data`.
+
+        Raises:
+            NotImplementedError: If :attr:`scan` does not define a regular pixel grid.
+            ValueError: If :attr:`data` does not match the scan or if the image can not
+                be expressed as a view of :attr:`data`.
+        """
+        return _image_view(self.data, self.scan)
+
+    def lazy_image_view(self) -> "LazyImageView":
+        """Return an image-shaped view of :attr:`data` that only reads the frames that
+        are indexed from the file.
+
+        See :meth:`image_view` and :class:`LazyImageView`."""
+        return LazyImageView(self)
+
+
+class LazyImageView:
+    """A lazily loaded image-shaped view of :attr:`BeamformedData.data`.
+
+    Indexing a :class:`LazyImageView` by frame reads only those frames from the file
+    and returns them as an image (see :meth:`BeamformedData.image_view`):
+
+    >> view = beamformed_data.lazy_image_view()
+    >> view.shape  # Nothing is read from the data yet
+    (256, 128, 1, 1, 100)
+    >> image = view[10]  # Only the 11th frame is read
+    >> image.shape
+    (256, 128, 1, 1)
+    """
+
+    def __init__(self, beamformed_data: BeamformedData):
+        self.beamformed_data = beamformed_data
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        "Shape of the full image, ``[depth x lateral x channel x wave x frame]``"
+        grid_shape, axes = self.beamformed_data.scan._image_layout()
+        data_shape = _pad_shape(self.beamformed_data._data_shape())
+        return tuple(grid_shape[a] for a in axes) + data_shape[1:]
+
+    def __len__(self) -> int:
+        return self.shape[-1]
+
+    def __getitem__(self, frames: Union[int, slice, List[int], np.ndarray]):
+        bf = self.beamformed_data
+        keep_frame_dim = not isinstance(frames, (int, np.integer))
+        if len(bf._data_shape()) < 4:
+            # There is no frame dimension in the stored data, so we read everything
+            # (i.e. the single frame) and index the padded frame dimension instead.
+            data = _pad(bf.read_data())[..., frames if keep_frame_dim else [frames]]
+        else:
+            data = bf.read_data((..., frames if keep_frame_dim else [frames]))
+        image = _image_view(data, bf.scan)
+        return image if keep_frame_dim else image[..., 0]
+
+    def __repr__(self) -> str:
+        return f"LazyImageView(shape={self.shape})"
+
+
+def _pad_shape(shape: Tuple[int, ...]) -> Tuple[int, ...]:
+    "Pad a data shape with trailing singleton dimensions up to 4 dimensions."
+    return tuple(shape) + (1,) * (4 - len(shape))
+
+
+def _pad(data: np.ndarray) -> np.ndarray:
+    return data.reshape(_pad_shape(data.shape))
+
+
+def _image_view(data: np.ndarray, scan: "Scan") -> np.ndarray:
+    "Reshape data of shape [pixel x channel x wave x frame] into an image (no copy)."
+    grid_shape, axes = scan._image_layout()
+    data = _pad(data)
+    if data.shape[0] != np.prod(grid_shape):
+        raise ValueError(
+            f"The data has {data.shape[0]} pixels, but the scan has "
+            f"{int(np.prod(grid_shape))} pixels (grid shape {grid_shape})."
+        )
+    image = data.reshape(tuple(grid_shape) + data.shape[1:])
+    if not np.may_share_memory(image, data):
+        raise ValueError(
+            "The data can not be reshaped into an image without copying it. Try "
+            "making the data contiguous first, e.g. using np.ascontiguousarray."
+        )
+    n_grid = len(grid_shape)
+    return image.transpose(tuple(axes) + tuple(range(n_grid, image.ndim)))
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -8,13 +8,23 @@ from pyuff_ustb.objects.uff import (
     dependent_property,
     optional_property,
 )
-from pyuff_ustb.readers import read_array, read_scalar, util
+from pyuff_ustb.readers import (
+    NoneReader,
+    cast_array,
+    read_array,
+    read_scalar,
+    read_shape,
+    util,
+)
 
 if TYPE_CHECKING:
     from pyuff_ustb.objects.phantom import Phantom
     from pyuff_ustb.objects.probes.probe import Probe
     from pyuff_ustb.objects.pulse import Pulse
+    from pyuff_ustb.objects.scans.scan import Scan
     from pyuff_ustb.objects.wave import Wave
+    from pyuff_ustb.readers.process_pool import ProcessPoolReader
+    from pyuff_ustb.readers.thread_pool import ThreadPoolReader
 
     # Make sure properties are treated as properties when type checking
     compulsory_property = property
@@ -77,14 +87,14 @@ class ChannelData(Uff):
         "UFF.PULSE object"
         from pyuff_ustb.objects.pulse import Pulse
 
-        return Pulse(self._reader["pulse"])
+        return util.read_uff(self._reader["pulse"], Pulse)
 
     @optional_property
     def phantom(self) -> "Phantom":
         "UFF.PHANTOM object"
         from pyuff_ustb.objects.phantom import Phantom
 
-        return Phantom(self._reader["phantom"])
+        return util.read_uff(self._reader["phantom"], Phantom)
 
     @optional_property
     def PRF(self) -> float:
@@ -101,7 +111,7 @@ class ChannelData(Uff):
     @dependent_property
     def N_samples(self) -> int:
         "Number of samples in the data"
-        return self.data.shape[0]
+        return self._data_shape()[0]
 
     @dependent_property
     def N_elements(self) -> int:
@@ -127,8 +137,9 @@ class ChannelData(Uff):
     @dependent_property
     def N_frames(self) -> int:
         "Number of frames"
-        if self.data.ndim == 4:
-            return self.data.shape[3]
+        shape = self._data_shape()
+        if len(shape) == 4:
+            return shape[3]
         return 1
 
     @dependent_property
@@ -147,6 +158,206 @@ class ChannelData(Uff):
         ), "You need to set the pulse and the pulse center frequency."
         return self.sound_speed / self.pulse.center_frequency
 
+    def _data_shape(self) -> Tuple[int, ...]:
+        "The shape of :attr:`data`, without reading it from the file if not loaded."
+        if "data" in self.__dict__ or isinstance(self._reader, NoneReader):
+            return np.shape(self.data)
+        # The data is stored transposed in the file
+        return read_shape(self._reader["data"])[::-1]
+
+    def read_data(
+        self,
+        key: Any = ...,
+        pool: Optional[Union["ProcessPoolReader", "ThreadPoolReader"]] = None,
+        dtype: Any = None,
+    ) -> np.ndarray:
+        """Read a hyperslab of :attr:`data` without loading the whole array.
+
+        If :attr:`data` is already loaded (or the object is not backed by a file) the
+        hyperslab is taken from the array in memory instead.
+
+        Args:
+            key: Index into :attr:`data` (``[time x channel x wave x frame]``), for
+                example ``(..., slice(0, 10))`` for the first ten frames.
+            pool (Optional[Union[ProcessPoolReader, ThreadPoolReader]]): If given,
+                the hyperslab is read in parallel by the worker processes of a
+                :class:`ProcessPoolReader`, or its compressed chunks are decompressed
+                in parallel by the threads of a :class:`ThreadPoolReader`.
+            dtype: If given, the values are cast to this dtype while reading (see
+                :func:`~pyuff_ustb.readers.read_array`). Otherwise the hyperslab has the
+                dtype of the stored array, e.g. int16 for raw channel data.
+        """
+        if "data" in self.__dict__ or isinstance(self._reader, NoneReader):
+            data = self.data[key]
+        elif pool is not None:
+            data = pool.read_array(self._reader["data"], key, transpose=True)
+        else:
+            return read_array(self._reader["data"], key, transpose=True, dtype=dtype)
+        return data if dtype is None else cast_array(data, dtype)
+
+    def sample_windows(self, scan: "Scan", margin: int = 0) -> np.ndarray:
+        """Return the range of time samples that are needed in order to beamform the
+        pixels of ``scan``, for each wave.
+
+        The range is computed from the minimum and maximum round-trip time of flight
+        from the transmitted wave to the pixels and back to the elements of the probe.
+        The time of sample ``k`` relative to t0 of a wave is
+        ``wave.delay + initial_time + k/sampling_frequency``.
+
+        Args:
+            scan (Scan): The pixels to beamform.
+            margin (int): The number of extra samples to include on each side of the
+                range, for example to make room for interpolation or the pulse length.
+
+        Returns:
+            np.ndarray: An integer array of shape ``(N_waves, 2)``, with the first
+            sample (inclusive) and the last sample (exclusive) needed for each wave.
+        """
+        xyz = scan.xyz
+        elements = np.reshape(self.probe.xyz, (-1, 3))
+
+        # Shortest and longest receive distance from each pixel to any of the elements
+        rx_min = np.full(len(xyz), np.inf)
+        rx_max = np.zeros(len(xyz))
+        for element in elements:
+            distance = np.sqrt(np.sum((xyz - element) ** 2, axis=1))
+            np.minimum(rx_min, distance, out=rx_min)
+            np.maximum(rx_max, distance, out=rx_max)
+
+        sequence = self.sequence if isinstance(self.sequence, list) else [self.sequence]
+        windows = np.empty((len(sequence), 2), dtype=int)
+        for i, wave in enumerate(sequence):
+            tx = wave._transmit_distance(xyz)
+            delay = (wave.delay or 0.0) + self.initial_time
+            t_min = np.min(tx + rx_min) / self.sound_speed - delay
+            t_max = np.max(tx + rx_max) / self.sound_speed - delay
+            windows[i, 0] = np.floor(t_min * self.sampling_frequency) - margin
+            windows[i, 1] = np.ceil(t_max * self.sampling_frequency) + 1 + margin
+        return np.clip(windows, 0, self.N_samples)
+
+    def read_cropped(
+        self, scan: "Scan", margin: int = 0, wave: Union[int, None] = None
+    ) -> Tuple[np.ndarray, float]:
+        """Read only the time samples of :attr:`data` that are needed in order to
+        beamform ``scan`` (see :meth:`sample_windows`).
+
+        Args:
+            scan (Scan): The pixels to beamform.
+            margin (int): The number of extra samples to include on each side.
+            wave (Union[int, None]): If given, only the samples of this wave are read.
+                Otherwise the union of the sample ranges of all waves is read.
+
+        Returns:
+            Tuple[np.ndarray, float]: The cropped data and the time of its first sample
+            (to be used instead of :attr:`initial_time`).
+        """
+        windows = self.sample_windows(scan, margin)
+        if wave is None:
+            start, stop = np.min(windows[:, 0]), np.max(windows[:, 1])
+            key = (slice(start, stop),)
+        else:
+            start, stop = windows[wave]
+            key = (slice(start, stop), slice(None), wave)
+        data = self.read_data(key)
+        return data, self.initial_time + start / self.sampling_frequency
+
+    def active_channel_masks(self) -> np.ndarray:
+        """Return which channels are active on receive for each wave.
+
+        If :attr:`N_active_elements` is set, the active channels of a wave are the
+        :attr:`N_active_elements` elements closest to the wave's source (or to the
+        wave's origin, for waves with a source at infinity), as is common for
+        synthetic transmit aperture (STAI) and focused imaging (FI) acquisitions.
+        Otherwise, if every wave has an apodization vector, the channels with non-zero
+        apodization are active. Otherwise, all channels are active.
+
+        Returns:
+            np.ndarray: A boolean array of shape ``(N_waves, N_channels)``.
+        """
+        sequence = self.sequence if isinstance(self.sequence, list) else [self.sequence]
+        N_channels = self.N_channels
+        masks = np.ones((len(sequence), N_channels), dtype=bool)
+
+        N_active = self.N_active_elements
+        if N_active is not None and 0 < N_active < N_channels:
+            elements = np.reshape(self.probe.xyz, (-1, 3))[:, :2]
+            for i, wave in enumerate(sequence):
+                center = wave.origin if np.isinf(wave.source.distance) else wave.source
+                distance = np.sum((elements - [center.x, center.y]) ** 2, axis=1)
+                masks[i] = False
+                masks[i, np.argsort(distance, kind="stable")[:N_active]] = True
+            return masks
+
+        apodization_vectors = [
+            (
+                wave.apodization.apodization_vector
+                if wave.apodization is not None
+                else None
+            )
+            for wave in sequence
+        ]
+        if all(v is not None and np.size(v) == N_channels for v in apodization_vectors):
+            for i, apodization_vector in enumerate(apodization_vectors):
+                masks[i] = np.ravel(apodization_vector) != 0
+        return masks
+
+    def read_active_channels(
+        self, masks: Union[np.ndarray, None] = None, padded: bool = False
+    ) -> Union[
+        Tuple[List[np.ndarray], List[np.ndarray]], Tuple[np.ndarray, np.ndarray]
+    ]:
+        """Read only the active channels of each wave from :attr:`data`.
+
+        Contiguous sets of channels are read as a single hyperslab, other sets are
+        read using a point selection along the channel dimension.
+
+        Args:
+            masks (Union[np.ndarray, None]): A boolean array of shape
+                ``(N_waves, N_channels)`` with the channels to read for each wave.
+                Defaults to :meth:`active_channel_masks`.
+            padded (bool): Whether to return the result as a single padded array
+                instead of a list with one array per wave.
+
+        Returns:
+            If ``padded=False``, a list with the data of each wave
+            (``[time x active channel x frame]``) and a list with the channel indices
+            of each wave. If ``padded=True``, a zero-padded array of shape
+            ``[time x max active channels x wave x frame]`` and an array of shape
+            ``(max active channels, N_waves)`` with the channel indices, where padding
+            is marked with -1.
+        """
+        if masks is None:
+            masks = self.active_channel_masks()
+        masks = np.asarray(masks, dtype=bool)
+        if masks.shape != (self.N_waves, self.N_channels):
+            raise ValueError(
+                f"Expected masks of shape {(self.N_waves, self.N_channels)}, but got "
+                f"{masks.shape}."
+            )
+
+        channels = [np.flatnonzero(mask) for mask in masks]
+        waves_data = []
+        for wave, wave_channels in enumerate(channels):
+            if len(wave_channels) > 0 and np.all(np.diff(wave_channels) == 1):
+                channel_key = slice(wave_channels[0], wave_channels[-1] + 1)
+            else:
+                channel_key = wave_channels
+            waves_data.append(self.read_data((slice(None), channel_key, wave)))
+        if not padded:
+            return waves_data, channels
+
+        shape = self._data_shape()
+        max_active = max(len(c) for c in channels)
+        data = np.zeros(
+            (shape[0], max_active, len(channels)) + tuple(shape[3:]),
+            dtype=waves_data[0].dtype,
+        )
+        channel_indices = np.full((max_active, len(channels)), -1)
+        for wave, (wave_data, wave_channels) in enumerate(zip(waves_data, channels)):
+            data[:, : len(wave_channels), wave] = wave_data
+            channel_indices[: len(wave_channels), wave] = wave_channels
+        return data, channel_indices
+
     def _preprocess_write(self, name: str, value):
         if name == "data":
             return value.T
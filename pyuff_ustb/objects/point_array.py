@@ -0,0 +1,260 @@
+from functools import cached_property
+from typing import TYPE_CHECKING, Iterator, List, Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.objects.point import Point
+from pyuff_ustb.readers import H5Reader, Reader
+
+if TYPE_CHECKING:
+    from pyuff_ustb.objects.uff import Uff
+    from pyuff_ustb.objects.write_plan import WritePlan
+
+_FIELDS = ("distance", "azimuth", "elevation")
+
+
+class PointArray:
+    """A compact collection of points, stored as NumPy arrays of spherical coordinates.
+
+    :class:`PointArray` is the vectorized counterpart of a list of :class:`Point`
+    objects: the spherical coordinates are stored as a ``(N, 3)`` array of
+    ``[distance, azimuth, elevation]`` and the Cartesian coordinates are computed (and
+    cached) for all points at once. Points at infinity are supported in the same way as
+    :class:`Point` supports them.
+
+    A :class:`PointArray` can be read in bulk from a list of points in a file (see
+    :meth:`read` and :meth:`from_sequence`), and is written to files as a list of
+    points, i.e. in the same layout as USTB.
+
+    >> sources = PointArray.from_sequence(channel_data.sequence, "source")
+    >> sources.xyz  # (N_waves, 3) array
+    """
+
+    def __init__(
+        self,
+        distance: Union[np.ndarray, Sequence[float]],
+        azimuth: Union[np.ndarray, Sequence[float]],
+        elevation: Union[np.ndarray, Sequence[float]],
+    ):
+        distance, azimuth, elevation = np.broadcast_arrays(
+            np.asarray(distance, dtype=float).ravel(),
+            np.asarray(azimuth, dtype=float).ravel(),
+            np.asarray(elevation, dtype=float).ravel(),
+        )
+        self._spherical = np.stack([distance, azimuth, elevation], axis=-1)
+        # Read-only, as the Cartesian coordinates are computed from it and cached
+        self._spherical.flags.writeable = False
+
+    @classmethod
+    def from_spherical(cls, spherical: np.ndarray) -> "PointArray":
+        "Create a PointArray from a ``(N, 3)`` array of [distance, azimuth, elevation]."
+        spherical = np.asarray(spherical, dtype=float).reshape(-1, 3)
+        return cls(spherical[:, 0], spherical[:, 1], spherical[:, 2])
+
+    @classmethod
+    def from_xyz(cls, xyz: np.ndarray) -> "PointArray":
+        "Create a PointArray from a ``(N, 3)`` array of Cartesian coordinates."
+        xyz = np.asarray(xyz, dtype=float).reshape(-1, 3)
+        x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distance = np.sqrt(x**2 + y**2 + z**2)
+            azimuth = np.arctan2(x, z)
+            elevation = np.where(
+                np.isinf(y), np.pi / 2 * np.sign(y), np.arcsin(y / distance)
+            )
+        elevation = np.where(distance > 0, elevation, 0.0)
+        return cls(distance, azimuth, elevation)
+
+    @classmethod
+    def from_points(cls, points: Sequence[Point]) -> "PointArray":
+        "Create a PointArray from a list of :class:`Point` objects."
+        return cls.from_spherical(
+            [[p.distance, p.azimuth, p.elevation] for p in points]
+        )
+
+    @classmethod
+    def read(cls, reader: Reader) -> "PointArray":
+        """Read a list of points (or a single point) from a file in bulk, opening the
+        file only once."""
+        with reader.read() as group:
+            return cls.from_spherical(_read_spherical(_point_groups(group)))
+
+    @classmethod
+    def from_sequence(cls, objects: Sequence["Uff"], name: str) -> "PointArray":
+        """Gather the point field ``name`` of each object in a list, e.g. the sources of
+        all the waves in a sequence, reading those that are not yet loaded in bulk.
+        Points that are missing (not in the file, or None) are at the origin, like the
+        default of :attr:`Wave.origin <pyuff_ustb.objects.wave.Wave.origin>`.
+
+        >> sources = PointArray.from_sequence(channel_data.sequence, "source")
+        """
+        spherical = np.zeros((len(objects), 3))
+        unloaded = []
+        for i, obj in enumerate(objects):
+            if name in obj.__dict__ or not isinstance(obj._reader, H5Reader):
+                point = getattr(obj, name)
+                if point is not None:
+                    spherical[i] = (point.distance, point.azimuth, point.elevation)
+            else:
+                unloaded.append(i)
+        # Read the points of each file in a single pass
+        for filepath in {objects[i]._reader.filepath for i in unloaded}:
+            indices = [i for i in unloaded if objects[i]._reader.filepath == filepath]
+            with H5Reader(filepath).read() as hf:
+                groups = {i: hf["/".join(objects[i]._reader.path)] for i in indices}
+                present = [i for i in indices if name in groups[i]]
+                spherical[present] = _read_spherical([groups[i][name] for i in present])
+        return cls.from_spherical(spherical)
+
+    @property
+    def spherical(self) -> np.ndarray:
+        "``(N, 3)`` array of [distance, azimuth, elevation] (read-only)."
+        return self._spherical
+
+    @property
+    def distance(self) -> np.ndarray:
+        "Distance from the point locations to the origin of coordinates [m]"
+        return self._spherical[:, 0]
+
+    @property
+    def azimuth(self) -> np.ndarray:
+        "Angle from the point locations to the plane YZ [rad]"
+        return self._spherical[:, 1]
+
+    @property
+    def elevation(self) -> np.ndarray:
+        "Angle from the point locations to the plane XZ [rad]"
+        return self._spherical[:, 2]
+
+    @cached_property
+    def xyz(self) -> np.ndarray:
+        "``(N, 3)`` array of the locations of the points [m m m] (read-only)."
+        distance, azimuth, elevation = self._spherical.T
+        # Like Point, components of points at infinity are nan where the direction is
+        # perpendicular to the axis (inf * 0)
+        with np.errstate(invalid="ignore"):
+            xyz = np.stack(
+                [
+                    distance * np.sin(azimuth) * np.cos(elevation),
+                    distance * np.sin(elevation),
+                    distance * np.cos(azimuth) * np.cos(elevation),
+                ],
+                axis=-1,
+            )
+        xyz.flags.writeable = False
+        return xyz
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.xyz[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.xyz[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.xyz[:, 2]
+
+    def to_points(self) -> List[Point]:
+        "Return the points as a list of :class:`Point` objects."
+        return [
+            Point(distance=float(d), azimuth=float(a), elevation=float(e))
+            for d, a, e in self._spherical
+        ]
+
+    def __len__(self) -> int:
+        return len(self._spherical)
+
+    def __iter__(self) -> Iterator[Point]:
+        return iter(self.to_points())
+
+    def __getitem__(self, key) -> Union[Point, "PointArray"]:
+        if isinstance(key, (int, np.integer)):
+            d, a, e = self._spherical[key]
+            return Point(distance=float(d), azimuth=float(a), elevation=float(e))
+        return PointArray.from_spherical(self._spherical[key])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PointArray):
+            return False
+        return np.array_equal(self._spherical, other._spherical)
+
+    def __repr__(self) -> str:
+        return f"PointArray(<{len(self)} points>)"
+
+
+def plan_point_array(plan: "WritePlan", points: PointArray, location: Sequence[str]):
+    """Plan writing a PointArray as a list of points, in the same layout as
+    :func:`~pyuff_ustb.objects.uff.write_object` writes a list of :class:`Point`, but
+    without creating a :class:`Point` object per point."""
+    from pyuff_ustb.objects.uff import (
+        _FALSE,
+        _SCALAR_SIZE,
+        _TRUE,
+        _item_name,
+        _matlab_class,
+    )
+
+    name = location[-1]
+    location_str = "/".join(location)
+    plan.add_group(
+        location_str,
+        {
+            "class": "uff.point",
+            "name": name,
+            "array": _TRUE,
+            "size": np.array([1, len(points)]),
+        },
+    )
+    for i, values in enumerate(points.spherical):
+        item_name = _item_name(name, i)
+        item_location = f"{location_str}/{item_name}"
+        plan.add_group(
+            item_location,
+            {
+                "class": "uff.point",
+                "name": item_name,
+                "array": _FALSE,
+                "size": _SCALAR_SIZE,
+            },
+        )
+        for field, value in zip(_FIELDS, values):
+            plan.add_dataset(
+                f"{item_location}/{field}",
+                value,
+                {
+                    "class": _matlab_class(value),
+                    "name": field,
+                    "complex": _FALSE,
+                    "imaginary": _FALSE,
+                },
+            )
+
+
+def _point_groups(group: h5py.Group) -> List[h5py.Group]:
+    "The groups of the points in a list of points, or the group itself for a point."
+    if any(field in group for field in _FIELDS) or not len(group):
+        return [group]
+    return [group[k] for k in sorted(group.keys(), key=_item_index)]
+
+
+def _read_spherical(groups: Sequence[h5py.Group]) -> np.ndarray:
+    # Missing fields default to 0, like Point
+    spherical = np.zeros((len(groups), 3))
+    for i, group in enumerate(groups):
+        for j, field in enumerate(_FIELDS):
+            if field in group:
+                spherical[i, j] = np.squeeze(group[field][()])
+    return spherical
+
+
+def _item_index(item_name: str) -> Tuple[int, str]:
+    """Sort key of items in a list, in the order they were written.
+
+    >>> sorted(["origin_10000", "origin_0002", "origin_9999"], key=_item_index)
+    ['origin_0002', 'origin_9999', 'origin_10000']
+    """
+    suffix = item_name.rsplit("_", 1)[-1]
+    return (int(suffix), item_name) if suffix.isdigit() else (-1, item_name)
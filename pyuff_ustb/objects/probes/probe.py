@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 import numpy as np
 
 from pyuff_ustb.objects.uff import Uff, compulsory_property, dependent_property
-from pyuff_ustb.readers import read_array
+from pyuff_ustb.readers import read_array, util
 
 if TYPE_CHECKING:
     from pyuff_ustb.objects.point import Point
@@ -54,7 +54,7 @@ class Probe(Uff):
         "Location of the probe respect to origin of coordinates"
         from pyuff_ustb.objects.point import Point
 
-        return Point(self._reader["origin"])
+        return util.read_uff(self._reader["origin"], Point)
 
     # Dependent properties
     @dependent_property
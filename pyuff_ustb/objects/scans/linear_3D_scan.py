@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Tuple
 
 from pyuff_ustb.objects.scans.scan import Scan
 from pyuff_ustb.objects.uff import compulsory_property, optional_property
@@ -44,3 +44,7 @@ class Linear3DScan(Scan):
     def n_axial_axis(self) -> int:
         "Number of pixels in the z_axis"
         return len(self.axial_axis)
+
+    def _image_layout(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        # The axial axis (depth) is the fastest varying axis.
+        return (len(self.radial_axis), len(self.axial_axis)), (1, 0)
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Tuple
 
 import numpy as np
 
@@ -93,3 +93,7 @@ class LinearScan(Scan):
         X, Z = np.meshgrid(self.x_axis, self.z_axis, indexing="ij")
         N_pixels = Z.size
         return np.reshape(Z, [N_pixels])
+
+    def _image_layout(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        # Pixels are stored with z (depth) as the fastest varying axis, see x and z.
+        return (self.N_x_axis, self.N_z_axis), (1, 0)
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Tuple
 
 import numpy as np
 
@@ -62,3 +62,7 @@ class LinearScanRotated(Scan):
     def reference_distance(self) -> np.ndarray:
         "Distance used for the calculation of the phase term"
         return self.z
+
+    def _image_layout(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        # Same pixel ordering as LinearScan (z is the fastest varying axis).
+        return (self.N_x_axis, self.N_z_axis), (1, 0)
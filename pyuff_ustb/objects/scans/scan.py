@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Tuple
 
 import numpy as np
 
@@ -44,3 +44,12 @@ class Scan(Uff):
         if y.shape != self.x.shape and y.size == 1:
             y = np.repeat(y, self.x.size)
         return np.stack([self.x, y, self.z], axis=-1)
+
+    def _image_layout(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Return the shape of the pixel grid in the order the pixels are stored, and
+        the axes permutation that brings the grid into image order, i.e.
+        ``(depth, lateral, [elevation])``."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not define a regular pixel grid. Create an "
+            "issue on the repository if you need this."
+        )
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, List, Tuple, Union
 
 import numpy as np
 
@@ -48,7 +48,7 @@ class SectorScan(Scan):
         if "origin" in self._reader:
             return util.read_potentially_list(self._reader["origin"], Point)
         if "apex" in self._reader:
-            return Point(self._reader["apex"])
+            return util.read_uff(self._reader["apex"], Point)
 
     # Dependent properties
     @dependent_property
@@ -135,3 +135,7 @@ class SectorScan(Scan):
         rho, theta = np.meshgrid(self.depth_axis, self.azimuth_axis, indexing="ij")
         N_pixels = rho.size
         return np.reshape(rho * np.cos(theta) + self.origin.z, [N_pixels])
+
+    def _image_layout(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        # Pixels are stored with azimuth as the fastest varying axis, see x and z.
+        return (self.N_depth_axis, self.N_azimuth_axis), (0, 1)
@@ -1,10 +1,16 @@
 import copy
+import fnmatch
+from dataclasses import dataclass
 from enum import Enum
-from functools import cached_property
+from functools import cached_property, partial
 from typing import (
     TYPE_CHECKING,
     Any,
+    ClassVar,
+    Dict,
+    FrozenSet,
     Generic,
+    Iterator,
     List,
     Optional,
     Sequence,
@@ -16,12 +22,24 @@ from typing import (
 import h5py
 import numpy as np
 
-from pyuff_ustb.readers import H5Reader, NoneReader, Reader, ReaderKeyError, util
+from pyuff_ustb import caching, instrumentation
+from pyuff_ustb.readers import (
+    H5Reader,
+    NoneReader,
+    Reader,
+    ReaderKeyError,
+    keep_open,
+    util,
+)
+from pyuff_ustb.readers.base import SHARED_OBJECT_ATTR, transpose_key
 
 # A flag to enable equality checks with backwards compatibility for old files with
 # different names for things.
 _BACKWORDS_COMPATIBLE_EQUALS = True
 
+# Arrays of at least this many bytes are shared instead of copied by Uff.__deepcopy__
+_COPY_ON_WRITE_MIN_BYTES = 2**16
+
 TUff = TypeVar("TUff", bound="Uff")
 T = TypeVar("T")  # A generic type
 
@@ -30,20 +48,38 @@ class compulsory_property(cached_property, Generic[T]):
     "Properties needed in order to write an UFF file."
 
     def __get__(self, instance, owner=None) -> T:
+        if instance is not None and instrumentation._active is not None:
+            with instrumentation._active.field_load(instance, self.attrname):
+                return self._get(instance, owner)
+        return self._get(instance, owner)
+
+    def _get(self, instance, owner):
         try:
-            return super().__get__(instance, owner)
+            value = super().__get__(instance, owner)
         except ReaderKeyError:
             return None
+        if instance is not None and caching._manager is not None:
+            caching._manager.track(instance, self.attrname, value)
+        return value
 
 
 class optional_property(cached_property):
     "Optional properties that can be written to an UFF file."
 
     def __get__(self, instance, owner=None):
+        if instance is not None and instrumentation._active is not None:
+            with instrumentation._active.field_load(instance, self.attrname):
+                return self._get(instance, owner)
+        return self._get(instance, owner)
+
+    def _get(self, instance, owner):
         try:
-            return super().__get__(instance, owner)
+            value = super().__get__(instance, owner)
         except ReaderKeyError:
             return None
+        if instance is not None and caching._manager is not None:
+            caching._manager.track(instance, self.attrname, value)
+        return value
 
 
 class dependent_property(property):
@@ -52,12 +88,64 @@ class dependent_property(property):
 
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from pyuff_ustb.objects.write_plan import WritePlan
+    from pyuff_ustb.sharing import SharedUff
+
     # Make sure properties are treated as properties when type checking
     compulsory_property = property
     optional_property = property
     dependent_property = property
 
 
+class FieldKind(Enum):
+    compulsory = "compulsory"
+    optional = "optional"
+    dependent = "dependent"
+
+
+@dataclass(frozen=True)
+class FieldInfo:
+    """Information about a field of a Uff class.
+
+    Attributes:
+        name (str): The name of the field.
+        kind (FieldKind): Whether the field is a compulsory, optional or dependent
+            property.
+        type_hint (Any): The return annotation of the property, as written in the
+            source code (it may be a string), or None if it is not annotated.
+    """
+
+    name: str
+    kind: FieldKind
+    type_hint: Any = None
+
+    @property
+    def is_stored(self) -> bool:
+        "Whether the field is read from and written to files."
+        return self.kind is not FieldKind.dependent
+
+
+def _collect_fields(cls: type) -> Dict[str, "FieldInfo"]:
+    "Return the fields of a Uff class, sorted by name (like ``dir``)."
+    fields = {}
+    for name in dir(cls):
+        attr = getattr(cls, name)
+        if isinstance(attr, compulsory_property):
+            kind = FieldKind.compulsory
+        elif isinstance(attr, optional_property):
+            kind = FieldKind.optional
+        elif isinstance(attr, dependent_property):
+            kind = FieldKind.dependent
+        else:
+            continue
+        getter = attr.func if isinstance(attr, cached_property) else attr.fget
+        type_hint = getattr(getter, "__annotations__", {}).get("return")
+        fields[name] = FieldInfo(name, kind, type_hint)
+    return fields
+
+
 class Uff:
     """The base class of all UFF objects.
 
@@ -66,6 +154,23 @@ class Uff:
     """
 
     _reader: Reader
+    # The fields of the class, computed once when the class is created. See
+    # __init_subclass__.
+    _schema: ClassVar[Dict[str, FieldInfo]]
+    _stored_fields: ClassVar[Tuple[str, ...]]
+    _dependent_fields: ClassVar[Tuple[str, ...]]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._register_fields()
+
+    @classmethod
+    def _register_fields(cls):
+        cls._schema = _collect_fields(cls)
+        cls._stored_fields = tuple(k for k, f in cls._schema.items() if f.is_stored)
+        cls._dependent_fields = tuple(
+            k for k, f in cls._schema.items() if not f.is_stored
+        )
 
     def __init__(self, _reader: Optional[Union[Reader, str]] = None, **kwargs):
         if isinstance(_reader, str):
@@ -82,6 +187,31 @@ class Uff:
             setattr(self, k, v)
         self._reader = _reader
 
+    def __setattr__(self, name: str, value: Any):
+        if caching._manager is not None:
+            # Fields that are set explicitly must never be evicted
+            caching._manager.forget(self, name)
+        if name in self._schema and self._schema[name].is_stored:
+            self.__dict__.setdefault("_modified_fields", set()).add(name)
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str):
+        if caching._manager is not None:
+            caching._manager.forget(self, name)
+        # Deleting a field reverts it to the value in the file
+        self.__dict__.get("_modified_fields", set()).discard(name)
+        super().__delattr__(name)
+
+    @property
+    def modified_fields(self) -> FrozenSet[str]:
+        """The names of the (stored) fields of this object that have been set since it
+        was created or read, or since it was last written incrementally (see
+        :meth:`save`). Sub-objects keep track of their own modified fields.
+
+        Note that modifying an array in place (e.g. ``obj.data[0] = 0``) is not
+        detected. Assign the array to the field again to mark it as modified."""
+        return frozenset(self.__dict__.get("_modified_fields", ()))
+
     @optional_property
     def name(self) -> Union[str, None]:
         "Name of the dataset"
@@ -139,6 +269,8 @@ class Uff:
         location: Union[str, Tuple[str, ...], List[str]],
         overwrite: bool = False,
         ignore_missing_compulsory_fields: bool = False,
+        deduplicate: Union[bool, str] = True,
+        incremental: bool = False,
     ):
         """Write the Uff to a file.
 
@@ -157,6 +289,20 @@ class Uff:
                 ``ignore_missing_compulsory_fields=True`` will ignore this error and
                 write the object anyway. ``ignore_missing_compulsory_fields=False`` by
                 default.
+            deduplicate (Union[bool, str]): Whether to write sub-objects that occur
+                multiple times (for example the probe instance of every wave in a
+                sequence) only once, and hard link to them from their other locations.
+                Hard links are transparent to readers of the file, and the linked
+                objects are read back as a single instance. If ``"content"``, different
+                sub-objects with identical content are also stored only once, but are
+                still read back as separate instances. ``deduplicate=True`` by default.
+            incremental (bool): Whether to only write the fields that have been
+                modified (see :attr:`modified_fields`), and the modified fields of
+                loaded sub-objects, to an existing location, leaving the other fields in
+                the file untouched. The location must hold the object as it was before
+                it was modified (usually the location it was read from, see
+                :meth:`save`). If the location does not exist, the whole object is
+                written. ``incremental=False`` by default.
 
         Examples:
             We can write an object to a file like this:
@@ -191,14 +337,13 @@ class Uff:
             may not be None when writing an object to an UFF file. To ignore this error and write
             the object anyway, set ignore_missing_compulsory_fields=True.
 
-            Note that even though the previous step failed, the file was still partially
-            written to (we don't rollback changes when writing fails), so we will have to
-            pass ``overwrite=True`` to write the object again.
+            Note that the object is validated before anything is written, so nothing was
+            written to the file when the previous step failed and we can write the object
+            again without passing ``overwrite=True``.
 
             >>> point.write(
             ...     "my_point.uff",
             ...     "point2",
-            ...     overwrite=True,
             ...     ignore_missing_compulsory_fields=True,
             ... )
 
@@ -215,8 +360,70 @@ class Uff:
                 location,
                 overwrite,
                 ignore_missing_compulsory_fields,
+                deduplicate,
+                incremental,
             )
 
+    def write_async(
+        self,
+        filepath: str,
+        location: Union[str, Tuple[str, ...], List[str]],
+        overwrite: bool = False,
+        ignore_missing_compulsory_fields: bool = False,
+        deduplicate: Union[bool, str] = True,
+    ) -> "Future":
+        """Write the Uff to a file from a background thread, see :meth:`write` for the
+        arguments. The writes of all objects are queued (in order) to a single
+        background thread. Queueing blocks while two writes are already queued.
+
+        The object must not be modified until the write is done. To write many objects
+        or frames to the same file, use a
+        :class:`~pyuff_ustb.background_writer.BackgroundWriter` instead, which
+        keeps the file open.
+
+        >> future = beamformed_data.write_async("output.uff", "beamformed_data")
+        >> ...  # Do other work while writing
+        >> future.result()  # Wait for the write, raising any error that occurred
+
+        Returns:
+            Future: Resolved (with None) when the object has been written, or holding
+            the exception if the write failed.
+        """
+        from pyuff_ustb.background_writer import write_async
+
+        return write_async(
+            self,
+            filepath,
+            location,
+            overwrite,
+            ignore_missing_compulsory_fields,
+            deduplicate,
+        )
+
+    def save(self, ignore_missing_compulsory_fields: bool = False):
+        """Write the modified fields of the object (and of its loaded sub-objects) back
+        to the file and location it was read from, leaving the other fields in the file
+        untouched. See :attr:`modified_fields`.
+
+        This is the same as calling :meth:`write` with ``incremental=True`` on the file
+        and location of the object.
+
+        >> channel_data = pyuff.Uff("file.uff").read("channel_data")
+        >> channel_data.sound_speed = 1480.0
+        >> channel_data.save()  # Only sound_speed is written
+
+        Args:
+            ignore_missing_compulsory_fields (bool): See :meth:`write`.
+        """
+        if not isinstance(self._reader, H5Reader):
+            raise ValueError("Can only save an object that was read from a file.")
+        self.write(
+            self._reader.filepath,
+            self._reader.path,
+            ignore_missing_compulsory_fields=ignore_missing_compulsory_fields,
+            incremental=True,
+        )
+
     def copy(self) -> "Uff":
         """Return a (deep) copy of the Uff object.
 
@@ -225,6 +432,16 @@ class Uff:
         read from the file, it will not be copied. This is to avoid unintended eager
         loading of data.
 
+        Large arrays are not copied, but shared (copy-on-write) between the object and
+        the copy. The shared arrays (and the arrays they are views of) are made
+        read-only, including in this object and in any other references to them.
+        Assigning a new array to the field of either object does not affect the other.
+        To modify a shared array in place, first make a private copy of it using
+        :meth:`materialize`.
+
+        >> sweep = channel_data.copy()  # The data is shared, not copied
+        >> sweep.sound_speed = 1480.0  # Only affects the copy
+
         See :meth:`Uff.__deepcopy__` for implementation details.
 
         Returns:
@@ -232,18 +449,122 @@ class Uff:
         """
         return copy.deepcopy(self)
 
+    def materialize(self, *names: str) -> "Uff":
+        """Replace the read-only (e.g. shared by :meth:`copy`, or loaded while a cache
+        budget is set) arrays of the given fields, or of all loaded fields if no names
+        are given, with private, writeable copies. The fields are not marked as
+        modified, but are no longer evicted by the cache budget (see
+        :mod:`pyuff_ustb.caching`).
+
+        >> sweep = channel_data.copy().materialize("data")
+        >> sweep.data *= 2  # Does not affect channel_data
+
+        Returns:
+            Uff: The object itself.
+        """
+        for name in names or self._stored_fields:
+            value = self.__dict__.get(name)
+            if isinstance(value, np.ndarray) and not value.flags.writeable:
+                if caching._manager is not None:
+                    # Changes to the copy would be lost if it was evicted
+                    caching._manager.forget(self, name)
+                self.__dict__[name] = value.copy()
+        return self
+
     def __deepcopy__(self, memo):
         """Makes :class:`Uff` objects compatible with the ``copy`` module.
 
-        The ``copy`` module is part of the standard Python library."""
-        kwargs = {}
+        The ``copy`` module is part of the standard Python library.
+
+        Arrays of at least 64 KiB are shared instead of being copied (see :meth:`copy`).
+        They are made read-only, along with the array that owns their memory, so that
+        the shared memory can not be modified in place through any reference. Arrays
+        whose memory is not owned by another array (e.g. views of a memory map) are
+        copied instead."""
+        new = self.__class__(self._reader)
+        memo[id(self)] = new
         for name in self._get_fields(skip_dependent_properties=True):
             # Only add the field if it is loaded/cached. When using cached_property,
             # the field will be added to the object's __dict__ the first time it is
             # accessed.
-            if name in self.__dict__:
-                kwargs[name] = copy.deepcopy(getattr(self, name), memo)
-        return self.__class__(self._reader, **kwargs)
+            if name not in self.__dict__:
+                continue
+            value = self.__dict__[name]
+            if (
+                isinstance(value, np.ndarray)
+                and value.nbytes >= _COPY_ON_WRITE_MIN_BYTES
+                and value.dtype.kind != "O"
+                and _lock_array(value)
+            ):
+                memo[id(value)] = new.__dict__[name] = value
+            else:
+                new.__dict__[name] = copy.deepcopy(value, memo)
+        if self.modified_fields:
+            new.__dict__["_modified_fields"] = set(self.modified_fields)
+        return new
+
+    def pickle_cached_fields(self, *names: str) -> "Uff":
+        """Include the given cached fields (or all cached fields if no names are given)
+        when pickling the object, see :meth:`__reduce__`. Fields that are not cached
+        when the object is pickled are not included. For fields that hold objects (or
+        lists of objects), all the cached fields of those objects are included as well.
+
+        >> futures = [
+        >>     executor.submit(process, channel_data.pickle_cached_fields("probe"), frame)
+        >>     for frame in range(channel_data.N_frames)
+        >> ]
+
+        Returns:
+            Uff: The object itself.
+        """
+        names = names or self._stored_fields
+        self.__dict__["_pickled_cached_fields"] = names
+        for name in names:
+            for obj in _sub_objects(self.__dict__.get(name)):
+                if "_pickled_cached_fields" not in obj.__dict__:
+                    obj.pickle_cached_fields()
+        return self
+
+    def share(self, min_bytes: int = 4096) -> "SharedUff":
+        """Copy the loaded arrays of this object (recursively) into shared memory, for
+        use by worker processes. See :func:`pyuff_ustb.sharing.share`.
+
+        >> with eager_load(channel_data).share() as handle:
+        >>     executor.map(beamform_frame, [handle] * n_frames, frames)
+
+        Returns:
+            SharedUff: A picklable handle that workers can attach to. The caller must
+            release it when the workers are done.
+        """
+        from pyuff_ustb.sharing import share
+
+        return share(self, min_bytes)
+
+    def __reduce__(self):
+        """Makes :class:`Uff` objects that were read from a file cheap to pickle (e.g.
+        to send them to another process).
+
+        Only the class, the file and path, the fields that have been set (see
+        :attr:`modified_fields`) and the loaded sub-objects (which are pickled the same
+        way, so that changes to them are kept) are pickled. The other fields that were
+        loaded from the file are not, and are loaded lazily from the file again after
+        unpickling. Use :meth:`pickle_cached_fields` to include some of them anyway.
+
+        Objects that were not read from a file are pickled with all their fields."""
+        if not isinstance(self._reader, H5Reader):
+            return super().__reduce__()
+        names = set(self.modified_fields)
+        names.update(self.__dict__.get("_pickled_cached_fields", ()))
+        names.update(
+            name
+            for name in self._stored_fields
+            if next(_sub_objects(self.__dict__.get(name)), None) is not None
+        )
+        fields = {name: self.__dict__[name] for name in names if name in self.__dict__}
+        return (
+            _unpickle_uff,
+            (type(self), self._reader, fields, self.modified_fields),
+        )
 
     def _preprocess_write(self, name: str, value):
         return value
@@ -256,28 +577,12 @@ class Uff:
         assert not (skip_dependent_properties and only_dependent_properties)
         if type(self) is Uff:
             return self._reader.keys()
+        elif skip_dependent_properties:
+            return self._stored_fields
+        elif only_dependent_properties:
+            return self._dependent_fields
         else:
-            t = type(self)
-            return [
-                attr
-                for attr in dir(t)
-                if isinstance(
-                    getattr(t, attr),
-                    (
-                        (compulsory_property, optional_property)
-                        if skip_dependent_properties
-                        else (
-                            dependent_property
-                            if only_dependent_properties
-                            else (
-                                compulsory_property,
-                                optional_property,
-                                dependent_property,
-                            )
-                        )
-                    ),
-                )
-            ]
+            return tuple(self._schema)
 
     def __iter__(self):
         return iter(self._get_fields())
@@ -324,7 +629,46 @@ class Uff:
         return True
 
 
-def eager_load(obj: T) -> T:
+Uff._register_fields()
+
+
+def _lock_array(array: np.ndarray) -> bool:
+    """Make an array, and the array that owns its memory, read-only. Returns False (and
+    leaves the array unchanged) if its memory is not owned by an array."""
+    if not array.flags.owndata:
+        if not isinstance(array.base, np.ndarray) or not array.base.flags.owndata:
+            return False
+        array.base.flags.writeable = False
+    array.flags.writeable = False
+    return True
+
+
+def _sub_objects(value: Any) -> Iterator[Uff]:
+    "The :class:`Uff` objects in a field value (an object or a list of objects)."
+    if isinstance(value, Uff):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        yield from (v for v in value if isinstance(v, Uff))
+
+
+def _unpickle_uff(
+    cls: type, reader: Reader, fields: Dict[str, Any], modified_fields: FrozenSet[str]
+) -> Uff:
+    "Re-create a :class:`Uff` object pickled by :meth:`Uff.__reduce__`."
+    obj = cls(reader)
+    obj.__dict__.update(fields)
+    if modified_fields:
+        obj.__dict__["_modified_fields"] = set(modified_fields)
+    return obj
+
+
+def eager_load(
+    obj: T,
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    max_bytes: Optional[int] = None,
+    metadata_only: bool = False,
+) -> T:
     """Eagerly and recursively load all the lazy fields in an object.
 
     ``pyuff_ustb`` is lazily loaded by default, meaning that most fields are not read
@@ -334,28 +678,238 @@ def eager_load(obj: T) -> T:
     A new instance of the same type as the input object is returned, but with all its
     fields guaranteed to be loaded into memory.
 
+    The fields to load can be selected with glob patterns over their paths relative to
+    ``obj``, such as ``"probe/geometry"`` or ``"sequence/0/source"`` (items of lists are
+    indexed by number). ``*`` matches any part of a single path segment and ``**``
+    matches any number of segments. The fields that are not loaded are left to be
+    loaded lazily: the returned objects then keep the reader of the original objects.
+
+    >> metadata = eager_load(channel_data, metadata_only=True)
+    >> geometry = eager_load(channel_data, include=["probe/**", "sequence/*/source"])
+
     Args:
         obj (T): An object to eagerly load.
+        include (Optional[Sequence[str]]): If given, only the fields matching one of
+            these patterns (and everything inside them) are loaded.
+        exclude (Optional[Sequence[str]]): Fields matching one of these patterns (and
+            everything inside them) are not loaded, e.g. ``["**/data"]``.
+        max_bytes (Optional[int]): If given, arrays that are larger than this (as
+            stored in the file) are not loaded.
+        metadata_only (bool): Whether to only load the metadata, i.e. exclude the
+            ``data`` arrays of :class:`ChannelData` and :class:`BeamformedData` (same
+            as adding ``"**/data"`` to ``exclude``).
 
     Returns:
-        T: A new object of the same type as the input object, with all its fields
-            guaranteed to be loaded into memory.
+        T: A new object of the same type as the input object, with all its (selected)
+            fields guaranteed to be loaded into memory.
     """
+    if include is None and exclude is None and max_bytes is None and not metadata_only:
+        load = _eager_load_all
+    else:
+        if metadata_only:
+            exclude = [*(exclude or ()), "**/data"]
+        field_filter = _FieldFilter(include, exclude, max_bytes)
+        load = partial(
+            _eager_load, path=(), field_filter=field_filter, included=include is None
+        )
+    if isinstance(obj, Uff) and isinstance(obj._reader, H5Reader):
+        # Read all the fields using a single file handle
+        with keep_open(obj._reader.filepath):
+            return load(obj)
+    return load(obj)
+
+
+def _eager_load_all(obj: T) -> T:
     if isinstance(obj, Uff):
         kwargs = {}
         for name in obj._get_fields(skip_dependent_properties=True):
-            kwargs[name] = eager_load(getattr(obj, name))
-        return obj.__class__(**kwargs)
+            kwargs[name] = _eager_load_all(getattr(obj, name))
+        return _with_loaded_fields(obj, kwargs)
     elif isinstance(obj, (list, tuple)):
-        return [eager_load(o) for o in obj]
+        return [_eager_load_all(o) for o in obj]
     elif isinstance(obj, dict):
-        return {k: eager_load(v) for k, v in obj.items()}
+        return {k: _eager_load_all(v) for k, v in obj.items()}
     else:
         return obj
 
 
+def _with_loaded_fields(
+    obj: TUff, fields: Dict[str, Any], reader: Optional[Reader] = None
+) -> TUff:
+    """Return a new object of the same type as ``obj`` with the given fields. The fields
+    are put in ``__dict__`` (like cached fields), so that only the fields that are
+    modified in ``obj`` are modified in the new object."""
+    new = obj.__class__(reader)
+    new.__dict__.update(fields)
+    if obj.modified_fields:
+        new.__dict__["_modified_fields"] = set(obj.modified_fields)
+    return new
+
+
+def _eager_load(
+    obj: T, path: Tuple[str, ...], field_filter: "_FieldFilter", included: bool
+) -> T:
+    "Like eager_load, but only loads the fields selected by field_filter."
+    if isinstance(obj, Uff):
+        fields = {}
+        skipped = False
+        for name in obj._get_fields(skip_dependent_properties=True):
+            field_path = (*path, name)
+            action = field_filter.select(obj, name, field_path, included)
+            if action is None:
+                skipped = True
+                continue
+            fields[name] = _eager_load(
+                getattr(obj, name), field_path, field_filter, action
+            )
+        # Keep the reader so that the skipped fields can still be loaded lazily
+        return _with_loaded_fields(obj, fields, obj._reader if skipped else None)
+    elif isinstance(obj, (list, tuple)):
+        return [
+            _eager_load(o, (*path, str(i)), field_filter, included)
+            for i, o in enumerate(obj)
+        ]
+    elif isinstance(obj, dict):
+        return {
+            k: _eager_load(v, (*path, str(k)), field_filter, included)
+            for k, v in obj.items()
+        }
+    else:
+        return obj
+
+
+# Type hints of fields that never contain other fields
+_LEAF_TYPE_HINTS = (float, int, str, np.ndarray, Optional[str])
+
+
+class _FieldFilter:
+    "Selects the fields to load in :func:`eager_load`."
+
+    def __init__(
+        self,
+        include: Optional[Sequence[str]],
+        exclude: Optional[Sequence[str]],
+        max_bytes: Optional[int],
+    ):
+        self.include = [p.strip("/").split("/") for p in include or ()]
+        self.exclude = [p.strip("/").split("/") for p in exclude or ()]
+        self.max_bytes = max_bytes
+
+    def select(
+        self, obj: Uff, name: str, path: Tuple[str, ...], included: bool
+    ) -> Optional[bool]:
+        """Return True if the field should be loaded with everything inside it, False if
+        it should only be loaded to select fields inside it, or None if it should not
+        be loaded."""
+        if any(_match_path(pattern, path) for pattern in self.exclude):
+            return None
+        if self.max_bytes is not None:
+            nbytes = _stored_nbytes(obj, name)
+            if nbytes is not None and nbytes > self.max_bytes:
+                return None
+        if included or any(_match_path(pattern, path) for pattern in self.include):
+            return True
+        if _may_contain_fields(obj, name) and any(
+            _match_path(pattern, path, partial=True) for pattern in self.include
+        ):
+            return False
+        return None
+
+
+def _match_path(
+    pattern: Sequence[str], path: Sequence[str], partial: bool = False
+) -> bool:
+    """Whether a path matches a glob pattern (both split into segments). If partial is
+    True, also return True if the pattern may match paths inside the path.
+
+    >>> _match_path(["**", "data"], ["channel_data", "data"])
+    True
+    >>> _match_path(["sequence", "*", "source"], ["sequence", "3"], partial=True)
+    True
+    """
+    if not pattern:
+        return not path
+    if pattern[0] == "**":
+        return _match_path(pattern[1:], path, partial) or (
+            bool(path) and _match_path(pattern, path[1:], partial)
+        )
+    if not path:
+        return partial
+    return fnmatch.fnmatchcase(path[0], pattern[0]) and _match_path(
+        pattern[1:], path[1:], partial
+    )
+
+
+def _may_contain_fields(obj: Uff, name: str) -> bool:
+    "Whether the value of a field may be an object (or list of objects) with fields."
+    if name in obj.__dict__:
+        return isinstance(obj.__dict__[name], (Uff, list, tuple, dict))
+    field = obj._schema.get(name)
+    return field is None or field.type_hint not in _LEAF_TYPE_HINTS
+
+
+def _stored_nbytes(obj: Uff, name: str) -> Optional[int]:
+    "The size of an array field (as stored in the file), or None if unknown."
+    if name in obj.__dict__:
+        value = obj.__dict__[name]
+        return value.nbytes if isinstance(value, np.ndarray) else None
+    if not isinstance(obj._reader, H5Reader):
+        return None
+    try:
+        with obj._reader[name].read() as node:
+            if isinstance(node, h5py.Group) and "real" in node and "imag" in node:
+                return _dataset_nbytes(node["real"]) + _dataset_nbytes(node["imag"])
+            if isinstance(node, h5py.Dataset):
+                return _dataset_nbytes(node)
+    except ReaderKeyError:
+        pass
+    return None
+
+
+def _dataset_nbytes(dataset: h5py.Dataset) -> int:
+    return dataset.size * dataset.dtype.itemsize
+
+
+class ArrayPlaceholder:
+    """A stand-in for an array field that is too big to hold in memory.
+
+    :func:`write_object` creates an empty dataset with the given shape and dtype for an
+    :class:`ArrayPlaceholder`. The dataset can then be filled in block by block using
+    :func:`write_array_slice`:
+
+    >> data = ArrayPlaceholder((n_pixels, 1, 1, n_frames), np.float32)
+    >> pyuff.BeamformedData(scan=scan, data=data).write(filepath, "beamformed_data")
+    >> with h5py.File(filepath, "a") as hf:
+    ..     for i, frame in enumerate(frames):
+    ..         write_array_slice(hf, "beamformed_data/data", (..., i), frame)
+    """
+
+    def __init__(self, shape: Sequence[int], dtype: Any = np.float32):
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def T(self) -> "ArrayPlaceholder":
+        return ArrayPlaceholder(self.shape[::-1], self.dtype)
+
+    @property
+    def real(self) -> "ArrayPlaceholder":
+        return ArrayPlaceholder(self.shape, np.empty(0, self.dtype).real.dtype)
+
+    @property
+    def imag(self) -> "ArrayPlaceholder":
+        return self.real
+
+    def __repr__(self) -> str:
+        return f"ArrayPlaceholder(shape={self.shape}, dtype={self.dtype})"
+
+
 def _present_field_value(value):
-    if isinstance(value, np.ndarray):
+    if isinstance(value, (np.ndarray, ArrayPlaceholder)):
         return f"<Array shape={value.shape} dtype={value.dtype}>"
     elif isinstance(value, Uff):
         return f"{value.__class__.__name__}(<...>)"
@@ -393,43 +947,262 @@ def write_object(
     location: Union[str, Sequence[str]],
     overwrite: bool = False,
     ignore_missing_compulsory_fields: bool = False,
+    deduplicate: Union[bool, str] = True,
+    incremental: bool = False,
 ):
     """Write an object to a HDF5 file.
 
+    All the groups, datasets and attributes of the object are planned first (see
+    :class:`~pyuff_ustb.objects.write_plan.WritePlan`), and then created in a batch.
+    This also means that nothing is written if planning fails, e.g. because of a
+    missing compulsory field. If ``deduplicate`` is True, sub-objects that occur
+    multiple times are written once and hard linked to from their other locations (see
+    :class:`~pyuff_ustb.objects.write_plan.WritePlan`). If ``incremental`` is
+    True and the location exists, only the modified fields are written (see
+    :func:`update_object`).
+
     See :meth:`Uff.write` for more details."""
-    from pyuff_ustb.common import get_name_from_class
+    from pyuff_ustb.objects.write_plan import WritePlan
 
     if isinstance(location, str):
         location = location.split("/")
 
     location_str = "/".join(location)
+    if incremental and isinstance(obj, Uff) and location_str in hf:
+        update_object(hf, obj, location, ignore_missing_compulsory_fields, deduplicate)
+        return
+    if location_str in hf and not overwrite:
+        raise ValueError(
+            f"Location '{location_str}' already exists in the file '{hf.filename}'. Use \
+overwrite=True to overwrite it."
+        )
+
+    plan = WritePlan(deduplicate)
+    plan_object(plan, obj, location, ignore_missing_compulsory_fields)
     if location_str in hf:
-        if overwrite:
-            # Delete the existing value so that we can write to the location
-            del hf[location_str]
-        else:
+        # Only delete the existing value once the new value has been planned, so that
+        # it is kept if planning fails
+        del hf[location_str]
+    plan.execute(hf)
+
+
+def update_object(
+    hf: h5py.File,
+    obj: "Uff",
+    location: Sequence[str],
+    ignore_missing_compulsory_fields: bool = False,
+    deduplicate: Union[bool, str] = True,
+):
+    """Write the modified fields of an object (and of its loaded sub-objects) to the
+    existing location of the object in a HDF5 file. Fields that have not been modified
+    are left untouched in the file.
+
+    All the modified fields are planned before anything is written, so nothing is
+    written if planning fails, e.g. because of a missing compulsory field.
+
+    A modified array field is written in place if the existing dataset has the same
+    shape and dtype. Otherwise, the field is deleted and written again.
+
+    Groups that are hard linked to from multiple paths (see
+    :class:`~pyuff_ustb.objects.write_plan.WritePlan`) are only updated in place if
+    the same object is found at all of the paths, so that the update applies to all of
+    them. Otherwise, the group is copied first, so that the other paths are not
+    affected. The modified fields of all the objects are reset afterwards."""
+    from pyuff_ustb.objects.write_plan import WritePlan
+
+    visited = set()  # (id(obj), address of the group in the file)
+    writes: List[Tuple[str, "WritePlan"]] = []
+
+    def update(obj: Uff, location: Sequence[str]):
+        group = hf["/".join(location)]
+        key = (id(obj), h5py.h5o.get_info(group.id).addr)
+        if key in visited:
+            return
+        visited.add(key)
+        updated_objects.append(obj)
+        for name in obj._stored_fields:
+            field_location = [*location, name]
+            if name in obj.modified_fields:
+                plan_field(obj, name, field_location)
+            elif name in obj.__dict__:
+                # Only sub-objects that have been loaded may have been modified
+                value = obj.__dict__[name]
+                if isinstance(value, Uff):
+                    update(value, field_location)
+                elif isinstance(value, (list, tuple)) and value:
+                    item_locations = [
+                        "/".join([*field_location, _item_name(name, i)])
+                        for i in range(len(value))
+                    ]
+                    list_location = "/".join(field_location)
+                    if len(hf.get(list_location, ())) == len(value) and all(
+                        item_location in hf for item_location in item_locations
+                    ):
+                        for item, item_location in zip(value, item_locations):
+                            if isinstance(item, Uff):
+                                update(item, item_location.split("/"))
+                    else:
+                        # The list does not match the file (e.g. items were added)
+                        plan_field(obj, name, field_location)
+
+    def plan_field(obj: Uff, name: str, location: Sequence[str]):
+        value = getattr(obj, name)
+        if (
+            value is None
+            and obj._schema[name].kind is FieldKind.compulsory
+            and not ignore_missing_compulsory_fields
+        ):
             raise ValueError(
-                f"Location '{location_str}' already exists in the file '{hf.filename}'. Use \
-overwrite=True to overwrite it."
+                f"The compulsory field '{name}' is set to None. Compulsory fields may "
+                "not be None when writing an object to an UFF file."
             )
+        plan = WritePlan(deduplicate)
+        plan_object(
+            plan,
+            obj._preprocess_write(name, value),
+            location,
+            ignore_missing_compulsory_fields,
+        )
+        writes.append(("/".join(location), plan))
+
+    updated_objects: List[Uff] = []
+    update(obj, location)
+    root = "/".join(location)
+    for field_location, plan in writes:
+        _unshare_groups(hf, obj, root, field_location)
+        _write_field(hf, plan, field_location)
+    for o in updated_objects:
+        o.__dict__.pop("_modified_fields", None)
+
+
+def _unshare_groups(hf: h5py.File, obj: "Uff", root: str, location: str):
+    """Copy the groups on the path from ``root`` (where ``obj`` is written) to
+    ``location`` that are hard linked to from other paths, unless the same object is
+    found at all of the paths, so that writing to ``location`` does not affect the
+    other paths."""
+    parts = location[len(root) + 1 :].split("/")[:-1]
+    for i in range(len(parts) + 1):
+        path = "/".join([root, *parts[:i]])
+        group = hf[path]
+        if h5py.h5o.get_info(group.id).rc == 1:
+            continue
+        if SHARED_OBJECT_ATTR in group.attrs and _is_same_object_everywhere(
+            hf[root], obj, h5py.h5o.get_info(group.id)
+        ):
+            continue
+        parent, name = path.rsplit("/", 1) if "/" in path else ("/", path)
+        del hf[path]
+        hf.copy(group, hf[parent], name)
+        if SHARED_OBJECT_ATTR in hf[path].attrs:
+            del hf[path].attrs[SHARED_OBJECT_ATTR]
+
+
+def _is_same_object_everywhere(
+    root_group: h5py.Group, obj: "Uff", info: h5py.h5o.ObjInfo
+) -> bool:
+    """Whether all the hard links to the object described by ``info`` are within
+    ``root_group`` (where ``obj`` is written), and the same Python object is found at
+    all of them."""
+    paths = _link_paths(root_group, info.addr)
+    if len(paths) != info.rc:
+        return False  # There are links from outside of the object
+    found = [_find_object(obj, path) for path in paths]
+    return found[0] is not None and all(o is found[0] for o in found)
+
+
+def _link_paths(group: h5py.Group, addr: int) -> List[str]:
+    """The paths (relative to ``group``) of the hard links to the object at address
+    ``addr`` in the file, one path per link."""
+    paths = []
+    visited = set()
+
+    def visit(group: h5py.Group, prefix: str):
+        for name in group:
+            if not isinstance(group.get(name, getlink=True), h5py.HardLink):
+                continue
+            child = group[name]
+            child_addr = h5py.h5o.get_info(child.id).addr
+            if child_addr == addr:
+                paths.append(prefix + name)
+            # Groups that are linked to multiple times are only visited once, so that
+            # every link is only counted once
+            if isinstance(child, h5py.Group) and child_addr not in visited:
+                visited.add(child_addr)
+                visit(child, prefix + name + "/")
+
+    visit(group, "")
+    return paths
+
+
+def _find_object(obj: Any, path: str) -> Any:
+    "Return the field (or list item) of ``obj`` at ``path``, or None if there is none."
+    for name in path.split("/"):
+        if isinstance(obj, Uff) and name in obj._stored_fields:
+            obj = getattr(obj, name)
+        elif isinstance(obj, (list, tuple)) and name.rsplit("_", 1)[-1].isdigit():
+            i = int(name.rsplit("_", 1)[-1]) - 1
+            obj = obj[i] if i < len(obj) else None
+        else:
+            return None
+    return obj
+
+
+def _write_field(hf: h5py.File, plan: "WritePlan", location: str):
+    "Write a planned field to ``location``, in place if possible."
+    if len(plan) == 1 and location in hf:
+        kind, _, data, attrs = plan.nodes[0]
+        dataset = hf[location]
+        if (
+            kind == "dataset"
+            and isinstance(dataset, h5py.Dataset)
+            and not isinstance(data, ArrayPlaceholder)
+        ):
+            data = np.asarray(data)
+            if data.shape == dataset.shape and data.dtype == dataset.dtype:
+                dataset[...] = data
+                return
+    if location in hf:
+        del hf[location]
+    plan.execute(hf)
+
+
+def plan_object(
+    plan: "WritePlan",
+    obj: Any,
+    location: Sequence[str],
+    ignore_missing_compulsory_fields: bool = False,
+):
+    """Add the groups and datasets needed to write an object (recursively) to the
+    plan. See :func:`write_object`."""
+    from pyuff_ustb.common import get_name_from_class
+    from pyuff_ustb.objects.point_array import PointArray, plan_point_array
+
+    location_str = "/".join(location)
 
     if isinstance(obj, Uff):
+        duplicate = plan.find_duplicate(obj, location)
+        if duplicate is not None:
+            plan.add_link(location_str, duplicate)
+            return
+        start = len(plan)
+
         name = obj._attrs.get("name", location[-1])
-        group = hf.create_group(location_str)
-        for k in obj._attrs:
-            # Copy over attributes
-            group.attrs[k] = obj._attrs[k]
-        group.attrs["class"] = get_name_from_class(type(obj))
-        group.attrs["name"] = name
-        group.attrs["array"] = np.array([0])  # False
-        group.attrs["size"] = np.array([1, 1])
+        # Copy over attributes
+        attrs = dict(obj._attrs)
+        # Whether the object is shared is decided by the plan, see WritePlan.execute
+        attrs.pop(SHARED_OBJECT_ATTR, None)
+        attrs["class"] = get_name_from_class(type(obj))
+        attrs["name"] = name
+        attrs["array"] = _FALSE
+        attrs["size"] = _SCALAR_SIZE
+        plan.add_group(location_str, attrs)
 
         t = type(obj)
         for name in obj._get_fields(skip_dependent_properties=True):
             value = getattr(obj, name)
             if (
                 value is None
-                and isinstance(getattr(t, name), compulsory_property)
+                and t._schema[name].kind is FieldKind.compulsory
                 and not ignore_missing_compulsory_fields
             ):
                 raise ValueError(
@@ -438,48 +1211,56 @@ may not be None when writing an object to an UFF file. To ignore this error and
 the object anyway, set ignore_missing_compulsory_fields=True."""
                 )
             value = obj._preprocess_write(name, value)
-            write_object(
-                hf,
-                value,
-                [*location, name],
-                overwrite,
-                ignore_missing_compulsory_fields,
+            plan_object(
+                plan, value, [*location, name], ignore_missing_compulsory_fields
             )
+        plan.deduplicate(obj, location, start)
 
     elif isinstance(obj, str):
         name = location[-1]
         int_chars = np.array([ord(c) for c in obj], dtype=np.uint16)
         # Strings are usually stored as (N,1) arrays in UFF files, let's do the same.
         int_chars = np.expand_dims(int_chars, 1)
-        dataset = hf.create_dataset(location_str, data=int_chars)
-        dataset.attrs["class"] = "char"
-        dataset.attrs["name"] = name
+        plan.add_dataset(location_str, int_chars, {"class": "char", "name": name})
 
-    elif isinstance(obj, (int, float, np.ndarray)):
+    elif isinstance(obj, (int, float, np.ndarray, ArrayPlaceholder)):
         name = location[-1]
-        # We always write *.attrs["class"] = "single". I don't think it matters.
+        matlab_class = _matlab_class(obj)
         if np.iscomplexobj(obj):
-            group = hf.create_group(location_str)
-            group.attrs["class"] = "single"
-            group.attrs["name"] = name
-            group.attrs["complex"] = np.array([1])  # True
-            group.attrs["imaginary"] = np.array([0])  # False
-
-            real_dataset = group.create_dataset("real", data=obj.real)
-            real_dataset.attrs["imaginary"] = np.array([0])  # False
-            real_dataset.attrs["class"] = "single"
-            real_dataset.attrs["name"] = name
-
-            imag_dataset = group.create_dataset("imag", data=obj.imag)
-            imag_dataset.attrs["imaginary"] = np.array([1])  # True
-            imag_dataset.attrs["class"] = "single"
-            imag_dataset.attrs["name"] = name
+            plan.add_group(
+                location_str,
+                {
+                    "class": matlab_class,
+                    "name": name,
+                    "complex": _TRUE,
+                    "imaginary": _FALSE,
+                },
+            )
+            plan.add_dataset(
+                location_str + "/real",
+                obj.real,
+                {"imaginary": _FALSE, "class": matlab_class, "name": name},
+            )
+            plan.add_dataset(
+                location_str + "/imag",
+                obj.imag,
+                {"imaginary": _TRUE, "class": matlab_class, "name": name},
+            )
         else:
-            dataset = hf.create_dataset(location_str, data=obj)
-            dataset.attrs["class"] = "single"
-            dataset.attrs["name"] = name
-            dataset.attrs["complex"] = np.array([0])  # False
-            dataset.attrs["imaginary"] = np.array([0])  # False
+            plan.add_dataset(
+                location_str,
+                obj,
+                {
+                    "class": matlab_class,
+                    "name": name,
+                    "complex": _FALSE,
+                    "imaginary": _FALSE,
+                },
+            )
+
+    elif isinstance(obj, PointArray):
+        if len(obj) > 0:
+            plan_point_array(plan, obj, location)
 
     elif isinstance(obj, (list, tuple)):
         # Ignore empty sequences
@@ -494,53 +1275,46 @@ the object anyway, set ignore_missing_compulsory_fields=True."""
 
         # If it is a list of strings then it is a cell
         if isinstance(first_obj, str):
-            group = hf.create_group(location_str)
-            group.attrs["class"] = "cell"
-            group.attrs["name"] = name
-            group.attrs["array"] = np.array([1])  # True
-            group.attrs["size"] = np.array([1, len(obj)])
-            for i, v in enumerate(obj):
-                write_object(
-                    hf,
-                    v,
-                    [*location, _item_name(name, i)],
-                    overwrite,
-                    ignore_missing_compulsory_fields,
-                )
+            class_name = "cell"
         # Otherwise it is a list of Uff objects
         else:
-            group = hf.create_group(location_str)
-            group.attrs["class"] = get_name_from_class(type(first_obj))
-            group.attrs["name"] = name
-            group.attrs["array"] = np.array([1])  # True
-            group.attrs["size"] = np.array([1, len(obj)])
-            for i, v in enumerate(obj):
+            class_name = get_name_from_class(type(first_obj))
+            for v in obj:
                 assert isinstance(
                     v, Uff
                 ), "Assume list items are always Uffs. Create a issue on \
     the repository if you think this is not the case."
-                write_object(
-                    hf,
-                    v,
-                    [*location, _item_name(name, i)],
-                    overwrite,
-                    ignore_missing_compulsory_fields,
-                )
+        plan.add_group(
+            location_str,
+            {
+                "class": class_name,
+                "name": name,
+                "array": _TRUE,
+                "size": np.array([1, len(obj)]),
+            },
+        )
+        for i, v in enumerate(obj):
+            plan_object(
+                plan,
+                v,
+                [*location, _item_name(name, i)],
+                ignore_missing_compulsory_fields,
+            )
 
     elif isinstance(obj, Enum):
         name = location[-1]
-        dataset = hf.create_dataset(location_str, data=np.array([[obj.value]]))
-        dataset.attrs["class"] = get_name_from_class(type(obj))
-        dataset.attrs["name"] = name
+        plan.add_dataset(
+            location_str,
+            np.array([[obj.value]]),
+            {"class": get_name_from_class(type(obj)), "name": name},
+        )
 
     elif obj is None:
         return  # Do nothing
 
     elif hasattr(obj, "__array__"):
         obj = np.array(obj)
-        return write_object(
-            hf, obj, location, overwrite, ignore_missing_compulsory_fields
-        )
+        return plan_object(plan, obj, location, ignore_missing_compulsory_fields)
 
     else:
         name = location[-1]
@@ -551,6 +1325,79 @@ repository."
         )
 
 
+# Attribute values shared by all written objects
+_FALSE = np.array([0])
+_TRUE = np.array([1])
+_SCALAR_SIZE = np.array([1, 1])
+
+# The MATLAB class names of numeric dtypes, written to the "class" attribute
+_MATLAB_CLASSES = {
+    np.dtype(np.float64): "double",
+    np.dtype(np.float32): "single",
+    np.dtype(np.int8): "int8",
+    np.dtype(np.int16): "int16",
+    np.dtype(np.int32): "int32",
+    np.dtype(np.int64): "int64",
+    np.dtype(np.uint8): "uint8",
+    np.dtype(np.uint16): "uint16",
+    np.dtype(np.uint32): "uint32",
+    np.dtype(np.uint64): "uint64",
+    np.dtype(np.bool_): "logical",
+}
+
+
+def _matlab_class(value: Any) -> str:
+    """The MATLAB class name of a number or array. Complex values have the class of
+    their real and imaginary parts, and other dtypes (e.g. float16) are "double".
+
+    >>> _matlab_class(np.zeros(3, np.int16)), _matlab_class(1.0)
+    ('int16', 'double')
+    >>> _matlab_class(ArrayPlaceholder((2, 2), np.complex64))
+    'single'
+    """
+    dtype = (
+        value.dtype if isinstance(value, ArrayPlaceholder) else np.result_type(value)
+    )
+    if dtype.kind == "c":
+        dtype = np.empty(0, dtype).real.dtype
+    return _MATLAB_CLASSES.get(dtype.newbyteorder("="), "double")
+
+
+def write_array_slice(
+    hf: h5py.File,
+    location: Union[str, Sequence[str]],
+    key: Any,
+    value: np.ndarray,
+    transpose: bool = False,
+):
+    """Write ``value`` to a hyperslab of an array that has already been written to a
+    HDF5 file, for example as an :class:`ArrayPlaceholder`.
+
+    Args:
+        hf (h5py.File): The file to write to.
+        location (Union[str, Sequence[str]]): The location of the array in the file.
+        key: The index of the hyperslab to write to (anything h5py can index a dataset
+            with).
+        value (np.ndarray): The values to write.
+        transpose (bool): Whether the array is stored transposed in the file (see
+            :func:`~pyuff_ustb.readers.read_array`). If True, ``key`` and ``value``
+            refer to the transposed array.
+    """
+    if not isinstance(location, str):
+        location = "/".join(location)
+    node = hf[location]
+    if transpose:
+        dataset = node["real"] if isinstance(node, h5py.Group) else node
+        key = transpose_key(key, dataset.ndim)
+        value = np.asarray(value).T
+    if isinstance(node, h5py.Group):
+        # Complex arrays are stored as a group with a real and an imaginary dataset
+        node["real"][key] = np.real(value)
+        node["imag"][key] = np.imag(value)
+    else:
+        node[key] = value
+
+
 if __name__ == "__main__":
     import doctest
     import os
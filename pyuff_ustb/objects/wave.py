@@ -60,7 +60,7 @@ class Wave(Uff):
         "POINT class"
         from pyuff_ustb.objects.point import Point
 
-        return Point(self._reader["source"])
+        return util.read_uff(self._reader["source"], Point)
 
     @compulsory_property
     def origin(self) -> "Point":
@@ -68,7 +68,7 @@ class Wave(Uff):
         from pyuff_ustb.objects.point import Point
 
         if "origin" in self._reader:
-            return Point(self._reader["origin"])
+            return util.read_uff(self._reader["origin"], Point)
         return Point(
             distance=0.0,
             azimuth=0.0,
@@ -80,7 +80,7 @@ class Wave(Uff):
         "APODIZATION class"
         from pyuff_ustb.objects.apodization import Apodization
 
-        return Apodization(self._reader["apodization"])
+        return util.read_uff(self._reader["apodization"], Apodization)
 
     # Optional properties
     @optional_property
@@ -149,3 +149,29 @@ class Wave(Uff):
         raise NotImplementedError(
             "Apodization computation is outside the scope of pyuff_ustb"
         )
+
+    def _transmit_distance(self, xyz: np.ndarray) -> np.ndarray:
+        """Return the distance the wave has travelled since t0 (the time the wave
+        passes through the origin) when it reaches each of the points in ``xyz``, an
+        array of shape ``(N_points, 3)``. Divide by the sound speed to get the transmit
+        time of flight."""
+        from pyuff_ustb.objects.wavefront import Wavefront
+
+        x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+        if self.wavefront == Wavefront.photoacoustic:
+            return np.zeros(len(xyz))
+        source = self.source
+        if self.wavefront == Wavefront.plane or np.isinf(source.distance):
+            az, el = source.azimuth, source.elevation
+            return (
+                x * np.sin(az) * np.cos(el)
+                + y * np.sin(el)
+                + z * np.cos(az) * np.cos(el)
+            )
+        # Spherical wave: diverging if the source is behind the probe, and converging
+        # towards (and diverging after) the source if it is in front of it.
+        distance_to_source = np.sqrt(
+            (x - source.x) ** 2 + (y - source.y) ** 2 + (z - source.z) ** 2
+        )
+        source_to_origin = np.sign(source.z) * np.abs(source.distance)
+        return np.sign(z - source.z) * distance_to_source + source_to_origin
@@ -0,0 +1,245 @@
+"""Batched writing of UFF objects to HDF5 files.
+
+:func:`~pyuff_ustb.objects.uff.write_object` first plans all the groups, datasets and
+attributes of an object (recursively) in a :class:`WritePlan`, and then creates them in
+one go using h5py's low-level API. Compared to creating each node and attribute through
+the high-level API, this avoids checking whether every location already exists, and
+re-uses the HDF5 types and dataspaces of identical attribute values (such as the
+``class``, ``array`` and ``size`` attributes that are set on every object).
+
+Sub-objects that occur multiple times (for example the probe instance that every wave
+in a sequence refers to) are only written once. Further occurrences are written as HDF5
+hard links to the first one, which are transparent to readers (including USTB/MATLAB).
+The linked group is marked with an attribute, so that pyuff_ustb reads it back as a
+single instance. Optionally, different objects with identical content are also linked,
+see :class:`WritePlan`.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.readers.base import SHARED_OBJECT_ATTR
+
+# Attribute values are either strings (stored as variable-length UTF-8 strings, like
+# h5py does) or small integer arrays.
+AttrValue = Union[str, np.ndarray]
+
+
+# Sub-objects with more data than this are not compared by content when deduplicating
+_MAX_DEDUPLICATION_BYTES = 2**24
+
+
+class WritePlan:
+    """The groups, datasets (with their attributes) and hard links to create, in order.
+
+    Args:
+        deduplicate (Union[bool, str]): If True, a sub-object that occurs multiple times
+            (by identity) is only written once (see :meth:`find_duplicate`). If
+            ``"content"``, different sub-objects with identical content are also
+            written only once (see :meth:`deduplicate`). Note that such objects are
+            read back as separate instances that share their storage in the file.
+    """
+
+    def __init__(self, deduplicate: Union[bool, str] = True):
+        if deduplicate not in (True, False, "content"):
+            raise ValueError(
+                f"deduplicate must be True, False or 'content', got {deduplicate!r}."
+            )
+        self.nodes: List[Tuple[str, str, Any, Dict[str, AttrValue]]] = []
+        self.deduplicate_objects = bool(deduplicate)
+        self.deduplicate_content = deduplicate == "content"
+        # The location of each planned object, by id(obj) and name. The object is kept
+        # in the dict so that its id can not be re-used by another object.
+        self._locations_by_object: Dict[Tuple[int, str], Tuple[Any, str]] = {}
+        self._locations_by_digest: Dict[bytes, str] = {}
+        # The kinds of links ("identity" or "content") to each link target
+        self._link_kinds: Dict[str, Set[str]] = {}
+
+    def add_group(self, location: str, attrs: Dict[str, Any]):
+        self.nodes.append(("group", location, None, attrs))
+
+    def add_dataset(self, location: str, data: Any, attrs: Dict[str, Any]):
+        """Add a dataset. ``data`` is either an array-like or an
+        :class:`~pyuff_ustb.objects.uff.ArrayPlaceholder`, for which an empty dataset is
+        created."""
+        self.nodes.append(("dataset", location, data, attrs))
+
+    def add_link(self, location: str, target: str, kind: str = "identity"):
+        """Add a hard link at ``location`` to the (already planned) ``target`` location.
+        ``kind`` is ``"identity"`` if both locations hold the same object, and
+        ``"content"`` if they hold different objects with the same content."""
+        self.nodes.append(("link", location, target, {}))
+        self._link_kinds.setdefault(target, set()).add(kind)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def find_duplicate(self, obj: Any, location: Sequence[str]) -> Optional[str]:
+        """Return the location where the same object (by identity) has already been
+        planned with the same name, or None."""
+        if not self.deduplicate_objects:
+            return None
+        planned = self._locations_by_object.get((id(obj), location[-1]))
+        return planned[1] if planned is not None else None
+
+    def deduplicate(self, obj: Any, location: Sequence[str], start: int):
+        """Register the nodes planned for ``obj`` (from index ``start``), so that later
+        occurrences of the same object are linked to them. When deduplicating by
+        content, and identical nodes have already been planned elsewhere, the nodes are
+        replaced with a hard link instead."""
+        if not self.deduplicate_objects:
+            return
+        location_str = "/".join(location)
+        # There is nothing to deduplicate against for the first object
+        if self.deduplicate_content and start > 0:
+            digest = self._digest(location_str, start)
+            if digest is not None:
+                target = self._locations_by_digest.setdefault(digest, location_str)
+                if target != location_str:
+                    del self.nodes[start:]
+                    self.add_link(location_str, target, kind="content")
+                    # Later occurrences of obj are planned (and linked by content)
+                    # again, so that the target is not marked as a shared instance
+                    return
+        self._locations_by_object[(id(obj), location[-1])] = (obj, location_str)
+
+    def _digest(self, location: str, start: int) -> Optional[bytes]:
+        "A hash of the nodes from ``start``, relative to ``location``."
+        from pyuff_ustb.objects.uff import ArrayPlaceholder
+
+        h = hashlib.blake2b()
+        nbytes = 0
+        for kind, node_location, data, attrs in self.nodes[start:]:
+            h.update(f"{kind}:{node_location[len(location):]}:".encode("utf-8"))
+            if kind == "link":
+                h.update(data.encode("utf-8"))
+            elif kind == "dataset":
+                if isinstance(data, ArrayPlaceholder):
+                    return None  # The content is not known yet
+                data = np.asarray(data, order="C")
+                nbytes += data.nbytes
+                if nbytes > _MAX_DEDUPLICATION_BYTES:
+                    return None
+                h.update(f"{data.dtype.str}{data.shape}".encode("utf-8"))
+                h.update(
+                    data.tobytes() if data.dtype.kind != "O" else repr(data).encode()
+                )
+            for name in sorted(attrs):
+                value = attrs[name]
+                if not isinstance(value, str):
+                    value = np.asarray(value)
+                    value = f"{value.dtype.str}{value.shape}{value.tolist()}"
+                h.update(f"{name}={value};".encode("utf-8"))
+        return h.digest()
+
+    def execute(self, hf: h5py.File):
+        """Create all the planned groups and datasets in the file.
+
+        Groups that are only linked to by occurrences of the same object are marked
+        with the :data:`~pyuff_ustb.readers.base.SHARED_OBJECT_ATTR` attribute. Groups
+        that are also linked to by other objects (with the same content) are not, as
+        they would otherwise be read back as a single instance."""
+        shared = {
+            target
+            for target, kinds in self._link_kinds.items()
+            if kinds == {"identity"}
+        }
+        writer = _LowLevelWriter(hf)
+        for kind, location, data, attrs in self.nodes:
+            if kind == "group":
+                obj_id = writer.create_group(location)
+                if location in shared:
+                    attrs = {**attrs, SHARED_OBJECT_ATTR: np.array([1])}
+            elif kind == "dataset":
+                obj_id = writer.create_dataset(location, data)
+            else:
+                writer.create_link(location, data)
+                continue
+            for name, value in attrs.items():
+                writer.set_attr(obj_id, name, value)
+
+
+class _LowLevelWriter:
+    def __init__(self, hf: h5py.File):
+        self.hf = hf
+        self.lcpl = h5py.h5p.create(h5py.h5p.LINK_CREATE)
+        self.lcpl.set_create_intermediate_group(True)
+        self.lcpl.set_char_encoding(h5py.h5t.CSET_UTF8)
+        self.scalar_space = h5py.h5s.create(h5py.h5s.SCALAR)
+        self.string_type = h5py.h5t.py_create(h5py.string_dtype(), logical=True)
+        self._types: Dict[np.dtype, h5py.h5t.TypeID] = {}
+        self._spaces: Dict[tuple, h5py.h5s.SpaceID] = {}
+        self._strings: Dict[str, np.ndarray] = {}
+
+    def create_group(self, location: str) -> h5py.h5g.GroupID:
+        return h5py.h5g.create(self.hf.id, location.encode("utf-8"), lcpl=self.lcpl)
+
+    def create_link(self, location: str, target: str):
+        self.hf.id.links.create_hard(
+            location.encode("utf-8"), self.hf.id, target.encode("utf-8"), lcpl=self.lcpl
+        )
+
+    def create_dataset(self, location: str, data: Any) -> h5py.h5d.DatasetID:
+        from pyuff_ustb.objects.uff import ArrayPlaceholder
+
+        if isinstance(data, ArrayPlaceholder):
+            # Empty datasets are rare, so let h5py handle them (e.g. fill values)
+            return self.hf.create_dataset(
+                location, shape=data.shape, dtype=data.dtype
+            ).id
+        data = np.asarray(data, order="C")
+        if data.dtype.kind in "OSU":
+            # Strings and objects need h5py's type conversion
+            return self.hf.create_dataset(location, data=data).id
+        dataset_id = h5py.h5d.create(
+            self.hf.id,
+            location.encode("utf-8"),
+            self._type(data.dtype),
+            self._space(data.shape),
+            lcpl=self.lcpl,
+        )
+        if data.size > 0:
+            dataset_id.write(h5py.h5s.ALL, h5py.h5s.ALL, data)
+        return dataset_id
+
+    def set_attr(self, obj_id, name: str, value: Any):
+        encoded_name = name.encode("utf-8")
+        if isinstance(value, str):
+            if value not in self._strings:
+                self._strings[value] = np.array(value, dtype=h5py.string_dtype())
+            attr_id = h5py.h5a.create(
+                obj_id, encoded_name, self.string_type, self.scalar_space
+            )
+            attr_id.write(self._strings[value])
+            return
+        value = np.asarray(value)
+        if value.dtype.kind in "OSU":
+            # Other kinds of values (e.g. copied from a file) are left to h5py
+            h5py.AttributeManager(_ObjectWrapper(obj_id))[name] = value
+            return
+        attr_id = h5py.h5a.create(
+            obj_id, encoded_name, self._type(value.dtype), self._space(value.shape)
+        )
+        attr_id.write(np.asarray(value, order="C"))
+
+    def _type(self, dtype: np.dtype) -> h5py.h5t.TypeID:
+        if dtype not in self._types:
+            self._types[dtype] = h5py.h5t.py_create(dtype, logical=True)
+        return self._types[dtype]
+
+    def _space(self, shape: tuple) -> h5py.h5s.SpaceID:
+        if shape == ():
+            return self.scalar_space
+        if shape not in self._spaces:
+            self._spaces[shape] = h5py.h5s.create_simple(shape)
+        return self._spaces[shape]
+
+
+class _ObjectWrapper:
+    "Lets h5py.AttributeManager set attributes on a low-level object id."
+
+    def __init__(self, obj_id):
+        self.id = obj_id
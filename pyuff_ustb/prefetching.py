@@ -0,0 +1,193 @@
+"""Record which fields of an UFF object an application accesses, and prefetch exactly
+those fields of other objects in a single pass over the file.
+
+Applications often access the same fields of every file they read (for example the
+sampling frequency, the probe geometry, the source and delay of every wave and then
+the data). Loading these lazily means opening the file for every field, which is slow
+for sequences with many waves. Instead, record an :class:`AccessProfile` once:
+
+>> channel_data = pyuff_ustb.Uff("file1.uff").read("channel_data")
+>> with record_access_profile(channel_data) as profile:
+>>     run_application(channel_data)
+>> profile.save("profile.json")
+
+And prefetch the fields of the profile on later opens, optionally in a background
+thread while the application does other work:
+
+>> channel_data = pyuff_ustb.Uff("file2.uff").read("channel_data")
+>> prefetch(channel_data, AccessProfile.load("profile.json"), background=True)
+>> run_application(channel_data)
+"""
+
+import json
+import re
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pyuff_ustb import instrumentation
+from pyuff_ustb.objects.uff import Uff
+from pyuff_ustb.readers import H5Reader, keep_open
+
+# Replaces the item segments (such as "sequence_0042") of paths to items in lists
+_ITEM_SEGMENT = "*"
+
+
+@dataclass
+class AccessProfile:
+    """The field paths accessed on an UFF object, relative to the object, in the order
+    they were first accessed. Items of lists are replaced by ``"*"``, so that a profile
+    applies to all items of a list regardless of its length, e.g.
+    ``("sequence", "*", "source", "azimuth")``."""
+
+    paths: List[Tuple[str, ...]] = field(default_factory=list)
+
+    def add(self, path: Tuple[str, ...]):
+        path = tuple(path)
+        if path not in self.paths:
+            self.paths.append(path)
+
+    def save(self, filepath: str):
+        with open(filepath, "w") as f:
+            json.dump({"paths": ["/".join(path) for path in self.paths]}, f, indent=2)
+
+    @classmethod
+    def load(cls, filepath: str) -> "AccessProfile":
+        with open(filepath) as f:
+            paths = json.load(f)["paths"]
+        return cls([tuple(path.split("/")) for path in paths])
+
+
+@contextmanager
+def record_access_profile(obj: Uff) -> Iterator[AccessProfile]:
+    """Record the fields of ``obj`` (and its sub-objects) that are loaded from the file
+    while in the context. The yielded profile is filled in when the context exits.
+
+    Fields that were already loaded before entering the context are not recorded.
+    Recording uses :func:`pyuff_ustb.profiling` (with ``trace=True``) under the hood,
+    so an outer profiling context will not see the reads done while recording.
+
+    Args:
+        obj (Uff): The object to record the accessed fields of. It must have been read
+            from a file.
+
+    Yields:
+        AccessProfile: The recorded profile.
+    """
+    root = _reader_path(obj)
+    profile = AccessProfile()
+    with instrumentation.profiling(trace=True) as stats:
+        try:
+            yield profile
+        finally:
+            for event in stats.trace_events:
+                if event.get("cat") != "field" or event["ph"] != "B":
+                    continue
+                path = tuple(event["name"].split("/"))
+                if len(path) > len(root) and path[: len(root)] == root:
+                    profile.add(_generalize_items(path[len(root) :]))
+
+
+def prefetch(
+    obj: Uff, profile: AccessProfile, background: bool = False
+) -> Optional[Future]:
+    """Load the fields of the profile into ``obj``, keeping the file open so that all
+    fields are read in a single pass over the file.
+
+    Fields of the profile that do not exist in the object (for example because the
+    profile was recorded on a different type of file) are ignored.
+
+    Args:
+        obj (Uff): The object to prefetch the fields of. It must have been read from a
+            file.
+        profile (AccessProfile): The fields to prefetch, see
+            :func:`record_access_profile`.
+        background (bool): If True, prefetch in a background thread and return
+            immediately. The application may access the fields of the object while
+            they are being prefetched.
+
+    Returns:
+        Optional[Future]: If ``background`` is True, a future that is resolved (with
+        the object) when all fields have been prefetched. Else None.
+    """
+    if not isinstance(obj._reader, H5Reader):
+        raise ValueError("Can only prefetch fields of an object read from a file.")
+    tree = _path_tree(profile.paths)
+
+    def run():
+        with keep_open(obj._reader.filepath):
+            _prefetch(obj, tree)
+        return obj
+
+    if not background:
+        run()
+        return None
+
+    future = Future()
+
+    def run_in_background():
+        try:
+            future.set_result(run())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(
+        target=run_in_background, name="pyuff_prefetch", daemon=True
+    ).start()
+    return future
+
+
+def _prefetch(obj: Any, tree: Dict[str, dict]):
+    if isinstance(obj, (list, tuple)):
+        # Item segments are skipped when a list is stored as a single object, and vice
+        # versa, so apply the remaining tree to each item
+        tree = tree.get(_ITEM_SEGMENT, tree)
+        for item in obj:
+            _prefetch(item, tree)
+        return
+    if not isinstance(obj, Uff):
+        return
+    for name, subtree in tree.items():
+        if name == _ITEM_SEGMENT:
+            _prefetch(obj, subtree)
+        elif name in obj._schema and obj._schema[name].is_stored:
+            value = getattr(obj, name)
+            if subtree:
+                _prefetch(value, subtree)
+
+
+def _path_tree(paths: List[Tuple[str, ...]]) -> Dict[str, dict]:
+    """Merge paths into a tree of nested dicts.
+
+    >>> _path_tree([("a", "b"), ("a", "c"), ("d",)])
+    {'a': {'b': {}, 'c': {}}, 'd': {}}
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        for name in path:
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _generalize_items(path: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Replace the item segments of a path with ``"*"``.
+
+    >>> _generalize_items(("sequence", "sequence_0042", "source", "azimuth"))
+    ('sequence', '*', 'source', 'azimuth')
+    """
+    generalized = list(path)
+    for i in range(1, len(path)):
+        if re.fullmatch(re.escape(path[i - 1]) + r"_\d+", path[i]):
+            generalized[i] = _ITEM_SEGMENT
+    return tuple(generalized)
+
+
+def _reader_path(obj: Uff) -> Tuple[str, ...]:
+    if not isinstance(obj._reader, H5Reader):
+        raise ValueError(
+            "Can only record the access profile of an object read from a file."
+        )
+    return tuple(obj._reader.path)
@@ -0,0 +1,10 @@
+"Module for processing UFF data, in a streaming fashion where possible."
+
+from pyuff_ustb.processing.demodulation import demodulate
+from pyuff_ustb.processing.envelope import envelope, envelope_blocks
+
+__all__ = [
+    "demodulate",
+    "envelope",
+    "envelope_blocks",
+]
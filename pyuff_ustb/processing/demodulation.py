@@ -0,0 +1,172 @@
+"""Streaming RF-to-IQ demodulation of channel data.
+
+Demodulation mixes the RF signal down to baseband, low-pass filters it, and decimates
+it along the time axis. The data is processed in blocks of frames so that the full RF
+array never has to be held in memory.
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.objects.channel_data import ChannelData
+from pyuff_ustb.objects.uff import ArrayPlaceholder, Uff, write_array_slice
+
+
+def demodulate(
+    channel_data: ChannelData,
+    modulation_frequency: Optional[float] = None,
+    cutoff_frequency: Optional[float] = None,
+    decimation: Optional[int] = None,
+    filter_length: Optional[int] = None,
+    filepath: Optional[str] = None,
+    location: str = "channel_data",
+    frames_per_block: int = 1,
+    overwrite: bool = False,
+    ignore_missing_compulsory_fields: bool = False,
+) -> ChannelData:
+    """Demodulate RF channel data to baseband IQ channel data.
+
+    The RF data is mixed down by ``modulation_frequency``, low-pass filtered by a
+    (zero-phase) windowed-sinc FIR filter and decimated along the time axis. The
+    first output sample corresponds to the first input sample, so
+    :attr:`~ChannelData.initial_time` is unchanged, while
+    :attr:`~ChannelData.sampling_frequency` is divided by ``decimation`` and
+    :attr:`~ChannelData.modulation_frequency` is set to ``modulation_frequency``.
+
+    Args:
+        channel_data (ChannelData): The RF channel data to demodulate. Only
+            ``frames_per_block`` frames are read from the file at a time.
+        modulation_frequency (Optional[float]): The frequency to mix down by [Hz].
+            Defaults to the center frequency of :attr:`ChannelData.pulse`.
+        cutoff_frequency (Optional[float]): The cutoff frequency of the low-pass filter
+            [Hz]. Defaults to ``modulation_frequency``.
+        decimation (Optional[int]): The decimation factor. Defaults to the largest
+            factor that keeps the sampling frequency at or above twice the cutoff
+            frequency.
+        filter_length (Optional[int]): The number of taps of the low-pass filter.
+            Defaults to four periods of the cutoff frequency.
+        filepath (Optional[str]): If given, the result is streamed to a new
+            :class:`ChannelData` at ``location`` in this file, block by block, and a
+            (lazily loaded) :class:`ChannelData` that reads from it is returned.
+            Otherwise the result is returned in memory.
+        location (str): Where to write the result in the file at ``filepath``.
+        frames_per_block (int): The number of frames to process at a time.
+        overwrite (bool): Whether to overwrite ``location`` if it already exists.
+        ignore_missing_compulsory_fields (bool): Whether to ignore missing compulsory
+            fields when writing to ``filepath``. See :meth:`Uff.write`.
+
+    Returns:
+        ChannelData: A copy of ``channel_data`` with complex64 IQ data.
+    """
+    if channel_data.modulation_frequency:
+        raise ValueError(
+            "The channel data is already demodulated (modulation_frequency="
+            f"{channel_data.modulation_frequency})."
+        )
+    if modulation_frequency is None:
+        pulse = channel_data.pulse
+        if pulse is None or not pulse.center_frequency:
+            raise ValueError(
+                "modulation_frequency must be given when the channel data has no "
+                "pulse center frequency."
+            )
+        modulation_frequency = float(pulse.center_frequency)
+    if cutoff_frequency is None:
+        cutoff_frequency = modulation_frequency
+    sampling_frequency = float(channel_data.sampling_frequency)
+    if decimation is None:
+        decimation = max(1, int(sampling_frequency / (2 * cutoff_frequency)))
+    if filter_length is None:
+        filter_length = 2 * int(2 * sampling_frequency / cutoff_frequency) + 1
+
+    shape = tuple(channel_data._data_shape())
+    shape = shape + (1,) * (4 - len(shape))
+    out_shape = (-(-shape[0] // decimation),) + shape[1:]  # Ceil-division of time
+    fields = {
+        name: getattr(channel_data, name)
+        for name in channel_data._get_fields(skip_dependent_properties=True)
+        if name != "data"
+    }
+    fields["sampling_frequency"] = sampling_frequency / decimation
+    fields["modulation_frequency"] = modulation_frequency
+
+    blocks = _demodulated_blocks(
+        channel_data,
+        modulation_frequency,
+        _lowpass_filter(cutoff_frequency / sampling_frequency, filter_length),
+        decimation,
+        frames_per_block,
+    )
+
+    if filepath is None:
+        data = np.empty(out_shape, dtype=np.complex64)
+        for frames, block in blocks:
+            data[..., frames] = block
+        return ChannelData(**fields, data=data)
+
+    result = ChannelData(**fields, data=ArrayPlaceholder(out_shape, np.complex64))
+    result.write(filepath, location, overwrite, ignore_missing_compulsory_fields)
+    with h5py.File(filepath, "a") as hf:
+        for frames, block in blocks:
+            write_array_slice(
+                hf, [location, "data"], (..., frames), block, transpose=True
+            )
+    return Uff(filepath).read(location)
+
+
+def _demodulated_blocks(
+    channel_data: ChannelData,
+    modulation_frequency: float,
+    lowpass: np.ndarray,
+    decimation: int,
+    frames_per_block: int,
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    if frames_per_block < 1:
+        raise ValueError("frames_per_block must be at least 1.")
+    has_frame_dim = len(channel_data._data_shape()) == 4
+    N_frames = channel_data.N_frames
+    N_samples = channel_data.N_samples
+    time = (
+        channel_data.initial_time
+        + np.arange(N_samples) / channel_data.sampling_frequency
+    )
+    mixer = np.exp(-2j * np.pi * modulation_frequency * time).astype(np.complex64)
+    mixer = mixer.reshape((N_samples, 1, 1, 1))
+
+    for start in range(0, N_frames, frames_per_block):
+        frames = slice(start, min(start + frames_per_block, N_frames))
+        if has_frame_dim:
+            block = channel_data.read_data((..., frames))
+        else:
+            block = channel_data.read_data()
+            block = block.reshape(block.shape + (1,) * (4 - block.ndim))
+        if np.iscomplexobj(block):
+            raise ValueError("Expected real-valued RF data, but got complex data.")
+        block = block * mixer  # Mix down to baseband (complex64)
+        block = _filter_time_axis(block, lowpass)
+        yield frames, block[::decimation]
+
+
+def _lowpass_filter(normalized_cutoff: float, length: int) -> np.ndarray:
+    """Return a windowed-sinc (Hamming) low-pass FIR filter with a gain of 2, making up
+    for the energy lost in the negative frequencies when mixing down.
+
+    ``normalized_cutoff`` is the cutoff frequency divided by the sampling frequency."""
+    if length % 2 == 0:
+        length += 1  # An odd length gives a symmetric, zero-phase filter
+    n = np.arange(length) - (length - 1) / 2
+    h = np.sinc(2 * normalized_cutoff * n) * np.hamming(length)
+    return (2 * h / np.sum(h)).astype(np.float32)
+
+
+def _filter_time_axis(block: np.ndarray, h: np.ndarray) -> np.ndarray:
+    "Convolve the block with h along the time axis (axis 0), keeping the same size."
+    n = block.shape[0]
+    n_fft = n + len(h) - 1
+    spectrum = np.fft.fft(block, n_fft, axis=0)
+    spectrum *= np.fft.fft(h, n_fft).reshape((n_fft,) + (1,) * (block.ndim - 1))
+    filtered = np.fft.ifft(spectrum, axis=0)
+    offset = (len(h) - 1) // 2
+    return filtered[offset : offset + n].astype(np.complex64, copy=False)
@@ -0,0 +1,143 @@
+"""Streaming envelope detection and log compression of beamformed data.
+
+The data is processed in blocks of frames so that only a bounded number of frames are
+held in memory at the same time, regardless of the size of the dataset.
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.objects.beamformed_data import BeamformedData, _image_view, _pad
+from pyuff_ustb.objects.uff import ArrayPlaceholder, Uff, write_array_slice
+
+
+def envelope_blocks(
+    beamformed_data: BeamformedData,
+    frames_per_block: int = 8,
+    log_compression: bool = True,
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    """Detect the envelope of the beamformed data, one block of frames at a time.
+
+    IQ data (complex valued data, i.e. data beamformed with a non-zero
+    :attr:`~BeamformedData.modulation_frequency`) is detected by taking the magnitude.
+    RF data (real valued data) is detected using the Hilbert transform along the depth
+    axis of the scan, which requires a scan with a regular pixel grid (see
+    :meth:`BeamformedData.image_view`).
+
+    Args:
+        beamformed_data (BeamformedData): The data to process. Only
+            ``frames_per_block`` frames are read from the file at a time.
+        frames_per_block (int): The number of frames to process at a time.
+        log_compression (bool): Whether to log compress the envelope, i.e. to return
+            ``20*log10(envelope)`` [dB]. The result is not normalized.
+
+    Yields:
+        Tuple[slice, np.ndarray]: The frames of the block and the processed block as a
+        float32 array with dimensions ``[pixel x channel x wave x frame]``.
+    """
+    if frames_per_block < 1:
+        raise ValueError("frames_per_block must be at least 1.")
+    has_frame_dim = len(beamformed_data._data_shape()) == 4
+    N_frames = beamformed_data.N_frames
+    for start in range(0, N_frames, frames_per_block):
+        frames = slice(start, min(start + frames_per_block, N_frames))
+        if has_frame_dim:
+            block = beamformed_data.read_data((..., frames))
+        else:
+            block = _pad(beamformed_data.read_data())
+        block = _detect_envelope(block, beamformed_data)
+        if log_compression:
+            _log_compress(block)
+        yield frames, block
+
+
+def envelope(
+    beamformed_data: BeamformedData,
+    filepath: Optional[str] = None,
+    location: str = "beamformed_data",
+    frames_per_block: int = 8,
+    log_compression: bool = True,
+    overwrite: bool = False,
+    ignore_missing_compulsory_fields: bool = False,
+) -> BeamformedData:
+    """Detect (and log compress) the envelope of beamformed data.
+
+    See :func:`envelope_blocks` for how the envelope is detected.
+
+    Args:
+        beamformed_data (BeamformedData): The data to process.
+        filepath (Optional[str]): If given, the result is streamed to a new
+            :class:`BeamformedData` at ``location`` in this file, block by block, and a
+            (lazily loaded) :class:`BeamformedData` that reads from it is returned.
+            Otherwise the result is returned in memory.
+        location (str): Where to write the result in the file at ``filepath``.
+        frames_per_block (int): The number of frames to process at a time.
+        log_compression (bool): Whether to log compress the envelope [dB].
+        overwrite (bool): Whether to overwrite ``location`` if it already exists.
+        ignore_missing_compulsory_fields (bool): Whether to ignore missing compulsory
+            fields when writing to ``filepath``. See :meth:`Uff.write`.
+
+    Returns:
+        BeamformedData: A copy of ``beamformed_data`` with the processed float32 data.
+    """
+    shape = tuple(beamformed_data._data_shape())
+    shape = shape + (1,) * (4 - len(shape))
+    fields = {
+        name: getattr(beamformed_data, name)
+        for name in beamformed_data._get_fields(skip_dependent_properties=True)
+        if name != "data"
+    }
+    blocks = envelope_blocks(beamformed_data, frames_per_block, log_compression)
+
+    if filepath is None:
+        data = np.empty(shape, dtype=np.float32)
+        for frames, block in blocks:
+            data[..., frames] = block
+        return BeamformedData(**fields, data=data)
+
+    result = BeamformedData(**fields, data=ArrayPlaceholder(shape, np.float32))
+    result.write(filepath, location, overwrite, ignore_missing_compulsory_fields)
+    with h5py.File(filepath, "a") as hf:
+        for frames, block in blocks:
+            write_array_slice(hf, [location, "data"], (..., frames), block)
+    return Uff(filepath).read(location)
+
+
+def _detect_envelope(block: np.ndarray, beamformed_data: BeamformedData) -> np.ndarray:
+    if np.iscomplexobj(block):
+        # IQ data: the envelope is the magnitude
+        envelope = np.empty(block.shape, dtype=np.float32)
+        return np.abs(block, out=envelope)
+
+    # RF data: the envelope is the magnitude of the analytic signal along depth
+    block = block.astype(np.float32, copy=False)
+    depth_first = _image_view(block, beamformed_data.scan)
+    envelope = np.empty(block.shape, dtype=np.float32)
+    np.abs(
+        _analytic_signal(depth_first), out=_image_view(envelope, beamformed_data.scan)
+    )
+    return envelope
+
+
+def _analytic_signal(x: np.ndarray) -> np.ndarray:
+    "Compute the analytic signal of real-valued x along the first axis (Hilbert)."
+    n = x.shape[0]
+    spectrum = np.fft.fft(x, axis=0)
+    h = np.zeros(n, dtype=np.float32)
+    h[0] = 1
+    if n % 2 == 0:
+        h[n // 2] = 1
+        h[1 : n // 2] = 2
+    else:
+        h[1 : (n + 1) // 2] = 2
+    spectrum *= h.reshape((n,) + (1,) * (x.ndim - 1))
+    return np.fft.ifft(spectrum, axis=0)
+
+
+def _log_compress(envelope: np.ndarray):
+    "Log compress the envelope in-place [dB]."
+    np.maximum(envelope, np.finfo(envelope.dtype).tiny, out=envelope)
+    np.log10(envelope, out=envelope)
+    envelope *= 20
@@ -7,17 +7,27 @@ from pyuff_ustb.readers.base import (
     Reader,
     ReaderAttrsKeyError,
     ReaderKeyError,
+    cast_array,
+    keep_open,
     read_array,
     read_scalar,
+    read_shape,
 )
+from pyuff_ustb.readers.process_pool import ProcessPoolReader
+from pyuff_ustb.readers.thread_pool import ThreadPoolReader
 
 __all__ = [
     "util",
     "H5Reader",
     "NoneReader",
+    "ProcessPoolReader",
     "Reader",
     "ReaderAttrsKeyError",
     "ReaderKeyError",
+    "ThreadPoolReader",
+    "cast_array",
+    "keep_open",
     "read_array",
     "read_scalar",
+    "read_shape",
 ]
@@ -1,11 +1,26 @@
+import hashlib
+import os
+import threading
 from abc import ABC, abstractmethod
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Iterable, Iterator, Protocol, Sequence, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import h5py
 import numpy as np
 
+from pyuff_ustb import instrumentation
+
 
 class ReaderKeyError(KeyError):
     pass
@@ -56,18 +71,29 @@ class Reader(ABC):
     def read(self) -> Iterator[Union[NumpyLike, Any]]: ...
 
 
+# The attribute that marks a group that is hard linked to from multiple paths as a single
+# shared object (see WritePlan.execute)
+SHARED_OBJECT_ATTR = "pyuff_shared_object"
+
+
 class H5Reader(Reader):
     def __init__(
         self,
         filepath: Union[str, "Reader"],
         path: Union[str, Sequence[str]] = (),
+        intern: bool = False,
     ):
         if isinstance(filepath, H5Reader):
             assert (
                 path == ()
             ), "Cannot specify path when filepath is a H5Reader. path will be \
 overwritten by the reader's obj_path."
+            shared_objects = filepath.shared_objects
+            shared_object_key = filepath.shared_object_key
+            intern = intern or filepath.intern
             filepath, path = filepath.filepath, filepath.path
+        else:
+            shared_objects, shared_object_key = _SharedObjects(), None
 
         assert isinstance(
             filepath, str
@@ -78,15 +104,77 @@ overwritten by the reader's obj_path."
 
         self.filepath = filepath
         self.path = (path,) if isinstance(path, str) else tuple(path)
+        # Objects that are shared between multiple paths in the file, see
+        # shared_object_key. Shared by all readers derived from this one.
+        self.shared_objects = shared_objects
+        self.shared_object_key = shared_object_key
+        # Whether to intern identical sub-objects, see content_key
+        self.intern = intern
 
     def append_path(self, path: Union[str, Sequence[str]]) -> "H5Reader":
         if isinstance(path, str):
             path = (path,)
         new_path = self.path + tuple(path)
         new_obj = self.__class__(self.filepath, new_path)
-        with new_obj.read():  # <- raises ReaderKeyError if path does not exist
+        new_obj.shared_objects = self.shared_objects
+        new_obj.intern = self.intern
+        with new_obj.read() as obj:  # <- raises ReaderKeyError if path does not exist
+            if isinstance(obj, h5py.Group):
+                info = h5py.h5o.get_info(obj.id)
+                if info.rc > 1 and SHARED_OBJECT_ATTR in obj.attrs:
+                    # The group is the same object at multiple paths (see
+                    # WritePlan.execute), so identify it by its address in the file.
+                    # Groups that are linked only because they have the same content
+                    # are read as separate objects.
+                    new_obj.shared_object_key = info.addr
             return new_obj
 
+    def content_key(self, max_bytes: int = 2**24) -> Optional[bytes]:
+        """A key of the attributes and datasets of the group (recursively), such that
+        groups with the same content in the file have the same key. Returns None if the
+        object is not a group, or if its datasets hold more than ``max_bytes``.
+
+        Groups are first compared by their metadata (the attributes, and the shapes
+        and dtypes of the datasets). The datasets are only read (and hashed) when
+        another group with the same metadata has been seen before. Keys are memoized
+        by the address of the group in the file."""
+        with self.read() as obj:
+            if not isinstance(obj, h5py.Group):
+                return None
+            content_keys = self.shared_objects.content_keys
+            addr = h5py.h5o.get_info(obj.id).addr
+            if addr not in content_keys:
+                content_keys[addr] = self._content_key(obj, max_bytes)
+            return content_keys[addr]
+
+    def _content_key(self, group: h5py.Group, max_bytes: int) -> Optional[bytes]:
+        h = hashlib.blake2b()
+        nbytes = 0
+        for name, node in [("", group)] + _visit_items(group):
+            h.update(f"{name}:".encode("utf-8"))
+            for attr_name in sorted(set(node.attrs) - {SHARED_OBJECT_ATTR}):
+                value = np.asarray(node.attrs[attr_name])
+                h.update(f"{attr_name}={value.dtype.str}{value.tolist()};".encode())
+            if isinstance(node, h5py.Dataset):
+                nbytes += node.size * node.dtype.itemsize
+                if nbytes > max_bytes:
+                    return None
+                h.update(f"{node.dtype.str}{node.shape}".encode("utf-8"))
+        metadata_key = h.digest()
+
+        # The first group with some metadata is identified by the metadata alone, so
+        # its data only has to be hashed once another group has the same metadata
+        first_groups = self.shared_objects.first_groups
+        if metadata_key not in first_groups:
+            first_groups[metadata_key] = (group.name, None)
+            return metadata_key
+        first_name, first_data_key = first_groups[metadata_key]
+        if first_data_key is None:
+            first_data_key = _data_key(group.file[first_name])
+            first_groups[metadata_key] = (first_name, first_data_key)
+        data_key = _data_key(group)
+        return metadata_key if data_key == first_data_key else metadata_key + data_key
+
     def keys(self) -> list:
         with self.read() as obj:
             if isinstance(obj, h5py.Group):
@@ -104,15 +192,39 @@ overwritten by the reader's obj_path."
 
     @contextmanager
     def read(self) -> Iterator[Union[h5py.Group, h5py.Dataset]]:
-        try:
-            with h5py.File(self.filepath, "r") as obj:
-                for name in self.path:
-                    obj = obj[name]
-                yield obj
-        except ReaderAttrsKeyError as e:
-            raise e  # Do not catch ReaderAttrsKeyError
-        except KeyError as e:
-            raise ReaderKeyError(f"Could not find object at path {self.path}") from e
+        with _kept_open_files.borrow(self.filepath) as kept_open_file:
+            stats = instrumentation._active if kept_open_file is None else None
+            if stats is not None:
+                opened_at = stats.record_file_open()
+            try:
+                with (
+                    nullcontext(kept_open_file)
+                    if kept_open_file is not None
+                    else h5py.File(self.filepath, "r")
+                ) as obj:
+                    for name in self.path:
+                        obj = obj[name]
+                    yield obj
+            except ReaderAttrsKeyError as e:
+                raise e  # Do not catch ReaderAttrsKeyError
+            except KeyError as e:
+                raise ReaderKeyError(
+                    f"Could not find object at path {self.path}"
+                ) from e
+            finally:
+                if stats is not None:
+                    stats.record_file_close(opened_at, self.filepath, self.path)
+
+    def __getstate__(self) -> dict:
+        # Only pickle the location of the object in the file. See _SharedObjects for
+        # how the shared objects are pickled.
+        return {
+            "filepath": self.filepath,
+            "path": self.path,
+            "shared_objects": self.shared_objects,
+            "shared_object_key": self.shared_object_key,
+            "intern": self.intern,
+        }
 
     def __repr__(self):
         return f"""H5Reader(
@@ -122,6 +234,120 @@ overwritten by the reader's obj_path."
 )"""
 
 
+class _SharedObjects(dict):
+    """The objects that are shared between the paths of a file (see
+    :func:`~pyuff_ustb.readers.util.read_uff`), shared by all readers of the file.
+
+    The objects are not pickled, but all readers of a file that are pickled together
+    are unpickled with the same (empty) dict."""
+
+    def __init__(self):
+        super().__init__()
+        # The content keys of groups (see H5Reader.content_key) by their address, and
+        # the name and data key of the first group with each metadata key
+        self.content_keys: Dict[int, Optional[bytes]] = {}
+        self.first_groups: Dict[bytes, Tuple[str, Optional[bytes]]] = {}
+
+    def __reduce__(self):
+        return (_SharedObjects, ())
+
+
+def _visit_items(group: h5py.Group) -> list:
+    "All (name, object) pairs in the group, recursively, sorted by name."
+    items = []
+    group.visititems(lambda name, node: items.append((name, node)))
+    return sorted(items, key=lambda item: item[0])
+
+
+def _data_key(group: h5py.Group) -> bytes:
+    "A hash of the data of the datasets in the group (recursively)."
+    h = hashlib.blake2b()
+    for _, node in _visit_items(group):
+        if isinstance(node, h5py.Dataset):
+            if instrumentation._active is not None:
+                data = instrumentation._active.timed_read(_read_node, node)
+            else:
+                data = _read_node(node)
+            h.update(data.tobytes() if data.dtype.kind != "O" else repr(data).encode())
+    return h.digest()
+
+
+def _read_node(dataset: h5py.Dataset) -> np.ndarray:
+    return np.asarray(dataset[()])
+
+
+class _KeptOpenFiles:
+    """Files that are kept open by :func:`keep_open`, shared between threads. A file is
+    closed when the last :func:`keep_open` context and the last read using it exits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, h5py.File] = {}
+        self._users: Dict[str, int] = {}
+
+    def _acquire(self, filepath: str, open_file: bool) -> Optional[h5py.File]:
+        key = os.path.abspath(filepath)
+        with self._lock:
+            if key not in self._files:
+                if not open_file:
+                    return None
+                if instrumentation._active is not None:
+                    instrumentation._active.record_file_open()
+                self._files[key] = h5py.File(filepath, "r")
+                self._users[key] = 0
+            self._users[key] += 1
+            return self._files[key]
+
+    def _release(self, filepath: str):
+        key = os.path.abspath(filepath)
+        with self._lock:
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                self._files.pop(key).close()
+                del self._users[key]
+
+    @contextmanager
+    def keep_open(self, filepath: str) -> Iterator[h5py.File]:
+        hf = self._acquire(filepath, open_file=True)
+        try:
+            yield hf
+        finally:
+            self._release(filepath)
+
+    @contextmanager
+    def borrow(self, filepath: str) -> Iterator[Optional[h5py.File]]:
+        "Yield the file if it is kept open, else None."
+        if not self._files:  # Fast path when no files are kept open
+            yield None
+            return
+        hf = self._acquire(filepath, open_file=False)
+        try:
+            yield hf
+        finally:
+            if hf is not None:
+                self._release(filepath)
+
+
+_kept_open_files = _KeptOpenFiles()
+
+
+@contextmanager
+def keep_open(filepath: str) -> Iterator[None]:
+    """Keep a file open (for reading) while in the context, so that all reads from it,
+    from any thread, re-use the same file handle instead of opening the file again.
+
+    H5Reader otherwise opens the file for every read, which is slow when reading many
+    small fields, e.g. the sources and delays of every wave in a sequence. Note that
+    the file can not be written to while it is kept open.
+
+    >> with keep_open("file.uff"):
+    >>     channel_data = Uff("file.uff").read("channel_data")
+    >>     delays = [wave.delay for wave in channel_data.sequence]
+    """
+    with _kept_open_files.keep_open(filepath):
+        yield
+
+
 class NoneReader(Reader):
     """NoneReader is used instead of None to avoid having to check for None everywhere.
     If a user tries to read from a NoneReader we raise an error."""
@@ -147,17 +373,109 @@ class NoneReader(Reader):
 
 
 def read_scalar(reader: Reader):
+    if instrumentation._active is not None:
+        return instrumentation._active.timed_read(_read_scalar, reader)
+    return _read_scalar(reader)
+
+
+def _read_scalar(reader: Reader):
     with reader.read() as obj:
         val = np.squeeze(obj[...])
         assert val.shape == (), "Expected a scalar value."
         return val
 
 
-def read_array(reader: Reader):
+def read_array(
+    reader: Reader, key: Any = None, transpose: bool = False, dtype: Any = None
+):
+    """Read an array from the file. If ``key`` is given, only that hyperslab of the
+    array is read (``key`` may be anything that h5py can index a dataset with).
+
+    If ``transpose`` is True, the transpose of the stored array is returned, and
+    ``key`` indexes the transposed array. This is useful for arrays that are stored in
+    MATLAB's column-major order.
+
+    The array has the dtype that it is stored with (e.g. int16 for raw channel data),
+    unless ``dtype`` is given, in which case HDF5 converts the values while reading.
+    Complex arrays are stored as a real and an imaginary part, and are returned with
+    the complex dtype of the parts, e.g. complex64 for int16 or float32 parts, and
+    ``dtype`` is the dtype of the parts (or the complex dtype)."""
+    if transpose:
+        if key is not None:
+            key = transpose_key(key, len(read_shape(reader)))
+        return read_array(reader, key, dtype=dtype).T
+
+    if instrumentation._active is not None:
+        return instrumentation._active.timed_read(_read_array, reader, key, dtype)
+    return _read_array(reader, key, dtype)
+
+
+def _read_array(reader: Reader, key: Any = None, dtype: Any = None):
     is_complex = np.squeeze(reader.attrs["complex"])
     if is_complex:
+        if dtype is not None:
+            dtype = np.empty(0, dtype).real.dtype
         with reader["real"].read() as real, reader["imag"].read() as imag:
-            return real[:] + 1j * imag[:]
+            real = _read_dataset(real, key, dtype)
+            imag = _read_dataset(imag, key, dtype)
+        value = np.empty(real.shape, np.result_type(real.dtype, np.complex64))
+        value.real = real
+        value.imag = imag
+        return value
     else:
         with reader.read() as value:
-            return np.array(value) if value.shape == () else value[:]
+            return _read_dataset(value, key, dtype)
+
+
+def _read_dataset(dataset: h5py.Dataset, key: Any = None, dtype: Any = None):
+    is_scalar = dataset.shape == ()
+    if dtype is not None:
+        dataset = dataset.astype(dtype)
+    if key is not None:
+        return dataset[key]
+    return np.asarray(dataset[()]) if is_scalar else dataset[:]
+
+
+def cast_array(value: Any, dtype: Any) -> np.ndarray:
+    """Cast an array to ``dtype`` the same way as :func:`read_array`, i.e. the real and
+    imaginary parts of complex arrays are cast to ``dtype``.
+
+    >>> cast_array(np.ones(2, np.complex64), np.float64).dtype
+    dtype('complex128')
+    """
+    value = np.asarray(value)
+    if np.iscomplexobj(value):
+        dtype = np.result_type(np.empty(0, dtype).real.dtype, np.complex64)
+    return value.astype(dtype, copy=False)
+
+
+def read_shape(reader: Reader) -> tuple:
+    "Return the shape of an array in the file without reading it."
+    is_complex = np.squeeze(reader.attrs["complex"])
+    with (reader["real"] if is_complex else reader).read() as value:
+        return value.shape
+
+
+def transpose_key(key: Any, ndim: int) -> tuple:
+    """Turn an index into an array with ``ndim`` dimensions into the equivalent index
+    into the transposed array.
+
+    >>> transpose_key((0, slice(2, 4)), 3)
+    (slice(None, None, None), slice(2, 4, None), 0)
+    >>> transpose_key((..., 1), 3)
+    (1, slice(None, None, None), slice(None, None, None))
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    ellipsis_indices = [i for i, k in enumerate(key) if k is Ellipsis]
+    if len(ellipsis_indices) > 1:
+        raise IndexError("An index can only have a single ellipsis ('...')")
+    if ellipsis_indices:
+        i = ellipsis_indices[0]
+        n_missing = ndim - (len(key) - 1)
+        key = key[:i] + (slice(None),) * n_missing + key[i + 1 :]
+    else:
+        key = key + (slice(None),) * (ndim - len(key))
+    if len(key) != ndim:
+        raise IndexError(f"Too many indices for an array with {ndim} dimensions")
+    return key[::-1]
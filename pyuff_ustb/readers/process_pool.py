@@ -0,0 +1,249 @@
+"""Reading hyperslabs of arrays with a pool of worker processes.
+
+h5py serializes all calls into the HDF5 library with a global lock, so threads that
+read from the same file (or from different files) do not read in parallel. A
+:class:`ProcessPoolReader` splits a hyperslab into parts that are read by worker
+processes instead, each with its own file handle. The workers write the parts directly
+into a buffer in shared memory (see :mod:`multiprocessing.shared_memory`), from which
+the result is copied into the output array:
+
+>> with ProcessPoolReader(max_workers=8) as pool:
+>>     frames = channel_data.read_data((..., slice(0, 64)), pool=pool)
+
+Starting the worker processes takes some time, so re-use the pool for many reads. The
+workers keep the files they have read from open until the pool is closed, so the pool
+should not be used to read files that are modified in the meantime.
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.readers.base import H5Reader, read_shape, transpose_key
+
+# The files opened by a worker process, by filepath
+_worker_files: Dict[str, h5py.File] = {}
+
+
+class ProcessPoolReader:
+    """A pool of worker processes that read hyperslabs of arrays in parallel.
+
+    Args:
+        max_workers (Optional[int]): The number of worker processes. Defaults to the
+            number of CPUs.
+        mp_context: The multiprocessing context used to start the workers. Defaults to
+            the ``"spawn"`` context, as the HDF5 library does not support being used
+            in a forked process.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, mp_context: Any = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if mp_context is None:
+            mp_context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(self.max_workers, mp_context=mp_context)
+
+    def read_array(
+        self,
+        reader: H5Reader,
+        key: Any = ...,
+        transpose: bool = False,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Read a hyperslab of an array, like :func:`~pyuff_ustb.readers.read_array`,
+        splitting it into parts that are read by the worker processes.
+
+        Args:
+            reader (H5Reader): The reader of the array.
+            key: The index of the hyperslab to read (integers, slices with a positive
+                step, and an ellipsis).
+            transpose (bool): Whether the array is stored transposed in the file. If
+                True, ``key`` indexes the transposed array and the transposed hyperslab
+                is returned (see :func:`~pyuff_ustb.readers.read_array`).
+            out (Optional[np.ndarray]): A preallocated array to write the hyperslab to.
+                It must have the shape of the hyperslab.
+
+        Returns:
+            np.ndarray: The hyperslab (``out`` if given).
+        """
+        if not isinstance(reader, H5Reader):
+            raise TypeError(f"Expected a H5Reader, got {type(reader)}.")
+        shape = read_shape(reader)
+        if transpose:
+            key = transpose_key(key, len(shape))
+        key = _normalize_key(key, shape)
+        hyperslab_shape = tuple(
+            len(range(*k.indices(n)))
+            for k, n in zip(key, shape)
+            if isinstance(k, slice)
+        )
+        dtype = _stored_dtype(reader)
+        if out is not None:
+            expected_shape = hyperslab_shape[::-1] if transpose else hyperslab_shape
+            if out.shape != expected_shape:
+                raise ValueError(
+                    f"out must have the shape of the hyperslab {expected_shape}, got "
+                    f"{out.shape}."
+                )
+
+        nbytes = int(np.prod(hyperslab_shape)) * dtype.itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        try:
+            futures = [
+                self._executor.submit(
+                    _read_into,
+                    reader.filepath,
+                    reader.path,
+                    part_key,
+                    shm.name,
+                    hyperslab_shape,
+                    dtype.str,
+                    region,
+                )
+                for part_key, region in _split(key, shape, self.max_workers)
+            ]
+            for future in futures:
+                future.result()
+            hyperslab = np.ndarray(hyperslab_shape, dtype, buffer=shm.buf)
+            if transpose:
+                hyperslab = hyperslab.T
+            if out is None:
+                out = np.empty(hyperslab.shape, dtype)
+            np.copyto(out, hyperslab)
+            del hyperslab  # Release the buffer before closing the shared memory
+        finally:
+            shm.close()
+            shm.unlink()
+        return out
+
+    def close(self):
+        "Shut down the worker processes."
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ProcessPoolReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _normalize_key(key: Any, shape: Tuple[int, ...]) -> Tuple[Union[int, slice], ...]:
+    """Turn an index into a tuple with an integer or a slice (with a positive step)
+    for every dimension.
+
+    >>> _normalize_key((..., 1), (4, 5, 6))
+    (slice(0, 4, 1), slice(0, 5, 1), 1)
+    >>> _normalize_key((slice(None, None, 2), -1), (4, 5))
+    (slice(0, 4, 2), 4)
+    """
+    if key is None:
+        key = ...
+    if not isinstance(key, tuple):
+        key = (key,)
+    if Ellipsis in key:
+        i = key.index(Ellipsis)
+        key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1 :]
+    key = key + (slice(None),) * (len(shape) - len(key))
+    normalized = []
+    for k, n in zip(key, shape):
+        if isinstance(k, slice):
+            start, stop, step = k.indices(n)
+            if step < 1:
+                raise IndexError("Only slices with a positive step are supported.")
+            normalized.append(slice(start, max(start, stop), step))
+        elif isinstance(k, (int, np.integer)):
+            if not -n <= k < n:
+                raise IndexError(f"Index {k} is out of bounds for an axis of size {n}.")
+            normalized.append(int(k) % n)
+        else:
+            raise IndexError(f"Unsupported index {k!r}, use integers and slices.")
+    return tuple(normalized)
+
+
+def _split(
+    key: Tuple[Union[int, slice], ...], shape: Tuple[int, ...], n_parts: int
+) -> list:
+    """Split a normalized key into at most ``n_parts`` keys along the outermost axis
+    with more than one element (parts are then contiguous in the file). Returns
+    ``(part_key, region)`` pairs, where region is ``(axis, start, stop)`` in the
+    hyperslab."""
+    axis = 0
+    for k, n in zip(key, shape):
+        if isinstance(k, slice):
+            length = len(range(*k.indices(n)))
+            if length > 1:
+                break
+            axis += 1
+    else:
+        return [(key, None)]
+    k_index = [i for i, k in enumerate(key) if isinstance(k, slice)][axis]
+    k = key[k_index]
+    parts = []
+    for indices in np.array_split(np.arange(length), min(n_parts, length)):
+        start, stop = int(indices[0]), int(indices[-1]) + 1
+        part = slice(
+            k.start + start * k.step, k.start + (stop - 1) * k.step + 1, k.step
+        )
+        part_key = key[:k_index] + (part,) + key[k_index + 1 :]
+        parts.append((part_key, (axis, start, stop)))
+    return parts
+
+
+def _stored_dtype(reader: H5Reader) -> np.dtype:
+    "The dtype of an array as returned by read_array (complex if stored as real/imag)."
+    is_complex = np.squeeze(reader.attrs.get("complex", 0))
+    with (reader["real"] if is_complex else reader).read() as dataset:
+        dtype = dataset.dtype
+    return np.result_type(dtype, np.complex64) if is_complex else dtype
+
+
+def _read_into(
+    filepath: str,
+    path: Sequence[str],
+    key: tuple,
+    shm_name: str,
+    shape: Tuple[int, ...],
+    dtype: str,
+    region: Optional[Tuple[int, int, int]],
+):
+    "Read a part of a hyperslab in a worker process, into the shared memory buffer."
+    if filepath not in _worker_files:
+        _worker_files[filepath] = h5py.File(filepath, "r")
+    node = _worker_files[filepath]
+    for name in path:
+        node = node[name]
+    shm = _attach_shared_memory(shm_name)
+    try:
+        hyperslab = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        if region is not None:
+            axis, start, stop = region
+            index = (slice(None),) * axis + (slice(start, stop),)
+            target = hyperslab[index]
+        else:
+            target = hyperslab
+        if isinstance(node, h5py.Group):
+            # Complex arrays are stored as a group with a real and an imaginary dataset
+            target.real = node["real"][key]
+            target.imag = node["imag"][key]
+        elif target.flags.c_contiguous:
+            node.read_direct(target, source_sel=key)
+        else:
+            target[...] = node[key]
+        del hyperslab, target  # Release the buffer before closing the shared memory
+    finally:
+        shm.close()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    "Attach to shared memory that is created (and unlinked) by the parent process."
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13, attaching registers the memory with the resource tracker.
+    # The workers share the resource tracker of the parent process, which already
+    # tracks the memory, so this is harmless.
+    return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,230 @@
+"""Reading compressed arrays with a pool of threads that decompress the chunks.
+
+h5py decompresses the chunks of a compressed dataset one at a time, while holding its
+global lock, so reading a compressed array is limited to a single core. A
+:class:`ThreadPoolReader` instead reads the raw (still compressed) chunks from the file
+and decompresses them in a pool of threads, outside of the lock, writing each chunk
+directly into its part of the output array:
+
+>> with ThreadPoolReader(max_workers=8) as pool:
+>>     data = channel_data.read_data(pool=pool)
+
+Only the deflate (gzip) and shuffle filters are decompressed by the pool. Arrays that
+are not chunked, not compressed or that use other filters (e.g. LZF or Fletcher32
+checksums) are read the normal way.
+"""
+
+import itertools
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.readers.base import H5Reader, read_array, read_shape, transpose_key
+from pyuff_ustb.readers.process_pool import _normalize_key, _stored_dtype
+
+# The filters that ThreadPoolReader can reverse
+_SUPPORTED_FILTERS = (h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE)
+
+
+class ThreadPoolReader:
+    """A pool of threads that decompress the chunks of compressed arrays in parallel.
+
+    Args:
+        max_workers (Optional[int]): The number of threads. Defaults to the number of
+            CPUs.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="pyuff_decompress"
+        )
+
+    def read_array(
+        self,
+        reader: H5Reader,
+        key: Any = ...,
+        transpose: bool = False,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Read a hyperslab of an array, like :func:`~pyuff_ustb.readers.read_array`,
+        decompressing its chunks in parallel. See
+        :meth:`~pyuff_ustb.readers.ProcessPoolReader.read_array` for the arguments.
+
+        Arrays that can not be decompressed by the pool are read with
+        :func:`~pyuff_ustb.readers.read_array` instead.
+        """
+        if not isinstance(reader, H5Reader):
+            raise TypeError(f"Expected a H5Reader, got {type(reader)}.")
+        shape = read_shape(reader)
+        stored_key = transpose_key(key, len(shape)) if transpose else key
+        stored_key = _normalize_key(stored_key, shape)
+        hyperslab_shape = tuple(
+            len(range(*k.indices(n)))
+            for k, n in zip(stored_key, shape)
+            if isinstance(k, slice)
+        )
+        expected_shape = hyperslab_shape[::-1] if transpose else hyperslab_shape
+        if out is not None and out.shape != expected_shape:
+            raise ValueError(
+                f"out must have the shape of the hyperslab {expected_shape}, got "
+                f"{out.shape}."
+            )
+
+        is_complex = np.squeeze(reader.attrs.get("complex", 0))
+        parts = [reader["real"], reader["imag"]] if is_complex else [reader]
+        hyperslab = np.empty(hyperslab_shape, _stored_dtype(reader))
+        targets = [hyperslab.real, hyperslab.imag] if is_complex else [hyperslab]
+        for part, target in zip(parts, targets):
+            with part.read() as dataset:
+                if not self._read_dataset(dataset, stored_key, target):
+                    # Unsupported layout or filters
+                    return _copy_to(read_array(reader, key, transpose), out)
+        return _copy_to(hyperslab.T if transpose else hyperslab, out)
+
+    def _read_dataset(
+        self, dataset: h5py.Dataset, key: Tuple[Union[int, slice], ...], out: np.ndarray
+    ) -> bool:
+        """Read a hyperslab of a dataset into ``out`` by decompressing its chunks in the
+        pool. Returns False (without reading anything) if the dataset is not supported.
+        """
+        filters = _get_filters(dataset)
+        if filters is None:
+            return False
+        chunk_shape = dataset.chunks
+        # The chunks that overlap the hyperslab, and where they go, for every dimension
+        selections = [
+            _chunk_selections(k, n, c)
+            for k, n, c in zip(key, dataset.shape, chunk_shape)
+        ]
+        pending = deque()
+        for chunk in itertools.product(*selections):
+            offset = tuple(c[0] for c in chunk)
+            chunk_key = tuple(c[1] for c in chunk)
+            out_key = tuple(c[2] for c in chunk if c[2] is not None)
+            if dataset.id.get_chunk_info_by_coord(offset).byte_offset is None:
+                # The chunk has never been written
+                out[out_key] = dataset.fillvalue
+                continue
+            # Reading the raw chunk holds the h5py lock, decompressing it does not
+            filter_mask, raw = dataset.id.read_direct_chunk(offset)
+            pending.append(
+                self._executor.submit(
+                    _decode_into,
+                    raw,
+                    filters,
+                    filter_mask,
+                    dataset.dtype,
+                    chunk_shape,
+                    chunk_key,
+                    out,
+                    out_key,
+                )
+            )
+            # Limit the number of raw chunks held in memory
+            if len(pending) >= 2 * self.max_workers:
+                pending.popleft().result()
+        for future in pending:
+            future.result()
+        return True
+
+    def close(self):
+        "Shut down the threads."
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ThreadPoolReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _get_filters(dataset: h5py.Dataset) -> Optional[List[int]]:
+    """Return the filter pipeline of a chunked dataset if all of its filters are
+    supported (and it has at least one), otherwise None."""
+    plist = dataset.id.get_create_plist()
+    if plist.get_layout() != h5py.h5d.CHUNKED:
+        return None
+    filters = [plist.get_filter(i)[0] for i in range(plist.get_nfilters())]
+    if not filters or any(f not in _SUPPORTED_FILTERS for f in filters):
+        return None
+    return filters
+
+
+def _chunk_selections(
+    key: Union[int, slice], size: int, chunk_size: int
+) -> List[Tuple[int, Union[int, slice], Optional[slice]]]:
+    """For a normalized index into a dimension of a dataset, return the chunks that
+    contain selected elements, as ``(chunk_offset, chunk_key, out_key)``. ``out_key``
+    is None if the dimension is indexed by an integer (and dropped from the output).
+
+    >>> _chunk_selections(5, 10, 4)
+    [(4, 1, None)]
+    >>> _chunk_selections(slice(1, 8, 2), 8, 4)
+    [(0, slice(1, 4, 2), slice(0, 2, None)), (4, slice(1, 4, 2), slice(2, 4, None))]
+    """
+    if not isinstance(key, slice):
+        offset = key - key % chunk_size
+        return [(offset, key - offset, None)]
+    start, stop, step = key.indices(size)
+    indices = np.arange(start, stop, step)
+    selections = []
+    for chunk_index in np.unique(indices // chunk_size):
+        offset = int(chunk_index) * chunk_size
+        in_chunk = indices[(indices >= offset) & (indices < offset + chunk_size)]
+        first, last = int(in_chunk[0]), int(in_chunk[-1])
+        chunk_key = slice(first - offset, last - offset + 1, step)
+        out_start = (first - start) // step
+        selections.append(
+            (offset, chunk_key, slice(out_start, out_start + len(in_chunk)))
+        )
+    return selections
+
+
+def _decode_into(
+    raw: bytes,
+    filters: Sequence[int],
+    filter_mask: int,
+    dtype: np.dtype,
+    chunk_shape: Tuple[int, ...],
+    chunk_key: tuple,
+    out: np.ndarray,
+    out_key: tuple,
+):
+    "Reverse the filters of a raw chunk and copy the selected part of it into ``out``."
+    # Filters are applied in order when writing, so they are reversed in reverse order.
+    # A set bit in the filter mask means that the filter was skipped for this chunk.
+    for i in reversed(range(len(filters))):
+        if filter_mask & (1 << i):
+            continue
+        if filters[i] == h5py.h5z.FILTER_DEFLATE:
+            raw = zlib.decompress(raw)
+        elif filters[i] == h5py.h5z.FILTER_SHUFFLE:
+            raw = _unshuffle(raw, dtype.itemsize)
+    chunk = np.frombuffer(raw, dtype).reshape(chunk_shape)
+    out[out_key] = chunk[chunk_key]
+
+
+def _unshuffle(raw: bytes, itemsize: int) -> bytes:
+    """Reverse the HDF5 shuffle filter, which stores the first byte of every element,
+    then the second byte of every element, and so on.
+
+    >>> list(_unshuffle(bytes([1, 3, 2, 4]), 2))
+    [1, 2, 3, 4]
+    """
+    n = len(raw) // itemsize
+    shuffled = np.frombuffer(raw, np.uint8, n * itemsize).reshape(itemsize, n)
+    # Trailing bytes that do not make up a whole element are not shuffled
+    return shuffled.T.tobytes() + raw[n * itemsize :]
+
+
+def _copy_to(array: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    if out is None:
+        return array
+    np.copyto(out, array)
+    return out
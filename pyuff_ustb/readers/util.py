@@ -11,6 +11,27 @@ if TYPE_CHECKING:
     from pyuff_ustb.objects.uff import TUff
 
 
+def read_uff(reader: Reader, cls: Type["TUff"], intern: bool = False) -> "TUff":
+    """Read a Uff object of type cls.
+
+    Objects that are hard linked to from multiple paths in the file (for example a probe
+    that is shared by all the waves of a sequence) are only created once, so that all
+    paths resolve to the same instance (and its fields are only read once).
+
+    If intern is True and the reader was created with ``intern=True`` (see
+    :class:`~pyuff_ustb.readers.H5Reader`), objects with identical content at different
+    paths are also resolved to the same instance, even if they are not linked."""
+    key = getattr(reader, "shared_object_key", None)
+    if intern and getattr(reader, "intern", False):
+        key = reader.content_key() or key
+    if key is None:
+        return cls(reader)
+    shared_objects = reader.shared_objects
+    if (cls, key) not in shared_objects:
+        shared_objects[(cls, key)] = cls(reader)
+    return shared_objects[(cls, key)]
+
+
 def read_potentially_list(
     reader: Reader,
     cls: Type["TUff"],
@@ -19,9 +40,9 @@ def read_potentially_list(
     attribute. If size>1, then we have a list of objects."""
     n = int(reader.attrs.get("size", [0, 0]).max())
     if n > 1:
-        return [cls(reader[k]) for k in reader.keys()]
+        return [read_uff(reader[k], cls) for k in reader.keys()]
     else:
-        return cls(reader)
+        return read_uff(reader, cls)
 
 
 def read_list_of_strings(reader: Reader) -> Union[None, List[str]]:
@@ -57,7 +78,7 @@ def read_scan(scan_reader: Reader):
 
     cls = get_class_from_name(scan_reader.attrs["class"])
     assert issubclass(cls, Scan), "Expected class to be a subclass of Scan"
-    return cls(scan_reader)
+    return read_uff(scan_reader, cls, intern=True)
 
 
 def read_probe(probe_reader: Reader):
@@ -66,4 +87,4 @@ def read_probe(probe_reader: Reader):
 
     cls = get_class_from_name(probe_reader.attrs["class"])
     assert issubclass(cls, Probe), "Expected class to be a subclass of Probe"
-    return cls(probe_reader)
+    return read_uff(probe_reader, cls, intern=True)
@@ -0,0 +1,217 @@
+"""Sharing loaded UFF objects with worker processes through shared memory.
+
+When multiple worker processes work on the same object (for example beamforming
+different frames of the same :class:`~pyuff_ustb.ChannelData`), each worker would
+otherwise load (or be sent) its own copy of the arrays. :func:`share` instead copies
+the arrays of a loaded object into named shared memory segments once, and returns a
+small, picklable :class:`SharedUff` handle. Workers attach to the handle to get an
+object whose arrays are read-only, zero-copy views of the shared memory:
+
+>> channel_data = pyuff_ustb.eager_load(uff.read("channel_data"))
+>> with share(channel_data) as handle:
+>>     with ProcessPoolExecutor() as executor:
+>>         images = list(executor.map(beamform_frame, [handle] * n_frames, frames))
+
+>> def beamform_frame(handle, frame):
+>>     channel_data = handle.attach()
+>>     ...
+
+The process that shares the object owns the shared memory, and must release it (see
+:meth:`SharedUff.release`) when the workers are done with it. Workers must be started
+by the owning process (e.g. using :mod:`multiprocessing` or
+:class:`~concurrent.futures.ProcessPoolExecutor`), so that the shared memory is not
+cleaned up when a worker exits.
+"""
+
+import pickle
+import threading
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pyuff_ustb.objects.uff import Uff
+from pyuff_ustb.readers.process_pool import _attach_shared_memory
+
+# Smaller arrays are pickled along with the handle instead
+_MIN_SHARED_BYTES = 4096
+
+# The shared memory segments that this process has attached to, with the number of
+# attached arrays that are views of them, by name. A segment is closed when the last of
+# its arrays is garbage collected, so that it is freed once the owner releases it.
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, int]] = {}
+_attached_lock = threading.Lock()
+
+
+class SharedUff:
+    """A handle to an object shared by :func:`share`, which can be sent to (pickled
+    for) worker processes.
+
+    Attributes:
+        names (List[str]): The names of the shared memory segments.
+        nbytes (int): The total size of the shared arrays [bytes].
+    """
+
+    def __init__(
+        self,
+        payload: bytes,
+        segments: List[shared_memory.SharedMemory],
+        nbytes: int,
+    ):
+        self._payload = payload
+        self._segments: Optional[List[shared_memory.SharedMemory]] = segments
+        self.names = [segment.name for segment in segments]
+        self.nbytes = nbytes
+
+    def attach(self) -> Uff:
+        """Return the shared object. Its shared arrays are read-only views of the shared
+        memory, the other fields are copies. Fields that were not loaded when the
+        object was shared are loaded lazily from the file (if it was read from one).
+
+        Each call returns a new object, but the shared memory is only attached once per
+        process (for as long as any of the attached objects' arrays are in use)."""
+        if self._segments is not None and self.released:
+            raise ValueError("The shared memory has been released.")
+        return pickle.loads(self._payload)
+
+    @property
+    def released(self) -> bool:
+        return self._segments == []
+
+    def release(self):
+        """Free the shared memory. Can only be called by the owner (the process that
+        shared the object). The memory is freed once the arrays attached in other
+        processes have been garbage collected as well."""
+        if self._segments is None:
+            raise ValueError("Only the process that shared the object can release it.")
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __getstate__(self) -> dict:
+        # Only the owner holds (and releases) the shared memory segments
+        state = dict(self.__dict__)
+        state["_segments"] = None
+        return state
+
+    def __enter__(self) -> "SharedUff":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __repr__(self) -> str:
+        return f"SharedUff(<{len(self.names)} segments, {self.nbytes} bytes>)"
+
+
+def share(obj: Uff, min_bytes: int = _MIN_SHARED_BYTES) -> SharedUff:
+    """Copy the loaded arrays of an object (recursively, e.g. the data, the probe
+    geometry and the arrays of each wave) into named shared memory segments, and return
+    a handle that worker processes can attach to. See :class:`SharedUff`.
+
+    Only the fields that are loaded are shared, so load the fields that the workers
+    need first (e.g. using :func:`~pyuff_ustb.eager_load`).
+
+    Args:
+        obj (Uff): The object to share.
+        min_bytes (int): Arrays smaller than this are copied to the workers instead of
+            being shared.
+
+    Returns:
+        SharedUff: The handle. The caller owns the shared memory and must release it
+        using :meth:`SharedUff.release` (or by using the handle as a context manager).
+    """
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        skeleton = _to_skeleton(obj, segments, {}, min_bytes)
+        payload = pickle.dumps(skeleton)
+    except BaseException:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        raise
+    return SharedUff(payload, segments, sum(segment.size for segment in segments))
+
+
+class _SharedArray:
+    "Stands in for an array in shared memory, and unpickles to a view of it."
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __reduce__(self):
+        return (_attach_array, (self.name, self.shape, self.dtype))
+
+
+def _attach_array(name: str, shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+    with _attached_lock:
+        segment, count = _attached.get(name) or (_attach_shared_memory(name), 0)
+        _attached[name] = (segment, count + 1)
+    array = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+    array.flags.writeable = False
+    # Views of the array keep it alive, so the segment is not closed while in use
+    weakref.finalize(array, _detach, name)
+    return array
+
+
+def _detach(name: str):
+    "Close the segment when the last array attached to it has been garbage collected."
+    with _attached_lock:
+        segment, count = _attached.pop(name)
+        if count > 1:
+            _attached[name] = (segment, count - 1)
+            return
+    try:
+        segment.close()
+    except BufferError:
+        # The memory is still exported elsewhere, it is unmapped once that is released
+        pass
+
+
+def _to_skeleton(
+    value: Any,
+    segments: List[shared_memory.SharedMemory],
+    memo: Dict[int, Any],
+    min_bytes: int,
+) -> Any:
+    """Return a copy of the loaded fields of an object where the arrays are replaced by
+    :class:`_SharedArray`, copying them into new shared memory segments."""
+    if id(value) in memo:
+        return memo[id(value)]
+    if isinstance(value, Uff):
+        skeleton = type(value)(value._reader)
+        memo[id(value)] = skeleton
+        names = [
+            name
+            for name in value._get_fields(skip_dependent_properties=True)
+            if name in value.__dict__
+        ]
+        for name in names:
+            skeleton.__dict__[name] = _to_skeleton(
+                value.__dict__[name], segments, memo, min_bytes
+            )
+        if value.modified_fields:
+            skeleton.__dict__["_modified_fields"] = set(value.modified_fields)
+        # Objects read from a file are otherwise pickled without their loaded fields
+        skeleton.pickle_cached_fields(*names)
+        return skeleton
+    if isinstance(value, (list, tuple)):
+        result = [_to_skeleton(v, segments, memo, min_bytes) for v in value]
+        result = tuple(result) if isinstance(value, tuple) else result
+    elif (
+        isinstance(value, np.ndarray)
+        and value.dtype.kind not in "OSUV"
+        and value.nbytes >= max(min_bytes, 1)
+    ):
+        segment = shared_memory.SharedMemory(create=True, size=value.nbytes)
+        segments.append(segment)
+        np.ndarray(value.shape, value.dtype, buffer=segment.buf)[...] = value
+        result = _SharedArray(segment.name, value.shape, value.dtype.str)
+    else:
+        result = value
+    memo[id(value)] = result
+    return result
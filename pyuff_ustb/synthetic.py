@@ -0,0 +1,416 @@
+"""Module for generating synthetic UFF datasets, for example for benchmarking and
+testing without having to download real datasets.
+
+All generated data is deterministic given the ``seed``. The data of each frame is
+generated independently, so that arbitrarily large files can be written frame by frame
+without holding all the data in memory:
+
+>> from pyuff_ustb import synthetic
+>> channel_data = synthetic.write_channel_data(
+..     "big.uff", N_samples=4096, N_elements=128, N_waves=75, N_frames=100
+.. )  # ~15 GB of float32 channel data
+"""
+
+from typing import Any, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from pyuff_ustb.objects import (
+    Apodization,
+    ArrayPlaceholder,
+    BeamformedData,
+    ChannelData,
+    CurvilinearArray,
+    LinearArray,
+    LinearScan,
+    MatrixArray,
+    Point,
+    Probe,
+    Pulse,
+    Scan,
+    SectorScan,
+    Uff,
+    Wave,
+    Wavefront,
+    write_array_slice,
+)
+
+_probe_types = ("linear", "curvilinear", "matrix")
+_sequence_types = ("plane", "diverging", "focused", "stai")
+_scan_types = ("linear", "sector")
+
+
+def make_probe(probe_type: str = "linear", N_elements: int = 128) -> Probe:
+    """Make a probe of the given type.
+
+    Args:
+        probe_type (str): One of ``"linear"`` (:class:`LinearArray`),
+            ``"curvilinear"`` (:class:`CurvilinearArray`) or ``"matrix"``
+            (:class:`MatrixArray`). A matrix array gets the largest square number of
+            elements that is not greater than ``N_elements``.
+        N_elements (int): The number of elements of the probe.
+    """
+    origin = Point(distance=0.0, azimuth=0.0, elevation=0.0)
+    if probe_type == "linear":
+        return LinearArray(N=N_elements, pitch=0.3e-3, origin=origin)
+    elif probe_type == "curvilinear":
+        return CurvilinearArray(N=N_elements, pitch=0.5e-3, radius=60e-3, origin=origin)
+    elif probe_type == "matrix":
+        N = int(np.sqrt(N_elements))
+        probe = MatrixArray(N_x=N, N_y=N, pitch_x=0.3e-3, pitch_y=0.3e-3, origin=origin)
+        # Store one column per element, as for the other probes
+        probe.geometry = np.reshape(probe.geometry, (7, N * N))
+        return probe
+    raise ValueError(f"probe_type must be one of {_probe_types}, got {probe_type!r}.")
+
+
+def make_sequence(
+    probe: Probe,
+    N_waves: int,
+    sequence_type: str = "plane",
+    sound_speed: float = 1540.0,
+) -> List[Wave]:
+    """Make a sequence of transmitted waves.
+
+    All waves share the same :class:`Probe` and :class:`Apodization` instances, as is
+    typical of USTB files.
+
+    Args:
+        probe (Probe): The probe that transmits the waves.
+        N_waves (int): The number of waves in the sequence.
+        sequence_type (str): One of ``"plane"`` (steered plane waves between -15 and 15
+            degrees), ``"diverging"`` (virtual sources 10 mm behind the probe),
+            ``"focused"`` (scanlines focused at 30 mm depth) or ``"stai"`` (synthetic
+            transmit aperture, one element transmitting per wave).
+        sound_speed (float): The reference sound speed [m/s].
+    """
+    if sequence_type not in _sequence_types:
+        raise ValueError(
+            f"sequence_type must be one of {_sequence_types}, got {sequence_type!r}."
+        )
+    origin = Point(distance=0.0, azimuth=0.0, elevation=0.0)
+    apodization = Apodization(
+        probe=probe,
+        focus=Scan(x=np.zeros(1), y=np.zeros(1), z=np.zeros(1)),
+    )
+    aperture_x = np.linspace(np.min(probe.x), np.max(probe.x), N_waves)
+
+    sequence = []
+    for i in range(N_waves):
+        if sequence_type == "plane":
+            angle = np.deg2rad(15) * (
+                np.linspace(-1, 1, N_waves)[i] if N_waves > 1 else 0
+            )
+            source = Point(distance=np.inf, azimuth=angle, elevation=0.0)
+            wavefront = Wavefront.plane
+            # The acquisition starts when the first element fires (before t0 when the
+            # wave is steered), see ChannelData.sample_windows.
+            delay = np.min(probe.x * np.sin(angle)) / sound_speed
+        elif sequence_type == "diverging":
+            source = Point(xyz=(aperture_x[i], 0.0, -10e-3))
+            wavefront = Wavefront.spherical
+            delay = 0.0
+        elif sequence_type == "focused":
+            source = Point(xyz=(aperture_x[i], 0.0, 30e-3))
+            wavefront = Wavefront.spherical
+            delay = 0.0
+        else:  # "stai"
+            element = i % probe.N_elements
+            source = Point(xyz=(probe.x[element], probe.y[element], probe.z[element]))
+            wavefront = Wavefront.spherical
+            delay = 0.0
+        sequence.append(
+            Wave(
+                wavefront=wavefront,
+                source=source,
+                origin=origin,
+                apodization=apodization,
+                probe=probe,
+                event=i + 1,
+                delay=delay,
+                sound_speed=sound_speed,
+            )
+        )
+    return sequence
+
+
+def make_scan(scan_type: str = "linear", N_x: int = 256, N_z: int = 512) -> Scan:
+    """Make a scan of the given type.
+
+    Args:
+        scan_type (str): Either ``"linear"`` (:class:`LinearScan`) or ``"sector"``
+            (:class:`SectorScan`).
+        N_x (int): The number of pixels in the lateral (azimuth) direction.
+        N_z (int): The number of pixels in the depth direction.
+    """
+    if scan_type == "linear":
+        return LinearScan(
+            x_axis=np.linspace(-20e-3, 20e-3, N_x),
+            z_axis=np.linspace(5e-3, 50e-3, N_z),
+        )
+    elif scan_type == "sector":
+        return SectorScan(
+            azimuth_axis=np.linspace(-np.pi / 6, np.pi / 6, N_x),
+            depth_axis=np.linspace(0, 100e-3, N_z),
+            origin=Point(distance=0.0, azimuth=0.0, elevation=0.0),
+        )
+    raise ValueError(f"scan_type must be one of {_scan_types}, got {scan_type!r}.")
+
+
+def make_channel_data(
+    N_samples: int = 1024,
+    N_elements: int = 128,
+    N_waves: int = 11,
+    N_frames: int = 1,
+    probe_type: str = "linear",
+    sequence_type: str = "plane",
+    is_complex: bool = False,
+    seed: int = 0,
+) -> ChannelData:
+    """Make a :class:`ChannelData` object with random (uniform noise) data in memory.
+
+    See :func:`write_channel_data` for a description of the arguments."""
+    channel_data, shape = _channel_data_metadata(
+        N_samples, N_elements, N_waves, N_frames, probe_type, sequence_type, is_complex
+    )
+    # Column-major, like ChannelData.data that is read from a file
+    channel_data.data = _random_data(shape, is_complex, seed, order="F")
+    return channel_data
+
+
+def write_channel_data(
+    filepath: str,
+    location: str = "channel_data",
+    N_samples: int = 1024,
+    N_elements: int = 128,
+    N_waves: int = 11,
+    N_frames: int = 1,
+    probe_type: str = "linear",
+    sequence_type: str = "plane",
+    is_complex: bool = False,
+    seed: int = 0,
+    frames_per_block: int = 1,
+    overwrite: bool = False,
+) -> ChannelData:
+    """Write a :class:`ChannelData` object with random (uniform noise) data to a file.
+
+    The data is generated and written ``frames_per_block`` frames at a time, so files
+    that are much larger than the available memory can be written.
+
+    Args:
+        filepath (str): The file to write to.
+        location (str): The location in the file to write to.
+        N_samples (int): The number of time samples.
+        N_elements (int): The number of elements of the probe (see
+            :func:`make_probe`).
+        N_waves (int): The number of transmitted waves (see :func:`make_sequence`).
+        N_frames (int): The number of frames.
+        probe_type (str): The type of probe (see :func:`make_probe`).
+        sequence_type (str): The type of sequence (see :func:`make_sequence`).
+        is_complex (bool): Whether to make IQ data (complex64) instead of RF data
+            (float32).
+        seed (int): The seed of the random data.
+        frames_per_block (int): The number of frames to generate and write at a time.
+        overwrite (bool): Whether to overwrite ``location`` if it already exists.
+
+    Returns:
+        ChannelData: The written object, lazily loaded from the file.
+    """
+    channel_data, shape = _channel_data_metadata(
+        N_samples, N_elements, N_waves, N_frames, probe_type, sequence_type, is_complex
+    )
+    channel_data.data = ArrayPlaceholder(shape, _dtype(is_complex))
+    _write_streamed(
+        channel_data, filepath, location, is_complex, seed, frames_per_block, overwrite
+    )
+    return Uff(filepath).read(location)
+
+
+def make_beamformed_data(
+    N_x: int = 256,
+    N_z: int = 512,
+    N_frames: int = 1,
+    scan_type: str = "linear",
+    is_complex: bool = True,
+    seed: int = 0,
+) -> BeamformedData:
+    """Make a :class:`BeamformedData` object with random (uniform noise) data in
+    memory.
+
+    See :func:`write_beamformed_data` for a description of the arguments."""
+    beamformed_data, shape = _beamformed_data_metadata(
+        N_x, N_z, N_frames, scan_type, is_complex
+    )
+    beamformed_data.data = _random_data(shape, is_complex, seed)
+    return beamformed_data
+
+
+def write_beamformed_data(
+    filepath: str,
+    location: str = "beamformed_data",
+    N_x: int = 256,
+    N_z: int = 512,
+    N_frames: int = 1,
+    scan_type: str = "linear",
+    is_complex: bool = True,
+    seed: int = 0,
+    frames_per_block: int = 1,
+    overwrite: bool = False,
+) -> BeamformedData:
+    """Write a :class:`BeamformedData` object with random (uniform noise) data to a
+    file.
+
+    The data is generated and written ``frames_per_block`` frames at a time.
+
+    Args:
+        filepath (str): The file to write to.
+        location (str): The location in the file to write to.
+        N_x (int): The number of pixels in the lateral direction (see
+            :func:`make_scan`).
+        N_z (int): The number of pixels in the depth direction.
+        N_frames (int): The number of frames.
+        scan_type (str): The type of scan (see :func:`make_scan`).
+        is_complex (bool): Whether to make IQ data (complex64) instead of real-valued
+            data (float32).
+        seed (int): The seed of the random data.
+        frames_per_block (int): The number of frames to generate and write at a time.
+        overwrite (bool): Whether to overwrite ``location`` if it already exists.
+
+    Returns:
+        BeamformedData: The written object, lazily loaded from the file.
+    """
+    beamformed_data, shape = _beamformed_data_metadata(
+        N_x, N_z, N_frames, scan_type, is_complex
+    )
+    beamformed_data.data = ArrayPlaceholder(shape, _dtype(is_complex))
+    _write_streamed(
+        beamformed_data,
+        filepath,
+        location,
+        is_complex,
+        seed,
+        frames_per_block,
+        overwrite,
+    )
+    return Uff(filepath).read(location)
+
+
+def _channel_data_metadata(
+    N_samples: int,
+    N_elements: int,
+    N_waves: int,
+    N_frames: int,
+    probe_type: str,
+    sequence_type: str,
+    is_complex: bool,
+) -> Tuple[ChannelData, Tuple[int, ...]]:
+    probe = make_probe(probe_type, N_elements)
+    center_frequency = 5e6
+    sampling_frequency = 4 * center_frequency
+    # A two-cycle sinusoidal excitation
+    waveform_time = np.arange(int(2 * sampling_frequency / center_frequency))
+    waveform = np.sin(2 * np.pi * center_frequency / sampling_frequency * waveform_time)
+    channel_data = ChannelData(
+        sampling_frequency=sampling_frequency,
+        initial_time=0.0,
+        sound_speed=1540.0,
+        modulation_frequency=center_frequency if is_complex else 0.0,
+        sequence=make_sequence(probe, N_waves, sequence_type),
+        probe=probe,
+        pulse=Pulse(
+            center_frequency=center_frequency,
+            fractional_bandwidth=0.6,
+            phase=0.0,
+            waveform=waveform,
+        ),
+        PRF=1e3,
+        name="Synthetic channel data",
+    )
+    if sequence_type == "stai":
+        channel_data.N_active_elements = probe.N_elements
+    shape = (N_samples, probe.N_elements, N_waves, N_frames)
+    return channel_data, shape
+
+
+def _beamformed_data_metadata(
+    N_x: int, N_z: int, N_frames: int, scan_type: str, is_complex: bool
+) -> Tuple[BeamformedData, Tuple[int, ...]]:
+    beamformed_data = BeamformedData(
+        scan=make_scan(scan_type, N_x, N_z),
+        modulation_frequency=5e6 if is_complex else 0.0,
+        frame_rate=30,
+        name="Synthetic beamformed data",
+    )
+    return beamformed_data, (N_x * N_z, 1, 1, N_frames)
+
+
+def _dtype(is_complex: bool) -> Any:
+    return np.complex64 if is_complex else np.float32
+
+
+def _random_frame(
+    shape: Tuple[int, ...], is_complex: bool, seed: int, frame: int
+) -> np.ndarray:
+    """Generate the data of a single frame, independently of the other frames.
+
+    The values are generated in column-major order, i.e. the transpose of the returned
+    array is contiguous, which is the order that ChannelData is stored in."""
+    rng = np.random.default_rng((seed, frame))
+    transposed_shape = tuple(shape[::-1])
+    # Uniform noise in [-1, 1) is several times faster to generate than Gaussian noise
+    if is_complex:
+        frame_data = np.empty(transposed_shape, dtype=np.complex64)
+        frame_data.real = rng.random(transposed_shape, dtype=np.float32)
+        frame_data.imag = rng.random(transposed_shape, dtype=np.float32)
+    else:
+        frame_data = rng.random(transposed_shape, dtype=np.float32)
+    frame_data *= 2
+    frame_data -= 1 + 1j if is_complex else 1
+    return frame_data.T
+
+
+def _random_data(
+    shape: Tuple[int, ...],
+    is_complex: bool,
+    seed: int,
+    frames: Optional[range] = None,
+    order: str = "C",
+) -> np.ndarray:
+    if frames is None:
+        frames = range(shape[-1])
+    block_shape = tuple(shape[:-1]) + (len(frames),)
+    data = np.empty(block_shape, dtype=_dtype(is_complex), order=order)
+    for i, frame in enumerate(frames):
+        data[..., i] = _random_frame(shape[:-1], is_complex, seed, frame)
+    return data
+
+
+def _write_streamed(
+    obj: Uff,
+    filepath: str,
+    location: str,
+    is_complex: bool,
+    seed: int,
+    frames_per_block: int,
+    overwrite: bool,
+):
+    shape = obj.data.shape
+    obj.write(filepath, location, overwrite)
+    # ChannelData is stored transposed in the file, see ChannelData._preprocess_write
+    transpose = isinstance(obj, ChannelData)
+    N_frames = shape[-1]
+    with h5py.File(filepath, "a") as hf:
+        for start in range(0, N_frames, frames_per_block):
+            frames = range(start, min(start + frames_per_block, N_frames))
+            # The transpose of a column-major block is contiguous in the file's order
+            block = _random_data(
+                shape, is_complex, seed, frames, order="F" if transpose else "C"
+            )
+            write_array_slice(
+                hf,
+                [location, "data"],
+                (..., slice(frames.start, frames.stop)),
+                block,
+                transpose=transpose,
+            )
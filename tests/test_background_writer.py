@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+
+
+def test_background_writer():
+    scan = synthetic.make_scan("linear", 8, 16)
+    n_pixels = 8 * 16
+    frames = np.random.default_rng(0).random((4, n_pixels)).astype(np.float32)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        with pyuff.BackgroundWriter(file.name) as writer:
+            data = pyuff.ArrayPlaceholder((n_pixels, 1, 1, len(frames)))
+            writer.write(pyuff.BeamformedData(scan=scan, data=data), "b_data")
+            futures = [
+                writer.write_array_slice("b_data/data", (slice(None), 0, 0, i), frame)
+                for i, frame in enumerate(frames)
+            ]
+            # Errors are returned in the future and do not stop the following writes
+            failed = writer.write(pyuff.Wave(), "wave")
+            done = writer.write(scan, "scan")
+            writer.flush()
+            assert all(f.done() and f.exception() is None for f in futures)
+            assert isinstance(failed.exception(), ValueError)
+            assert done.result() is None
+
+        uff = pyuff.Uff(file.name)
+        np.testing.assert_array_equal(uff.read("b_data").data[:, 0, 0].T, frames)
+        assert uff.read("scan") == scan
+        assert "wave" not in uff._reader.keys()
+
+        with pytest.raises(ValueError):
+            writer.write(scan, "scan2")
+
+
+def test_write_async():
+    scan = synthetic.make_scan("sector", 8, 16)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        future = scan.write_async(file.name, "scan")
+        assert future.result() is None
+        assert pyuff.Uff(file.name).read("scan") == scan
+        # The location now exists
+        with pytest.raises(ValueError):
+            scan.write_async(file.name, "scan").result()
+
+
+def test_background_writer_errors():
+    with tempfile.TemporaryDirectory() as directory:
+        writer = pyuff.BackgroundWriter(os.path.join(directory, "missing", "out.uff"))
+        failed = writer.write(synthetic.make_scan("linear", 8, 16), "scan")
+        # Failing to open (or flush) the file is raised by flush
+        with pytest.raises(OSError):
+            writer.flush()
+        assert isinstance(failed.exception(), OSError)
+        writer.close()
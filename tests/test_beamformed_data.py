@@ -0,0 +1,60 @@
+import tempfile
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+
+
+def _linear_scan_beamformed_data():
+    scan = pyuff.LinearScan(
+        x_axis=np.linspace(-10e-3, 10e-3, 4),
+        z_axis=np.linspace(0, 40e-3, 6),
+    )
+    data = np.arange(24 * 2 * 3 * 5, dtype=np.float32).reshape(24, 2, 3, 5)
+    return pyuff.BeamformedData(scan=scan, data=data)
+
+
+def test_image_view_linear_scan():
+    bf = _linear_scan_beamformed_data()
+    image = bf.image_view()
+    assert image.shape == (6, 4, 2, 3, 5)
+    assert np.shares_memory(image, bf.data), "image_view should not copy the data"
+
+    # The first axis of the image is depth
+    z_image = bf.scan.z.reshape(4, 6).T
+    assert np.allclose(z_image[:, 0], bf.scan.z_axis)
+    assert np.array_equal(image[:, :, 0, 0, 0], bf.data[:, 0, 0, 0].reshape(4, 6).T)
+
+
+def test_image_view_sector_scan():
+    scan = pyuff.SectorScan(
+        azimuth_axis=np.linspace(-0.5, 0.5, 3),
+        depth_axis=np.linspace(0, 40e-3, 5),
+        origin=pyuff.Point(distance=0, azimuth=0, elevation=0),
+    )
+    bf = pyuff.BeamformedData(scan=scan, data=scan.z)
+    image = bf.image_view()
+    assert image.shape == (5, 3, 1, 1, 1)
+    # Depth increases along the first axis for the center scanline
+    assert np.allclose(image[:, 1, 0, 0, 0], scan.depth_axis)
+
+
+def test_image_view_mismatching_scan():
+    bf = _linear_scan_beamformed_data()
+    bf.scan = pyuff.LinearScan(x_axis=np.zeros(3), z_axis=np.zeros(3))
+    with pytest.raises(ValueError):
+        bf.image_view()
+
+
+def test_lazy_image_view():
+    bf = _linear_scan_beamformed_data()
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        bf.write(file.name, "beamformed_data")
+        read_bf = pyuff.Uff(file.name).read("beamformed_data")
+        view = read_bf.lazy_image_view()
+        assert view.shape == (6, 4, 2, 3, 5)
+        assert len(view) == 5
+        assert np.array_equal(view[1:3], bf.image_view()[..., 1:3])
+        assert np.array_equal(view[2], bf.image_view()[..., 2])
+        assert "data" not in read_bf.__dict__, "The full data should not be loaded"
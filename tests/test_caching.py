@@ -0,0 +1,69 @@
+import tempfile
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import caching, synthetic
+
+
+def test_cache_budget():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        uff = pyuff.Uff(file.name)
+        data_nbytes = uff.read("channel_data").data.nbytes
+
+        # The budget fits the data of only one object
+        with caching.cache_budget(int(data_nbytes * 1.5)) as cache:
+            channel_data1 = uff.read("channel_data")
+            channel_data2 = uff.read("channel_data")
+            data = channel_data1.data
+            assert "data" in channel_data1.__dict__
+            channel_data2.data
+            # The least recently loaded data is evicted...
+            assert "data" not in channel_data1.__dict__
+            assert "data" in channel_data2.__dict__
+            assert cache.evictions == 1
+            # ...and read from the file again when it is accessed
+            np.testing.assert_array_equal(channel_data1.data, data)
+            assert "data" not in channel_data2.__dict__
+
+            # Fields that are set explicitly are never evicted
+            channel_data2.data = data.copy()
+            channel_data3 = uff.read("channel_data")
+            channel_data3.data
+            assert "data" in channel_data2.__dict__
+            assert "data" in channel_data3.__dict__
+            assert "data" not in channel_data1.__dict__
+
+            # Deleted fields and deleted objects are no longer tracked
+            del channel_data3.data
+            assert len(cache) == 0
+            channel_data1.data
+            assert len(cache) == 1
+            del channel_data1
+            assert len(cache) == 0 and cache.nbytes == 0
+        assert caching._manager is None
+
+
+def test_cache_budget_in_place_changes():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        uff = pyuff.Uff(file.name)
+        data_nbytes = uff.read("channel_data").data.nbytes
+
+        with caching.cache_budget(int(data_nbytes * 1.5)) as cache:
+            channel_data1 = uff.read("channel_data")
+            # Loaded arrays can be evicted, so they can not be changed in place...
+            with pytest.raises(ValueError):
+                channel_data1.data *= 2
+            # ...unless they are materialized, which stops them from being evicted
+            channel_data1.materialize("data")
+            channel_data1.data *= 2
+            data = channel_data1.data
+            assert len(cache) == 0
+            channel_data2 = uff.read("channel_data")
+            channel_data2.data
+            assert channel_data1.data is data
+            assert cache.evictions == 0
+            np.testing.assert_array_equal(data, channel_data2.data * 2)
@@ -0,0 +1,116 @@
+import tempfile
+
+import numpy as np
+
+import pyuff_ustb as pyuff
+
+
+def _plane_wave_channel_data(N_samples=3000, N_elements=16, N_frames=2):
+    angles = (-0.1, 0.0, 0.1)
+    sequence = [
+        pyuff.Wave(
+            wavefront=pyuff.Wavefront.plane,
+            source=pyuff.Point(distance=np.inf, azimuth=angle, elevation=0.0),
+            delay=0.0,
+        )
+        for angle in angles
+    ]
+    rng = np.random.default_rng(0)
+    return pyuff.ChannelData(
+        data=rng.standard_normal((N_samples, N_elements, len(angles), N_frames)),
+        sampling_frequency=40e6,
+        initial_time=0.0,
+        sound_speed=1540.0,
+        modulation_frequency=0.0,
+        probe=pyuff.LinearArray(N=N_elements, pitch=3e-4),
+        sequence=sequence,
+    )
+
+
+def test_sample_windows():
+    channel_data = _plane_wave_channel_data()
+    scan = pyuff.LinearScan(
+        x_axis=np.linspace(-2e-3, 2e-3, 5),
+        z_axis=np.linspace(10e-3, 20e-3, 11),
+    )
+    windows = channel_data.sample_windows(scan)
+    assert windows.shape == (3, 2)
+    # The round-trip from 10 mm to 20 mm depth at 40 MHz is ~520 to ~1040 samples
+    round_trip = 2 * np.array([10e-3, 20e-3]) / 1540 * 40e6
+    assert np.all(windows[:, 0] <= round_trip[0])
+    assert np.all(windows[:, 1] >= round_trip[1])
+    assert np.all(windows[:, 1] - windows[:, 0] < 600)
+
+
+def test_read_cropped():
+    channel_data = _plane_wave_channel_data()
+    scan = pyuff.LinearScan(
+        x_axis=np.linspace(-2e-3, 2e-3, 5),
+        z_axis=np.linspace(10e-3, 20e-3, 11),
+    )
+    windows = channel_data.sample_windows(scan, margin=2)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(
+            file.name, "channel_data", ignore_missing_compulsory_fields=True
+        )
+        read_channel_data = pyuff.Uff(file.name).read("channel_data")
+
+        data, initial_time = read_channel_data.read_cropped(scan, margin=2)
+        start, stop = windows[:, 0].min(), windows[:, 1].max()
+        assert np.array_equal(data, channel_data.data[start:stop])
+        assert np.isclose(initial_time, start / 40e6)
+
+        data, initial_time = read_channel_data.read_cropped(scan, margin=2, wave=1)
+        start, stop = windows[1]
+        assert np.array_equal(data, channel_data.data[start:stop, :, 1])
+        assert "data" not in read_channel_data.__dict__
+
+
+def test_read_active_channels():
+    N_elements = 16
+    probe = pyuff.LinearArray(N=N_elements, pitch=3e-4)
+    # Synthetic transmit aperture: one wave transmitted from each element
+    sequence = [
+        pyuff.Wave(
+            wavefront=pyuff.Wavefront.spherical, source=pyuff.Point(xyz=(x, 0, 0))
+        )
+        for x in probe.x
+    ]
+    data = np.random.default_rng(0).standard_normal((100, N_elements, N_elements, 2))
+    channel_data = pyuff.ChannelData(
+        data=data,
+        sampling_frequency=40e6,
+        initial_time=0.0,
+        sound_speed=1540.0,
+        modulation_frequency=0.0,
+        probe=probe,
+        sequence=sequence,
+        N_active_elements=5,
+    )
+    masks = channel_data.active_channel_masks()
+    assert np.all(masks.sum(axis=1) == 5)
+    assert np.array_equal(np.flatnonzero(masks[8]), [6, 7, 8, 9, 10])
+
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(
+            file.name, "channel_data", ignore_missing_compulsory_fields=True
+        )
+        read_channel_data = pyuff.Uff(file.name).read("channel_data")
+
+        waves_data, channels = read_channel_data.read_active_channels()
+        assert len(waves_data) == N_elements
+        for wave, (wave_data, wave_channels) in enumerate(zip(waves_data, channels)):
+            assert np.array_equal(wave_data, data[:, wave_channels, wave])
+
+        # Non-contiguous channels, padded
+        masks = np.zeros((N_elements, N_elements), dtype=bool)
+        masks[:, [0, 3, 7]] = True
+        masks[0, 8] = True
+        padded_data, channel_indices = read_channel_data.read_active_channels(
+            masks, padded=True
+        )
+        assert padded_data.shape == (100, 4, N_elements, 2)
+        assert np.array_equal(channel_indices[:, 1], [0, 3, 7, -1])
+        assert np.array_equal(padded_data[:, :3, 1], data[:, [0, 3, 7], 1])
+        assert np.all(padded_data[:, 3, 1] == 0)
+        assert "data" not in read_channel_data.__dict__
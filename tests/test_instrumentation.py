@@ -0,0 +1,61 @@
+import json
+import tempfile
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import instrumentation, synthetic
+
+
+def test_profiling():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+
+        with pyuff.profiling() as stats:
+            channel_data = pyuff.Uff(file.name).read("channel_data")
+            data = channel_data.data
+            channel_data.data  # Cached, so not recorded again
+        assert instrumentation._active is None
+        assert stats.file_opens > 0
+        assert stats.dataset_reads == 1
+        assert stats.bytes_read == data.nbytes
+        assert stats.fields["ChannelData.data"].loads == 1
+        assert stats.fields["ChannelData.data"].bytes_read == data.nbytes
+
+        # Nothing is recorded outside of the context
+        channel_data.sampling_frequency
+        assert "ChannelData.sampling_frequency" not in stats.fields
+
+        # I/O is attributed to the innermost field that is being loaded
+        with pyuff.profiling() as stats:
+            channel_data.sequence[0].source.azimuth
+        assert stats.fields["Point.azimuth"].dataset_reads == 1
+        assert stats.fields["Wave.source"].dataset_reads == 0
+
+        assert "Point.azimuth" in stats.summary()
+        assert json.loads(stats.to_json())["dataset_reads"] == stats.dataset_reads
+
+
+def test_chrome_trace():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        channel_data = pyuff.Uff(file.name).read("channel_data")
+
+        with pyuff.profiling(trace=True) as stats:
+            channel_data.sequence[2].source.azimuth
+        trace = stats.to_chrome_trace()
+        json.dumps(trace)  # Is JSON serializable
+
+        events = trace["traceEvents"]
+        field_events = [e for e in events if e.get("cat") == "field"]
+        names = [e["name"] for e in field_events if e["ph"] == "B"]
+        assert names == [
+            "channel_data/sequence",
+            "channel_data/sequence/sequence_0003/source",
+            "channel_data/sequence/sequence_0003/source/azimuth",
+        ]
+        # Begin and end events are properly nested
+        assert [e["ph"] for e in field_events] == ["B", "E", "B", "E", "B", "E"]
+        azimuth_end = field_events[-1]
+        assert azimuth_end["args"]["bytes"] > 0
+        assert any(e["cat"] == "file" and e["ph"] == "X" for e in events if "cat" in e)
+        assert any(e["ph"] == "M" for e in events)
+        assert all(e["tid"] == field_events[0]["tid"] for e in field_events)
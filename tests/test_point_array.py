@@ -0,0 +1,78 @@
+import tempfile
+
+import h5py
+import numpy as np
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+from pyuff_ustb.readers import H5Reader
+
+
+def test_conversion_matches_point():
+    rng = np.random.default_rng(0)
+    xyz = rng.uniform(-1, 1, (20, 3))
+    points = pyuff.PointArray.from_xyz(xyz)
+    assert np.allclose(points.xyz, xyz)
+    for i, xyz_i in enumerate(xyz):
+        point = pyuff.Point(xyz=xyz_i)
+        assert np.allclose(
+            points.spherical[i], [point.distance, point.azimuth, point.elevation]
+        )
+
+    # Points at infinity, like plane wave sources
+    spherical = [[np.inf, 0.1, 0.0], [np.inf, -0.1, 0.2], [0.0, 0.0, 0.0]]
+    points = pyuff.PointArray.from_spherical(spherical)
+    expected = np.array(
+        [pyuff.Point(distance=d, azimuth=a, elevation=e).xyz for d, a, e in spherical]
+    )
+    assert np.array_equal(points.xyz, expected, equal_nan=True)
+    assert points[1] == pyuff.Point(distance=np.inf, azimuth=-0.1, elevation=0.2)
+    assert pyuff.PointArray.from_points(points.to_points()) == points
+
+
+def test_read_and_write():
+    points = pyuff.PointArray.from_xyz(np.random.default_rng(0).uniform(size=(5, 3)))
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        with h5py.File(file.name, "w") as hf:
+            pyuff.write_object(hf, points, "points")
+            pyuff.write_object(hf, points.to_points(), "point_list")
+            pyuff.write_object(hf, points[0], "point")
+
+        # The PointArray is written in the same layout as a list of points
+        uff = pyuff.Uff(file.name)
+        assert uff.read("points") == uff.read("point_list")
+        assert pyuff.PointArray.read(H5Reader(file.name, "points")) == points
+        assert pyuff.PointArray.read(H5Reader(file.name, "point_list")) == points
+        assert pyuff.PointArray.read(H5Reader(file.name, "point")) == points[:1]
+
+
+def test_from_sequence():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data = synthetic.write_channel_data(
+            file.name, N_samples=16, N_waves=4, sequence_type="focused"
+        )
+        sequence = pyuff.Uff(file.name).read("channel_data").sequence
+        sequence[1].source = pyuff.Point(xyz=(1.0, 2.0, 3.0))  # Set by the user
+        with pyuff.profiling() as stats:
+            sources = pyuff.PointArray.from_sequence(sequence, "source")
+        assert stats.file_opens == 1
+        expected = [wave.source.xyz for wave in channel_data.sequence]
+        expected[1] = (1.0, 2.0, 3.0)
+        assert np.allclose(sources.xyz, expected)
+
+
+def test_from_sequence_missing_points():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(
+            file.name, N_samples=16, N_waves=3, sequence_type="focused"
+        )
+        with h5py.File(file.name, "r+") as hf:
+            del hf["channel_data/sequence/sequence_0002/origin"]
+        sequence = pyuff.Uff(file.name).read("channel_data").sequence
+        sequence[2].source = None
+        origins = pyuff.PointArray.from_sequence(sequence, "origin")
+        sources = pyuff.PointArray.from_sequence(sequence, "source")
+        # Missing points are at the origin, like the default of Wave.origin
+        assert np.allclose(origins.xyz[1], sequence[1].origin.xyz)
+        assert np.allclose(origins.spherical[1], [0.0, 0.0, 0.0])
+        assert np.allclose(sources.spherical[2], [0.0, 0.0, 0.0])
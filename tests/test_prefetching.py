@@ -0,0 +1,55 @@
+import tempfile
+
+import numpy as np
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+from pyuff_ustb.prefetching import AccessProfile, prefetch, record_access_profile
+
+
+def _application(channel_data: pyuff.ChannelData):
+    channel_data.sampling_frequency
+    channel_data.probe.geometry
+    return [(wave.source.xyz, wave.delay) for wave in channel_data.sequence]
+
+
+def test_record_and_prefetch():
+    with (
+        tempfile.NamedTemporaryFile(suffix=".uff") as file1,
+        tempfile.NamedTemporaryFile(suffix=".uff") as file2,
+    ):
+        synthetic.write_channel_data(file1.name, N_samples=16, N_waves=3)
+        synthetic.write_channel_data(file2.name, N_samples=16, N_waves=5)
+
+        channel_data = pyuff.Uff(file1.name).read("channel_data")
+        with record_access_profile(channel_data) as profile:
+            _application(channel_data)
+        assert ("sequence", "*", "source", "azimuth") in profile.paths
+        assert ("probe", "geometry") in profile.paths
+        assert ("data",) not in profile.paths
+
+        with tempfile.NamedTemporaryFile(suffix=".json") as profile_file:
+            profile.save(profile_file.name)
+            assert AccessProfile.load(profile_file.name) == profile
+
+        # The profile applies to a file with a different number of waves
+        channel_data = pyuff.Uff(file2.name).read("channel_data")
+        with pyuff.profiling() as stats:
+            prefetch(channel_data, profile)
+        assert stats.file_opens == 1  # The file is opened only once
+        assert len(channel_data.sequence) == 5
+        assert all("delay" in wave.__dict__ for wave in channel_data.sequence)
+        assert "data" not in channel_data.__dict__
+
+        # Nothing is read from the file by the application after prefetching
+        with pyuff.profiling() as stats:
+            _application(channel_data)
+        assert stats.file_opens == 0
+
+        # Prefetching in the background gives the same result
+        channel_data2 = pyuff.Uff(file2.name).read("channel_data")
+        future = prefetch(channel_data2, profile, background=True)
+        assert future.result(timeout=10) is channel_data2
+        assert np.array_equal(
+            channel_data2.probe.__dict__["geometry"], channel_data.probe.geometry
+        )
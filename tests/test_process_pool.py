@@ -0,0 +1,39 @@
+import tempfile
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+from pyuff_ustb.readers.process_pool import ProcessPoolReader
+
+
+def test_process_pool_reader():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(
+            file.name, N_samples=64, N_waves=5, N_frames=4, is_complex=True
+        )
+        synthetic.write_beamformed_data(file.name, N_x=8, N_z=16, N_frames=3)
+        uff = pyuff.Uff(file.name)
+        channel_data = uff.read("channel_data")
+        beamformed_data = uff.read("beamformed_data")
+
+        with ProcessPoolReader(max_workers=2) as pool:
+            for key in [..., (..., slice(1, 3)), (0, slice(None), 2), (..., -1)]:
+                np.testing.assert_array_equal(
+                    channel_data.read_data(key, pool=pool), channel_data.read_data(key)
+                )
+            np.testing.assert_array_equal(
+                beamformed_data.read_data((slice(None, None, 3), ...), pool=pool),
+                beamformed_data.read_data((slice(None, None, 3), ...)),
+            )
+
+            # Read into a preallocated array
+            out = np.empty(channel_data.data.shape, channel_data.data.dtype)
+            result = pool.read_array(
+                channel_data._reader["data"], transpose=True, out=out
+            )
+            assert result is out
+            np.testing.assert_array_equal(out, channel_data.data)
+            with pytest.raises(ValueError):
+                pool.read_array(channel_data._reader["data"], out=out)
@@ -0,0 +1,96 @@
+import tempfile
+
+import numpy as np
+
+import pyuff_ustb as pyuff
+from pyuff_ustb.processing import demodulate, envelope, envelope_blocks
+
+
+def _rf_beamformed_data(N_frames: int = 3):
+    scan = pyuff.LinearScan(
+        x_axis=np.linspace(-10e-3, 10e-3, 4),
+        z_axis=np.linspace(0, 40e-3, 64),
+    )
+    # Every scanline is a sinusoid along depth with unit amplitude
+    scanline = np.cos(2 * np.pi * 0.1 * np.arange(64))
+    data = np.tile(scanline, 4)[:, None, None, None] * np.ones((1, 1, 1, N_frames))
+    return pyuff.BeamformedData(scan=scan, data=data, modulation_frequency=0.0)
+
+
+def test_envelope_rf():
+    bf = _rf_beamformed_data()
+    result = envelope(bf, log_compression=False)
+    assert result.data.dtype == np.float32
+    assert result.data.shape == bf.data.shape
+    # Away from the edges the envelope of a unit sinusoid is 1
+    assert np.allclose(result.image_view()[16:48], 1, atol=0.1)
+
+
+def test_envelope_iq():
+    bf = _rf_beamformed_data()
+    bf.data = (bf.data * np.exp(1j * 0.3)).astype(np.complex64)
+    result = envelope(bf, log_compression=True)
+    assert np.allclose(result.data, 20 * np.log10(np.abs(bf.data)), atol=1e-4)
+
+
+def test_envelope_blocks_are_bounded():
+    bf = _rf_beamformed_data(N_frames=5)
+    blocks = list(envelope_blocks(bf, frames_per_block=2))
+    assert [frames for frames, _ in blocks] == [slice(0, 2), slice(2, 4), slice(4, 5)]
+    assert all(block.shape[-1] <= 2 for _, block in blocks)
+
+
+def test_envelope_streamed_to_file():
+    bf = _rf_beamformed_data(N_frames=5)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        bf.write(file.name, "beamformed_data")
+        read_bf = pyuff.Uff(file.name).read("beamformed_data")
+        result = envelope(read_bf, file.name, "envelope", frames_per_block=2)
+        assert result.data.dtype == np.float32
+        assert np.allclose(result.data, envelope(bf).data)
+
+
+def _rf_channel_data(sampling_frequency=40e6, center_frequency=5e6, N_frames=4):
+    time = 1e-6 + np.arange(400) / sampling_frequency
+    rf_envelope = np.exp(-(((time - 5e-6) / 1e-6) ** 2))
+    rf = rf_envelope * np.cos(2 * np.pi * center_frequency * time)
+    data = np.tile(rf[:, None, None, None], (1, 3, 2, N_frames))
+    channel_data = pyuff.ChannelData(
+        data=data,
+        sampling_frequency=sampling_frequency,
+        initial_time=1e-6,
+        sound_speed=1540.0,
+        modulation_frequency=0.0,
+        pulse=pyuff.Pulse(center_frequency=center_frequency),
+    )
+    return channel_data, rf_envelope
+
+
+def test_demodulate():
+    channel_data, rf_envelope = _rf_channel_data()
+    iq = demodulate(channel_data)
+    assert iq.data.dtype == np.complex64
+    assert iq.data.shape == (100, 3, 2, 4)
+    assert iq.sampling_frequency == 10e6
+    assert iq.modulation_frequency == 5e6
+    assert iq.initial_time == channel_data.initial_time
+    # The magnitude of the IQ data is the envelope of the RF data
+    assert np.allclose(np.abs(iq.data[:, 0, 0, 0]), rf_envelope[::4], atol=1e-2)
+
+
+def test_demodulate_streamed_to_file():
+    channel_data, _ = _rf_channel_data()
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(
+            file.name, "channel_data", ignore_missing_compulsory_fields=True
+        )
+        read_channel_data = pyuff.Uff(file.name).read("channel_data")
+        iq = demodulate(
+            read_channel_data,
+            filepath=file.name,
+            location="iq",
+            frames_per_block=3,
+            ignore_missing_compulsory_fields=True,
+        )
+        assert "data" not in read_channel_data.__dict__
+        assert np.allclose(iq.data, demodulate(channel_data).data)
@@ -1,13 +1,17 @@
 import os
+import pickle
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 
 import h5py
 import numpy as np
 import pytest
 
 import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
 from pyuff_ustb.common import get_class_from_name
-from pyuff_ustb.objects.uff import dependent_property
+from pyuff_ustb.objects.uff import FieldKind, dependent_property
 from pyuff_ustb.readers import H5Reader, ReaderKeyError
 
 # Default download location when using vbeam.util.download.cached_download
@@ -164,6 +168,16 @@ def test_writing_missing_compulsory_fields():
         with pytest.raises(ValueError):
             # Writing an object with missing compulsory fields should raise an error
             wave.write(file.name, "wave")
+        # The object is planned before anything is written, so nothing was written
+        with h5py.File(file.name, "r") as hf:
+            assert "wave" not in hf
+
+        # Failing to overwrite a location keeps the existing value
+        point = pyuff.Point(distance=1, azimuth=0, elevation=0)
+        point.write(file.name, "point")
+        with pytest.raises(ValueError):
+            wave.write(file.name, "point", overwrite=True)
+        assert pyuff.Uff(file.name).read("point") == point
 
     with tempfile.NamedTemporaryFile(suffix=".uff") as file:
         # With ignore_missing_compulsory_fields=True we write the object anyway
@@ -173,6 +187,315 @@ def test_writing_missing_compulsory_fields():
         assert uff.read("point") == wave
 
 
+def test_integer_data():
+    channel_data = synthetic.make_channel_data(N_samples=64, N_waves=3)
+    rng = np.random.default_rng(0)
+    channel_data.data = rng.integers(-(2**15), 2**15, channel_data.data.shape, np.int16)
+    beamformed_data = synthetic.make_beamformed_data(N_x=8, N_z=16, is_complex=True)
+    beamformed_data.data = (beamformed_data.data * 1000).astype(np.complex64)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(file.name, "channel_data")
+        beamformed_data.write(file.name, "beamformed_data")
+        with h5py.File(file.name, "r") as hf:
+            # The class attributes are the MATLAB classes of the stored values
+            assert hf["channel_data/data"].dtype == np.int16
+            assert hf["channel_data/data"].attrs["class"] == "int16"
+            assert hf["channel_data/sampling_frequency"].attrs["class"] == "double"
+            assert hf["beamformed_data/data"].attrs["class"] == "single"
+            assert hf["beamformed_data/data/real"].attrs["class"] == "single"
+
+        uff = pyuff.Uff(file.name)
+        # Integer data is read losslessly, with the stored dtype
+        read_channel_data = uff.read("channel_data")
+        assert read_channel_data.data.dtype == np.int16
+        np.testing.assert_array_equal(read_channel_data.data, channel_data.data)
+        frame = read_channel_data.read_data((..., 0), dtype=np.float32)
+        assert frame.dtype == np.float32
+        np.testing.assert_array_equal(frame, channel_data.data[..., 0])
+        read_channel_data.data
+        assert read_channel_data.read_data(dtype=np.float32).dtype == np.float32
+
+        # Complex data gets the complex dtype of its real and imaginary parts
+        read_beamformed_data = uff.read("beamformed_data")
+        assert read_beamformed_data.data.dtype == np.complex64
+        np.testing.assert_array_equal(read_beamformed_data.data, beamformed_data.data)
+        assert read_beamformed_data.read_data(dtype=np.float64).dtype == np.complex128
+
+
+def test_writing_shared_objects():
+    channel_data = synthetic.make_channel_data(
+        N_samples=16, N_elements=8, N_waves=4, N_frames=1
+    )
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(file.name, "channel_data")
+        # The probe (and apodization) shared by all waves is written only once, and
+        # hard linked to from the other waves
+        with h5py.File(file.name, "r") as hf:
+            sequence = hf["channel_data/sequence"]
+            probe = sequence["sequence_0001/apodization/probe"]
+            assert h5py.h5o.get_info(probe.id).rc > 1
+            assert probe == sequence["sequence_0002/apodization/probe"]
+
+        # Reading back gives a single instance for the shared objects
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        sequence = uff_channel_data.sequence
+        assert sequence[0].apodization is sequence[1].apodization
+        assert sequence[0].source is not sequence[1].source
+        assert uff_channel_data == channel_data
+        # Different objects with the same content are not merged
+        assert channel_data.probe.origin is not sequence[0].origin
+        assert uff_channel_data.probe.origin is not sequence[0].origin
+
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        # Objects with the same content are stored once, but read as separate objects
+        channel_data.write(file.name, "channel_data", deduplicate="content")
+        with h5py.File(file.name, "r") as hf:
+            origin = hf["channel_data/probe/origin"]
+            assert h5py.h5o.get_info(origin.id).rc > 1
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        assert uff_channel_data.probe.origin is not uff_channel_data.sequence[0].origin
+        assert uff_channel_data.sequence[0].probe is uff_channel_data.probe
+        assert uff_channel_data == channel_data
+
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        channel_data.write(file.name, "channel_data", deduplicate=False)
+        with h5py.File(file.name, "r") as hf:
+            probe = hf["channel_data/sequence/sequence_0001/apodization/probe"]
+            assert h5py.h5o.get_info(probe.id).rc == 1
+        assert pyuff.Uff(file.name).read("channel_data") == channel_data
+
+
+def test_interning():
+    channel_data = synthetic.make_channel_data(
+        N_samples=16, N_elements=8, N_waves=4, N_frames=1
+    )
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        # Without links, every wave has its own copy of the probe in the file
+        channel_data.write(file.name, "channel_data", deduplicate=False)
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        assert uff_channel_data.probe is not uff_channel_data.sequence[0].probe
+
+        # Identical probes are resolved to the same instance when interning
+        reader = H5Reader(file.name, intern=True)
+        uff_channel_data = pyuff.Uff(reader).read("channel_data")
+        sequence = uff_channel_data.sequence
+        with pyuff.profiling() as stats:
+            assert uff_channel_data.probe is sequence[0].probe
+        # The probes are compared by their data, which is read through the profiler
+        assert stats.bytes_read > 0
+        assert sequence[0].probe is sequence[1].apodization.probe
+        assert uff_channel_data == channel_data
+
+        # The probe of beamformed data is interned as well
+        beamformed_data = synthetic.make_beamformed_data(N_x=8, N_z=16)
+        beamformed_data.probe = channel_data.probe
+        beamformed_data.write(file.name, "beamformed_data", deduplicate=False)
+        uff_beamformed_data = pyuff.Uff(reader).read("beamformed_data")
+        assert uff_beamformed_data.probe is uff_channel_data.probe
+
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        # Probes that are hard linked by content are only compared by their address
+        channel_data.write(file.name, "channel_data", deduplicate="content")
+        reader = H5Reader(file.name, intern=True)
+        uff_channel_data = pyuff.Uff(reader).read("channel_data")
+        with pyuff.profiling() as stats:
+            probes = [wave.probe for wave in uff_channel_data.sequence]
+        assert all(probe is uff_channel_data.probe for probe in probes)
+        assert stats.bytes_read == 0
+
+
+def test_incremental_write():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        channel_data = pyuff.Uff(file.name).read("channel_data")
+        assert not channel_data.modified_fields
+        with h5py.File(file.name, "r") as hf:
+            data_address = h5py.h5o.get_info(hf["channel_data/data"].id).addr
+
+        channel_data.sound_speed = 1480.0
+        channel_data.sequence[1].delay = 0.5
+        geometry = channel_data.probe.geometry.copy()
+        geometry[:, 0] += 1e-3
+        channel_data.probe.geometry = geometry
+        assert channel_data.modified_fields == {"sound_speed"}
+        channel_data.save()
+        assert not channel_data.modified_fields
+        assert not channel_data.sequence[1].modified_fields
+
+        # The data was left untouched
+        with h5py.File(file.name, "r") as hf:
+            assert h5py.h5o.get_info(hf["channel_data/data"].id).addr == data_address
+
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        assert uff_channel_data == channel_data
+        assert uff_channel_data.sound_speed == 1480.0
+        # The probe is shared by all waves, so they all see the new geometry
+        np.testing.assert_allclose(
+            uff_channel_data.sequence[2].probe.geometry, geometry, rtol=1e-6
+        )
+
+    channel_data = synthetic.make_channel_data(N_samples=16, N_waves=3)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        # The origins of the waves and the probe are stored once, but are different
+        # objects, so updating one of them must not update the others
+        channel_data.write(file.name, "channel_data", deduplicate="content")
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        uff_channel_data.sequence[1].origin.distance = 0.005
+        uff_channel_data.save()
+        uff_channel_data = pyuff.Uff(file.name).read("channel_data")
+        assert uff_channel_data.sequence[1].origin.distance == 0.005
+        assert uff_channel_data.sequence[0].origin == channel_data.sequence[0].origin
+        assert uff_channel_data.probe.origin == channel_data.probe.origin
+
+        # Nothing is written if a modified field is missing
+        uff_channel_data.initial_time = 1.0
+        uff_channel_data.sequence[2].source = None
+        with pytest.raises(ValueError):
+            uff_channel_data.save()
+        initial_time = pyuff.Uff(file.name).read("channel_data").initial_time
+        assert initial_time == channel_data.initial_time
+
+
+def test_copy_on_write():
+    channel_data = synthetic.make_channel_data(
+        N_samples=256, N_elements=32, N_waves=3, N_frames=1
+    )
+    data = channel_data.data
+    copied = channel_data.copy()
+    # The data is shared (read-only), the rest is copied
+    assert np.shares_memory(copied.data, channel_data.data)
+    assert not copied.data.flags.writeable and not channel_data.data.flags.writeable
+    with pytest.raises(ValueError):
+        copied.data[0] = 0
+    # The shared array can not be modified through other references either
+    with pytest.raises(ValueError):
+        data[0] = 0
+    assert copied.probe is not channel_data.probe
+    assert copied.sequence[0].probe is copied.probe
+    assert copied == channel_data
+
+    copied.sound_speed = 1480.0
+    assert channel_data.sound_speed == 1540.0
+    copied.materialize("data")
+    copied.data *= 2
+    assert not np.shares_memory(copied.data, channel_data.data)
+    np.testing.assert_array_equal(copied.data, channel_data.data * 2)
+
+    # The array that owns the memory of a shared view is made read-only as well
+    channel_data.data = np.concatenate([copied.data, copied.data])[: len(data)]
+    copied = channel_data.copy()
+    with pytest.raises(ValueError):
+        channel_data.data.base[0] = 0
+    assert np.shares_memory(copied.data, channel_data.data)
+
+
+def test_selective_eager_load():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        channel_data = pyuff.Uff(file.name).read("channel_data")
+
+        with pyuff.profiling() as stats:
+            metadata = pyuff.eager_load(channel_data, metadata_only=True)
+        assert "data" not in metadata.__dict__
+        assert "sound_speed" in metadata.__dict__
+        assert "geometry" in metadata.probe.__dict__
+        assert stats.bytes_read < channel_data.data.nbytes
+        # The data can still be loaded lazily
+        np.testing.assert_array_equal(metadata.data, channel_data.data)
+
+        geometry = pyuff.eager_load(
+            channel_data, include=["probe/**", "sequence/*/source"]
+        )
+        assert {"probe", "sequence"} <= set(geometry.__dict__)
+        assert "sound_speed" not in geometry.__dict__
+        assert "source" in geometry.sequence[2].__dict__
+        assert "delay" not in geometry.sequence[2].__dict__
+        assert geometry == channel_data
+
+        small = pyuff.eager_load(channel_data, max_bytes=1000)
+        assert "data" not in small.__dict__ and "geometry" not in small.probe.__dict__
+        assert "sound_speed" in small.__dict__
+
+        # Only the fields that were modified are modified in the loaded objects
+        channel_data.sound_speed = 1480.0
+        for loaded in [pyuff.eager_load(channel_data), small, metadata]:
+            assert not loaded.probe.modified_fields
+        assert pyuff.eager_load(channel_data).modified_fields == {"sound_speed"}
+        assert pyuff.eager_load(channel_data, max_bytes=1000).modified_fields == {
+            "sound_speed"
+        }
+
+
+def _sum_frame(channel_data: pyuff.ChannelData, frame: int) -> float:
+    return float(np.sum(channel_data.data[..., frame]))
+
+
+def test_pickling():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3, N_frames=2)
+        channel_data = pyuff.Uff(file.name).read("channel_data")
+        channel_data.data, channel_data.probe.geometry
+        channel_data.sound_speed = 1480.0
+
+        # Only the location, the set fields and the loaded sub-objects are pickled, not
+        # the loaded arrays
+        pickled = pickle.dumps(channel_data)
+        assert len(pickled) < 1000
+        unpickled = pickle.loads(pickled)
+        assert set(unpickled.__dict__) == {
+            "_reader",
+            "_modified_fields",
+            "sound_speed",
+            "probe",
+        }
+        assert set(unpickled.probe.__dict__) == {"_reader"}
+        assert unpickled.modified_fields == {"sound_speed"}
+        assert unpickled == channel_data
+
+        # The cached fields of included sub-objects are included as well
+        unpickled = pickle.loads(
+            pickle.dumps(channel_data.pickle_cached_fields("probe"))
+        )
+        assert "probe" in unpickled.__dict__ and "data" not in unpickled.__dict__
+        assert "geometry" in unpickled.probe.__dict__
+
+        # Changes to loaded sub-objects are kept
+        geometry = channel_data.probe.geometry + 1
+        channel_data.probe.geometry = geometry
+        channel_data.sequence[1].delay = 0.5
+        unpickled = pickle.loads(pickle.dumps(channel_data))
+        np.testing.assert_array_equal(unpickled.probe.geometry, geometry)
+        assert unpickled.sequence[1].delay == 0.5
+        assert unpickled.sequence[0].delay == channel_data.sequence[0].delay
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            sums = list(executor.map(_sum_frame, [channel_data] * 2, range(2)))
+        np.testing.assert_allclose(
+            sums, channel_data.data.sum(axis=(0, 1, 2)), rtol=1e-5
+        )
+
+
+def test_field_registry():
+    fields = pyuff.ChannelData._schema
+    assert fields["data"].kind is FieldKind.compulsory
+    assert fields["PRF"].kind is FieldKind.optional
+    assert fields["N_elements"].kind is FieldKind.dependent
+    assert fields["data"].type_hint is np.ndarray
+    # Inherited fields are registered as well
+    assert fields["name"].kind is FieldKind.optional
+    assert "r" in pyuff.LinearArray._schema
+
+    # The registry gives the same fields as scanning the class with dir()
+    channel_data = pyuff.ChannelData()
+    assert list(channel_data._get_fields()) == [
+        attr
+        for attr in dir(pyuff.ChannelData)
+        if isinstance(getattr(pyuff.ChannelData, attr), cached_property)
+        or isinstance(getattr(pyuff.ChannelData, attr), dependent_property)
+    ]
+    assert "N_elements" not in channel_data._get_fields(skip_dependent_properties=True)
+
+
 def _compare_dicts(d1: dict, d2: dict):
     for k in d1.keys():
         if k not in d2.keys():
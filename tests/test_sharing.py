@@ -0,0 +1,66 @@
+import gc
+import multiprocessing
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import sharing, synthetic
+
+
+def _attach_and_sum(handle):
+    channel_data = handle.attach()
+    assert not channel_data.data.flags.writeable
+    assert channel_data.sequence[0].probe is channel_data.probe
+    result = channel_data.data.sum(), channel_data.probe.geometry.sum()
+    # The shared memory is detached when the attached arrays are garbage collected
+    del channel_data
+    gc.collect()
+    assert not sharing._attached
+    return result
+
+
+def test_share():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(file.name, N_samples=64, N_waves=3)
+        channel_data = pyuff.Uff(file.name).read("channel_data")
+        channel_data.data, channel_data.probe.geometry
+        for wave in channel_data.sequence:
+            wave.probe
+        channel_data.sound_speed = 1480.0
+
+        with channel_data.share() as handle:
+            # The data and the probe geometry are shared, the other fields are pickled
+            assert len(handle.names) == 2
+            assert len(pickle.dumps(handle)) < channel_data.data.nbytes
+            shared = handle.attach()
+            assert shared.data is not channel_data.data
+            np.testing.assert_array_equal(shared.data, channel_data.data)
+            assert shared.sound_speed == 1480.0
+            assert shared.modified_fields == {"sound_speed"}
+            # Fields that were not loaded are read from the file
+            assert shared.sampling_frequency == channel_data.sampling_frequency
+            with pytest.raises(ValueError):
+                shared.data[0] = 0
+            # Views of the attached arrays keep the shared memory attached
+            view = shared.data[0]
+            assert len(sharing._attached) == 2
+            del shared
+            gc.collect()
+            assert list(sharing._attached) == [handle.names[0]]
+            del view
+            assert not sharing._attached
+
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(2, mp_context=context) as executor:
+                results = list(executor.map(_attach_and_sum, [handle] * 2))
+            expected = (channel_data.data.sum(), channel_data.probe.geometry.sum())
+            assert results == [expected, expected]
+            with pytest.raises(ValueError):
+                pickle.loads(pickle.dumps(handle)).release()
+        assert handle.released
+        with pytest.raises(ValueError):
+            handle.attach()
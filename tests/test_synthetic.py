@@ -0,0 +1,49 @@
+import tempfile
+
+import numpy as np
+import pytest
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+
+
+@pytest.mark.parametrize("probe_type", ["linear", "curvilinear", "matrix"])
+@pytest.mark.parametrize("sequence_type", ["plane", "diverging", "focused", "stai"])
+def test_write_channel_data(probe_type, sequence_type):
+    kwargs = dict(
+        N_samples=64,
+        N_elements=16,
+        N_waves=3,
+        N_frames=3,
+        probe_type=probe_type,
+        sequence_type=sequence_type,
+    )
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        # All compulsory fields are set, so the file is written without errors
+        written = synthetic.write_channel_data(file.name, frames_per_block=2, **kwargs)
+        in_memory = synthetic.make_channel_data(**kwargs)
+        assert written == in_memory
+        assert written.data.shape == (64, 16, 3, 3)
+        assert written.data.dtype == np.float32
+
+
+def test_write_beamformed_data():
+    kwargs = dict(N_x=8, N_z=16, N_frames=4, scan_type="sector", is_complex=True)
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        written = synthetic.write_beamformed_data(
+            file.name, frames_per_block=3, **kwargs
+        )
+        assert written == synthetic.make_beamformed_data(**kwargs)
+        assert written.data.dtype == np.complex64
+        assert written.image_view().shape == (16, 8, 1, 1, 4)
+
+
+def test_synthetic_data_is_deterministic():
+    channel_data1 = synthetic.make_channel_data(N_samples=32, N_frames=2, seed=1)
+    channel_data2 = synthetic.make_channel_data(N_samples=32, N_frames=2, seed=1)
+    channel_data3 = synthetic.make_channel_data(N_samples=32, N_frames=2, seed=2)
+    assert np.array_equal(channel_data1.data, channel_data2.data)
+    assert not np.array_equal(channel_data1.data, channel_data3.data)
+    # Frames are generated independently of how many frames there are in total
+    channel_data4 = synthetic.make_channel_data(N_samples=32, N_frames=1, seed=1)
+    assert np.array_equal(channel_data1.data[..., :1], channel_data4.data)
@@ -0,0 +1,71 @@
+import tempfile
+
+import h5py
+import numpy as np
+
+import pyuff_ustb as pyuff
+from pyuff_ustb import synthetic
+from pyuff_ustb.readers import ThreadPoolReader
+
+
+def _recreate(group: h5py.Group, name: str, **kwargs):
+    "Re-create a dataset with other storage options, keeping its attributes."
+    value, attrs = group[name][()], dict(group[name].attrs)
+    del group[name]
+    group.create_dataset(name, data=value, **kwargs)
+    group[name].attrs.update(attrs)
+
+
+def test_thread_pool_reader():
+    with tempfile.NamedTemporaryFile(suffix=".uff") as file:
+        synthetic.write_channel_data(
+            file.name, N_samples=64, N_waves=5, N_frames=4, is_complex=True
+        )
+        synthetic.write_beamformed_data(file.name, N_x=8, N_z=16, N_frames=3)
+        with h5py.File(file.name, "a") as hf:
+            for name in ["real", "imag"]:
+                _recreate(
+                    hf["channel_data/data"],
+                    name,
+                    chunks=(1, 2, 5, 16),
+                    compression="gzip",
+                    shuffle=True,
+                )
+                # LZF is not supported by the pool, so it falls back to h5py
+                _recreate(hf["beamformed_data/data"], name, compression="lzf")
+        uff = pyuff.Uff(file.name)
+        channel_data = uff.read("channel_data")
+        beamformed_data = uff.read("beamformed_data")
+
+        with ThreadPoolReader(max_workers=2) as pool:
+            keys = [
+                ...,
+                (..., slice(1, 3)),
+                (0, slice(None), 2),
+                (..., -1),
+                (slice(3, 60, 7), ..., slice(None, None, 2)),
+            ]
+            for key in keys:
+                np.testing.assert_array_equal(
+                    channel_data.read_data(key, pool=pool), channel_data.read_data(key)
+                )
+            np.testing.assert_array_equal(
+                beamformed_data.read_data(pool=pool), beamformed_data.read_data()
+            )
+
+            # Chunks that have not been written are filled with the fill value
+            with h5py.File(file.name, "a") as hf:
+                partial = hf.create_dataset(
+                    "partial",
+                    (4, 4),
+                    "f8",
+                    chunks=(2, 2),
+                    fillvalue=7,
+                    compression="gzip",
+                )
+                partial[:2, :2] = 1.0
+            with h5py.File(file.name, "r") as hf:
+                partial = hf["partial"]
+                out = np.zeros((4, 4))
+                assert pool._read_dataset(partial, (slice(0, 4, 1),) * 2, out)
+                np.testing.assert_array_equal(out, partial[()])